@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+# Seconds a cached response may be served without checking anything
+CACHE_TTL_SECONDS = int(os.getenv("API_CACHE_TTL", 3600))
+# Entries kept by the in-process LRU
+CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", 256))
+# How often the warehouse refresh version is re-read from Postgres
+VERSION_CHECK_SECONDS = int(os.getenv("API_CACHE_VERSION_CHECK", 30))
+# max-age sent to clients; after it they revalidate with If-None-Match
+CLIENT_MAX_AGE = int(os.getenv("API_CACHE_CLIENT_MAX_AGE", 60))
+# Optional shared backend (redis://...) so several API workers share entries
+CACHE_URL = os.getenv("API_CACHE_URL")
+
+# Bumped by the dbt on-run-end hook (macros/bump_refresh_version.sql)
+REFRESH_VERSION_SQL = text("SELECT version FROM marts.warehouse_refresh WHERE id = 1")
+
+
+class MemoryBackend:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisBackend:
+    """Shared backend on Redis (optional 'redis' package); values are [body, etag] JSON."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self.client = redis.Redis.from_url(url)
+
+    async def get(self, key: str):
+        raw = await self.client.get(f"api-cache:{key}")
+        return tuple(json.loads(raw)) if raw else None
+
+    async def set(self, key: str, value, ttl: int) -> None:
+        await self.client.setex(f"api-cache:{key}", ttl, json.dumps(list(value)))
+
+
+class ResponseCache:
+    """
+    Caches JSON responses of aggregate endpoints until the warehouse changes.
+
+    Entries are keyed on the refresh version stamped by the last dbt run plus
+    the endpoint path and query parameters, so a dbt run invalidates
+    everything at once. The version itself is read at most every
+    `version_check_seconds`, which means dashboard polling in between never
+    reaches Postgres. Responses carry an ETag (hash of the body) and a
+    Cache-Control max-age, and a matching If-None-Match gets a 304.
+    """
+
+    def __init__(self, backend=None, ttl: int = CACHE_TTL_SECONDS,
+                 version_check_seconds: int = VERSION_CHECK_SECONDS,
+                 client_max_age: int = CLIENT_MAX_AGE):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.version_check_seconds = version_check_seconds
+        self.client_max_age = client_max_age
+        self._version = None
+        self._version_checked_at = 0.0
+        self._lock = threading.Lock()
+
+    async def refresh_version(self, db) -> str:
+        """Returns the warehouse refresh version, re-reading it when the last check is stale."""
+        with self._lock:
+            if self._version is not None and \
+                    time.monotonic() - self._version_checked_at < self.version_check_seconds:
+                return self._version
+        try:
+            version = str((await db.execute(REFRESH_VERSION_SQL)).scalar() or 0)
+        except SQLAlchemyError:
+            # No dbt run has stamped a version yet; entries then only expire by TTL
+            await db.rollback()
+            version = "0"
+        with self._lock:
+            self._version, self._version_checked_at = version, time.monotonic()
+        return version
+
+    async def respond(self, request: Request, db, compute: Callable, model: Optional[type] = None) -> Response:
+        """
+        Serves a cached response for the request, computing it on a miss.
+
+        Args:
+            request (Request): The incoming request (path, query and If-None-Match).
+            db: Async SQLAlchemy session, only used when the version needs
+                re-reading or the entry is missing.
+            compute (Callable): Coroutine function returning the rows of the response.
+            model (type): Optional pydantic model each row is validated against.
+
+        Returns:
+            Response: 200 with the JSON body, or 304 if the client's copy is current.
+        """
+        # Percent-encoded, so '&' or '=' inside a value cannot make two queries share a key
+        query = urlencode(sorted(request.query_params.multi_items()))
+        key = f"{await self.refresh_version(db)}:{request.url.path}?{query}"
+
+        entry = await self.backend.get(key)
+        if entry is None:
+            rows = await compute()
+            if model is not None:
+                rows = [model.model_validate(dict(row)) for row in rows]
+            body = json.dumps(jsonable_encoder(rows), separators=(",", ":"))
+            entry = (body, f'"{hashlib.sha1(body.encode("utf-8")).hexdigest()}"')
+            await self.backend.set(key, entry, self.ttl)
+
+        body, etag = entry
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={self.client_max_age}"}
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+def create_cache() -> ResponseCache:
+    """Builds the app's cache, on the shared backend when API_CACHE_URL is set."""
+    return ResponseCache(backend=RedisBackend(CACHE_URL) if CACHE_URL else MemoryBackend())
@@ -0,0 +1,137 @@
+import io
+from datetime import date
+from typing import Optional
+
+from fastapi import HTTPException
+
+# Exportable marts and the date column their date-range predicates apply to
+MARTS = {
+    "fct_messages": "date_key",
+    "fct_image_detections": "date_key",
+    "dim_channels": None,
+    "dim_dates": "date_key",
+}
+
+# Escapes in COPY's text format, other than the escaped backslash itself
+COPY_ESCAPES = (("\\n", "\n"), ("\\r", "\r"), ("\\t", "\t"),
+                ("\\b", "\b"), ("\\f", "\f"), ("\\v", "\v"))
+
+
+def arrow_type(data_type: str):
+    """Maps a Postgres data type to (Arrow type, SQL cast or None); unknown types go out as text."""
+    import pyarrow as pa
+    types = {
+        "smallint": (pa.int16(), None),
+        "integer": (pa.int32(), None),
+        "bigint": (pa.int64(), None),
+        "real": (pa.float32(), None),
+        "double precision": (pa.float64(), None),
+        # EXTRACT() and AVG() produce numeric; doubles are what analysts want
+        "numeric": (pa.float64(), "double precision"),
+        "boolean": (pa.bool_(), None),
+        "text": (pa.string(), None),
+        "character varying": (pa.string(), None),
+        "date": (pa.date32(), None),
+        "timestamp without time zone": (pa.timestamp("us"), None),
+        "timestamp with time zone": (pa.timestamp("us", tz="UTC"), "timestamptz"),
+    }
+    return types.get(data_type, (pa.string(), "text"))
+
+
+def build_export_query(mart: str, columns: dict, selected: list,
+                       start_date: Optional[date] = None, end_date: Optional[date] = None):
+    """
+    Builds the projection + date-range query for a mart export.
+
+    The dates are validated `date` objects, so they are inlined as literals:
+    COPY cannot take bind parameters.
+
+    Returns:
+        tuple: (SQL string, arrow schema)
+    """
+    import pyarrow as pa
+
+    fields, expressions = [], []
+    for name in selected:
+        arrow, cast = arrow_type(columns[name])
+        fields.append(pa.field(name, arrow))
+        if cast == "timestamptz":
+            # Rendered in UTC without an offset; the Arrow column carries the zone
+            expressions.append(f"(\"{name}\" AT TIME ZONE 'UTC') AS \"{name}\"")
+        elif cast:
+            expressions.append(f'"{name}"::{cast} AS "{name}"')
+        else:
+            expressions.append(f'"{name}"')
+
+    filters = []
+    date_column = MARTS[mart]
+    if (start_date or end_date) and not date_column:
+        raise HTTPException(status_code=400, detail=f"{mart} has no date column to filter on")
+    if start_date:
+        filters.append(f"\"{date_column}\" >= DATE '{start_date.isoformat()}'")
+    if end_date:
+        filters.append(f"\"{date_column}\" <= DATE '{end_date.isoformat()}'")
+
+    sql = f"SELECT {', '.join(expressions)} FROM marts.{mart}"
+    if filters:
+        sql += " WHERE " + " AND ".join(filters)
+    return sql, pa.schema(fields)
+
+
+def _unescape(array):
+    """Undoes COPY text-format escaping in a string column, vectorised in Arrow."""
+    import pyarrow.compute as pc
+    if not pc.any(pc.match_substring(array, "\\")).as_py():
+        return array
+    # NUL cannot occur in Postgres text, so it safely stands in for escaped backslashes
+    array = pc.replace_substring(array, "\\\\", "\x00")
+    for escaped, char in COPY_ESCAPES:
+        array = pc.replace_substring(array, escaped, char)
+    return pc.replace_substring(array, "\x00", "\\")
+
+
+def parse_copy_text(block: bytes, schema):
+    """
+    Parses whole lines of COPY ... TO STDOUT (text format) into an Arrow table.
+
+    Text format escapes newlines inside values, so every row is exactly one
+    line and the stream can be cut at any newline. Parsing and conversion run
+    in Arrow's C++ CSV reader rather than per value in Python.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    parse_types = {field.name: pa.timestamp(field.type.unit) if pa.types.is_timestamp(field.type) else field.type
+                   for field in schema}
+    table = pacsv.read_csv(
+        io.BytesIO(block),
+        read_options=pacsv.ReadOptions(column_names=schema.names),
+        parse_options=pacsv.ParseOptions(delimiter="\t", quote_char=False, escape_char=False),
+        convert_options=pacsv.ConvertOptions(column_types=parse_types, null_values=["\\N"],
+                                             strings_can_be_null=True,
+                                             true_values=["t"], false_values=["f"]),
+    )
+    columns = [_unescape(column) if pa.types.is_string(column.type) else column for column in table.columns]
+    return pa.Table.from_arrays(columns, names=schema.names).cast(schema)
+
+
+class ChunkSink:
+    """File-like object collecting what the Arrow/Parquet writers emit, drained per batch."""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
@@ -1,5 +1,7 @@
 import os
-from sqlalchemy import create_engine
+from contextlib import asynccontextmanager
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -23,5 +25,50 @@ engine = create_engine(
 # Create a SessionLocal class for database requests
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# --- Async engine (asyncpg) used by the API endpoints ---
+# Pool and timeout settings are tunable from the environment
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+# Seconds a request may wait for a free pooled connection
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+# Per-statement limit, enforced by Postgres and by the asyncpg client
+DB_STATEMENT_TIMEOUT = float(os.getenv("DB_STATEMENT_TIMEOUT", 15))
+# Prepared statements cached per connection (0 when behind pgbouncer in transaction mode)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1) \
+    .replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    connect_args={
+        # Same search_path as the sync engine above
+        "server_settings": {
+            "search_path": "staging,public",
+            "statement_timeout": str(int(DB_STATEMENT_TIMEOUT * 1000)),
+        },
+        "command_timeout": DB_STATEMENT_TIMEOUT,
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+    },
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
 # Base class for our database models
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+@asynccontextmanager
+async def stream_connection():
+    """
+    Yields an async connection for long server-side-cursor streams.
+
+    The per-statement timeout is lifted for this connection's transaction only,
+    since a large stream legitimately outlives it; other requests keep it.
+    """
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SET LOCAL statement_timeout = 0"))
+        yield conn
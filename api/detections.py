@@ -0,0 +1,68 @@
+import json
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import text
+
+# Sort key of the detections feed; the keyset cursor carries these four values
+DETECTION_ORDER = ("date_key", "channel_key", "message_id", "detection_id")
+
+
+def build_detections_query(detected_class: Optional[str] = None, image_category: Optional[str] = None,
+                           min_confidence: Optional[float] = None, channel: Optional[str] = None,
+                           start_date: Optional[date] = None, end_date: Optional[date] = None,
+                           after: Optional[list] = None, limit: Optional[int] = None):
+    """
+    Builds the filtered detections feed, ordered by (date_key, channel_key,
+    message_id, detection_id): message ids are only unique within a channel.
+
+    `after` is that sort key of the last row already seen, so each page starts
+    with an index range scan instead of skipping rows with OFFSET. Without a
+    `limit` every remaining row is returned (used by the streaming mode).
+
+    Returns:
+        tuple: (TextClause, params). With a limit, one extra row is requested
+               so the caller knows whether a next page exists.
+    """
+    filters, params = [], {}
+    if detected_class:
+        filters.append("d.detected_class = :detected_class")
+        params["detected_class"] = detected_class
+    if image_category:
+        filters.append("d.image_category = :image_category")
+        params["image_category"] = image_category
+    if min_confidence is not None:
+        filters.append("d.confidence_score >= :min_confidence")
+        params["min_confidence"] = min_confidence
+    if channel:
+        filters.append("c.channel_name = :channel")
+        params["channel"] = channel
+    if start_date:
+        filters.append("d.date_key >= :start_date")
+        params["start_date"] = start_date
+    if end_date:
+        filters.append("d.date_key <= :end_date")
+        params["end_date"] = end_date
+    if after:
+        filters.append("(d.date_key, d.channel_key, d.message_id, d.detection_id) > "
+                       "(:after_date, :after_channel, :after_message, :after_detection)")
+        params.update(after_date=date.fromisoformat(after[0]), after_channel=after[1],
+                      after_message=after[2], after_detection=after[3])
+
+    sql = f"""
+        SELECT d.detection_id, d.message_id, d.date_key, d.channel_key, c.channel_name,
+               d.detected_class, d.confidence_score, d.image_category
+        FROM marts.fct_image_detections d
+        JOIN marts.dim_channels c ON d.channel_key = c.channel_key
+        {'WHERE ' + ' AND '.join(filters) if filters else ''}
+        ORDER BY d.date_key, d.channel_key, d.message_id, d.detection_id
+    """
+    if limit is not None:
+        sql += " LIMIT :limit"
+        params["limit"] = limit + 1
+    return text(sql), params
+
+
+def ndjson_lines(rows) -> str:
+    """Serialises a batch of detection rows as newline-delimited JSON."""
+    return "".join(json.dumps(dict(row), default=str, separators=(",", ":")) + "\n" for row in rows)
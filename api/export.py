@@ -0,0 +1,138 @@
+import os
+import asyncio
+from contextlib import suppress
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+
+from . import database
+from .columnar import MARTS, ChunkSink, build_export_query, parse_copy_text
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+# Bytes of COPY output parsed into one Arrow table / Parquet row group
+EXPORT_CHUNK_BYTES = int(os.getenv("API_EXPORT_CHUNK_BYTES", 16 * 1024 * 1024))
+# Upper bound for one export's COPY, in seconds (the per-request statement timeout does not apply)
+EXPORT_TIMEOUT = float(os.getenv("API_EXPORT_TIMEOUT", 3600))
+
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+COLUMNS_SQL = text("""
+    SELECT column_name, data_type
+    FROM information_schema.columns
+    WHERE table_schema = 'marts' AND table_name = :mart
+    ORDER BY ordinal_position
+""")
+
+async def mart_columns(mart: str) -> dict:
+    """
+    Returns {column: data_type} for a mart. Read on every export (one catalog
+    query), so columns added or dropped by a dbt run show up immediately.
+    """
+    async with database.async_engine.connect() as conn:
+        rows = (await conn.execute(COLUMNS_SQL, {"mart": mart})).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"marts.{mart} does not exist yet")
+    return dict(rows)
+
+
+async def stream_export(sql: str, schema, fmt: str):
+    """
+    Streams a query as Arrow IPC or Parquet bytes.
+
+    The rows leave Postgres through COPY (text format) on the asyncpg
+    connection and are parsed by Arrow in chunks of EXPORT_CHUNK_BYTES, so no
+    Python object is created per value. A bounded queue between the COPY task
+    and this generator applies backpressure when the client reads slowly.
+    When the client disconnects, the COPY is cancelled and awaited, so its
+    pooled connection is released before the generator returns.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    queue = asyncio.Queue(maxsize=8)
+
+    async def copy():
+        try:
+            async with database.stream_connection() as conn:
+                raw = (await conn.get_raw_connection()).driver_connection
+                await raw.copy_from_query(sql, output=queue.put, format="text", timeout=EXPORT_TIMEOUT)
+        finally:
+            await queue.put(None)
+
+    task = asyncio.create_task(copy())
+    chunks = ChunkSink()
+    sink = pa.PythonFile(chunks, mode="w")
+    writer = pa.ipc.new_stream(sink, schema) if fmt == "arrow" else pq.ParquetWriter(sink, schema)
+    closed = False
+    try:
+        pending, size = [], 0
+        while True:
+            data = await queue.get()
+            if data is not None:
+                pending.append(data)
+                size += len(data)
+            if size >= EXPORT_CHUNK_BYTES or (data is None and size):
+                block = b"".join(pending)
+                # Keep a trailing partial line for the next chunk
+                cut = len(block) if data is None else block.rfind(b"\n") + 1
+                if cut:
+                    writer.write_table(parse_copy_text(block[:cut], schema))
+                    yield chunks.drain()
+                pending, size = [block[cut:]], len(block) - cut
+            if data is None:
+                break
+        await task  # surfaces COPY errors
+        writer.close()
+        closed = True
+        yield chunks.drain()
+    finally:
+        if not task.done():
+            task.cancel()
+            # Empty the queue so the cancelled COPY's end marker does not wait
+            # on a full queue, then let it release its connection
+            while not queue.empty():
+                queue.get_nowait()
+            await asyncio.gather(task, return_exceptions=True)
+        if not closed:
+            with suppress(Exception):
+                writer.close()
+
+
+@router.get("/{mart}")
+async def export_mart(
+    mart: str,
+    format: str = Query("arrow", pattern="^(arrow|parquet)$", description="'arrow' (IPC stream) or 'parquet'"),
+    columns: Optional[str] = Query(None, description="Comma-separated projection; default is every column but search vectors"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+):
+    """Bulk export of a warehouse mart as Arrow IPC or Parquet, streamed chunk by chunk."""
+    if mart not in MARTS:
+        raise HTTPException(status_code=404, detail=f"Unknown mart; choose one of {', '.join(MARTS)}")
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Exports need the 'pyarrow' package on the API server")
+
+    available = await mart_columns(mart)
+    if columns:
+        selected = [name.strip() for name in columns.split(",") if name.strip()]
+    else:
+        selected = [name for name, data_type in available.items() if data_type != "tsvector"]
+    unknown = [name for name in selected if name not in available]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown) or '(none selected)'}")
+
+    sql, schema = build_export_query(mart, available, selected, start_date, end_date)
+    return StreamingResponse(
+        stream_export(sql, schema, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{mart}.{format}"'},
+    )
@@ -1,12 +1,20 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from typing import List
+from typing import List, Optional
+from datetime import date
+import asyncio
 import os
 
 # Internal project imports
-from . import database, schemas
+from . import database, schemas, export
+from .pagination import encode_cursor, decode_cursor, NEXT_CURSOR_HEADER
+from .search import build_search_query
+from .cache import create_cache
+from .detections import build_detections_query, ndjson_lines
+from .trends import build_channel_trends_query, build_detection_trends_query
 
 
 app = FastAPI(
@@ -15,27 +23,41 @@ app = FastAPI(
     version="1.1.0"
 )
 
-# Dependency to get the database session
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    except SQLAlchemyError as e:
-        # Avoid printing sensitive details in production
-        print(f"Database Connection Error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Database connection failed")
-    finally:
-        db.close()
+# Columnar bulk exports (/export/{mart})
+app.include_router(export.router)
+
+# Aggregate responses, cached until the next dbt run
+response_cache = create_cache()
+
+# Rows fetched per round trip from the server-side cursor in streaming mode
+STREAM_BATCH_ROWS = int(os.getenv("API_STREAM_BATCH_ROWS", 1000))
+
+# SQLSTATE of a statement cancelled by statement_timeout
+QUERY_CANCELED = "57014"
+
+# Dependency to get an async database session from the asyncpg pool
+async def get_db():
+    async with database.AsyncSessionLocal() as db:
+        try:
+            yield db
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Database query timed out")
+        except SQLAlchemyError as e:
+            if getattr(getattr(e, "orig", None), "sqlstate", None) == QUERY_CANCELED:
+                raise HTTPException(status_code=504, detail="Database query timed out")
+            # Avoid printing sensitive details in production
+            print(f"Database Connection Error: {str(e)}")
+            raise HTTPException(status_code=500, detail="Database connection failed")
 
 @app.get("/")
-def root():
+async def root():
     return {"message": "Medical Data Warehouse API is Live", "docs": "/docs"}
 
 # --- TASK 3 & 4: ANALYTICAL ENDPOINTS ---
 
 @app.get("/analytics/channel-activity", response_model=List[schemas.ChannelActivity])
-def get_channel_activity(db: Session = Depends(get_db)):
-    """Requirement: Reports message volume per channel."""
+async def get_channel_activity(request: Request, db: AsyncSession = Depends(get_db)):
+    """Requirement: Reports message volume per channel (cached until the next warehouse refresh)."""
     sql = text("""
         SELECT c.channel_name, count(f.message_id) as message_count 
         FROM marts.fct_messages f
@@ -43,45 +65,123 @@ def get_channel_activity(db: Session = Depends(get_db)):
         GROUP BY c.channel_name 
         ORDER BY message_count DESC
     """)
-    return db.execute(sql).mappings().all()
+    async def compute():
+        return (await db.execute(sql)).mappings().all()
+    return await response_cache.respond(request, db, compute, model=schemas.ChannelActivity)
 
 @app.get("/analytics/search", response_model=List[schemas.MessageSearch])
-def search_messages(
+async def search_messages(
+    response: Response,
     query: str = Query(..., min_length=3, description="Text to search for in messages"), 
-    db: Session = Depends(get_db)
+    channel: Optional[str] = Query(None, description="Only messages from this channel"),
+    start_date: Optional[date] = Query(None, description="Earliest message date (inclusive)"),
+    end_date: Optional[date] = Query(None, description="Latest message date (inclusive)"),
+    substring: bool = Query(True, description="Also match the text anywhere inside words"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description=f"Value of the {NEXT_CURSOR_HEADER} header of the previous page"),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Requirement: Message Search endpoint with ILIKE pattern matching."""
-    sql = text("""
-        SELECT message_id, channel_key, message_text, timestamp 
-        FROM marts.fct_messages 
-        WHERE message_text ILIKE :q
-        LIMIT 50
-    """)
-    return db.execute(sql, {"q": f"%{query}%"}).mappings().all()
+    """Requirement: Message Search endpoint, ranked full-text + substring matching with keyset pages."""
+    after = decode_cursor(cursor, 3) if cursor else None
+    try:
+        sql, params = build_search_query(query, channel, start_date, end_date, limit, after, substring)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows = (await db.execute(sql, params)).mappings().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor((last["rank"], last["channel_key"], last["message_id"]))
+    return rows
 
 @app.get("/analytics/visual-report", response_model=List[schemas.VisualReport])
-def get_visual_content_report(db: Session = Depends(get_db)):
-    """Requirement: Summary of detections grouped by the new image_category field."""
+async def get_visual_content_report(request: Request, db: AsyncSession = Depends(get_db)):
+    """Requirement: Summary of detections grouped by the new image_category field (cached)."""
     sql = text("""
         SELECT image_category, count(*) as detection_count, AVG(confidence_score) as avg_confidence
         FROM marts.fct_image_detections 
         GROUP BY image_category
         ORDER BY detection_count DESC
     """)
-    return db.execute(sql).mappings().all()
+    async def compute():
+        return (await db.execute(sql)).mappings().all()
+    return await response_cache.respond(request, db, compute, model=schemas.VisualReport)
+
+@app.get("/analytics/trends/channels", response_model=List[schemas.ChannelTrend])
+async def get_channel_trends(
+    request: Request,
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    channel: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Messages, views, forwards and image share per channel per day/week/month, from the daily rollup (cached)."""
+    sql, params = build_channel_trends_query(granularity, start_date, end_date, channel)
+    async def compute():
+        return (await db.execute(sql, params)).mappings().all()
+    return await response_cache.respond(request, db, compute, model=schemas.ChannelTrend)
+
+@app.get("/analytics/trends/detections", response_model=List[schemas.DetectionTrend])
+async def get_detection_trends(
+    request: Request,
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    channel: Optional[str] = Query(None),
+    detected_class: Optional[str] = Query(None),
+    image_category: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """Detections and weighted confidence per class and category per day/week/month, from the daily rollup (cached)."""
+    sql, params = build_detection_trends_query(granularity, start_date, end_date, channel,
+                                               detected_class, image_category)
+    async def compute():
+        return (await db.execute(sql, params)).mappings().all()
+    return await response_cache.respond(request, db, compute, model=schemas.DetectionTrend)
+
+async def stream_rows(sql, params):
+    """Streams query rows as NDJSON from a server-side cursor, one batch at a time."""
+    async with database.stream_connection() as conn:
+        result = await conn.stream(sql.execution_options(yield_per=STREAM_BATCH_ROWS), params)
+        async for batch in result.mappings().partitions(STREAM_BATCH_ROWS):
+            yield ndjson_lines(batch)
 
 @app.get("/analytics/detections", response_model=List[schemas.DetectionDetail])
-def get_detailed_detections(db: Session = Depends(get_db)):
-    """Requirement: Aligned detections with date_key, detected_class, and confidence_score."""
-    sql = text("""
-        SELECT message_id, date_key, detected_class, confidence_score, image_category 
-        FROM marts.fct_image_detections
-        LIMIT 100
-    """)
-    return db.execute(sql).mappings().all()
+async def get_detailed_detections(
+    response: Response,
+    detected_class: Optional[str] = Query(None, description="YOLO label, e.g. 'bottle'"),
+    image_category: Optional[str] = Query(None, description="'Medication' or 'Medical Equipment'"),
+    min_confidence: Optional[float] = Query(None, ge=0, le=1),
+    channel: Optional[str] = Query(None),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description=f"Value of the {NEXT_CURSOR_HEADER} header of the previous page"),
+    stream: bool = Query(False, description="Stream every matching row as NDJSON instead of one page"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Requirement: Aligned detections with date_key, detected_class, and confidence_score, keyset-paginated."""
+    after = decode_cursor(cursor, 4) if cursor else None
+    try:
+        sql, params = build_detections_query(detected_class, image_category, min_confidence, channel,
+                                             start_date, end_date, after, None if stream else limit)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if stream:
+        return StreamingResponse(stream_rows(sql, params), media_type="application/x-ndjson")
+
+    rows = (await db.execute(sql, params)).mappings().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            (last["date_key"].isoformat(), last["channel_key"], last["message_id"], last["detection_id"]))
+    return rows
 
 # --- HEALTH & DEBUG ---
 
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "healthy", "environment": os.getenv("ENV", "development")}
\ No newline at end of file
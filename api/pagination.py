@@ -0,0 +1,25 @@
+import base64
+import json
+
+from fastapi import HTTPException
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values) -> str:
+    """Packs the sort key of the last row on a page into an opaque URL-safe token."""
+    raw = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Unpacks a token from encode_cursor; malformed tokens are a client error."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
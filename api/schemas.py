@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 
 # --- Channel Analytics ---
 class ChannelActivity(BaseModel):
@@ -14,16 +14,20 @@ class ChannelActivity(BaseModel):
 class MessageSearch(BaseModel):
     message_id: int
     channel_key: int
+    channel_name: Optional[str] = None
     message_text: Optional[str]
-    timestamp: datetime
+    timestamp: Optional[datetime]
+    rank: float = 0.0
 
     class Config:
         from_attributes = True
 
 # --- Detection Detail
 class DetectionDetail(BaseModel):
+    detection_id: int
     message_id: int
-    date_key: int
+    date_key: date
+    channel_name: Optional[str] = None
     detected_class: str      
     confidence_score: float  
     image_category: str      
@@ -38,4 +42,27 @@ class VisualReport(BaseModel):
     avg_confidence: float
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# --- Trends (daily rollups, bucketed by day/week/month) ---
+class ChannelTrend(BaseModel):
+    bucket: date
+    channel_name: str
+    message_count: int
+    image_message_count: int
+    image_share: float
+    total_views: int
+    total_forwards: int
+
+    class Config:
+        from_attributes = True
+
+class DetectionTrend(BaseModel):
+    bucket: date
+    detected_class: str
+    image_category: str
+    detection_count: int
+    avg_confidence: float
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,73 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+
+# Both configurations are queried so stemmed English words and exact tokens
+# (Amharic, drug names, prices) match against fct_messages.search_vector
+TSQUERY_SQL = "(websearch_to_tsquery('english', :query) || websearch_to_tsquery('simple', :query))"
+
+
+def like_pattern(query: str) -> str:
+    """Escapes LIKE wildcards so the user's text is matched literally as a substring."""
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def build_search_query(query: str, channel: Optional[str] = None,
+                       start_date: Optional[date] = None, end_date: Optional[date] = None,
+                       limit: int = 50, after: Optional[list] = None, substring: bool = True):
+    """
+    Builds the ranked message search.
+
+    A message matches when its search_vector matches the full-text query (GIN
+    index) or, with `substring`, when its text contains the query anywhere
+    (pg_trgm GIN index), which catches partial and inflected Amharic words.
+    Rows are ordered by rank, then (channel_key, message_id) as a tie-breaker,
+    and `after` holds that sort key of the previous page's last row, so pages
+    are read with a keyset predicate instead of an OFFSET.
+
+    Returns:
+        tuple: (TextClause, params). One row more than `limit` is requested so
+               the caller knows whether a next page exists.
+
+    Raises:
+        TypeError, ValueError: If `after` does not hold a number and two integers.
+    """
+    params = {"query": query, "limit": limit + 1}
+    if substring:
+        filters = [f"(f.search_vector @@ {TSQUERY_SQL} OR f.message_text ILIKE :pattern)"]
+        params["pattern"] = like_pattern(query)
+    else:
+        filters = [f"f.search_vector @@ {TSQUERY_SQL}"]
+    if channel:
+        filters.append("c.channel_name = :channel")
+        params["channel"] = channel
+    if start_date:
+        filters.append("f.message_timestamp >= :start_date")
+        params["start_date"] = datetime.combine(start_date, time.min)
+    if end_date:
+        filters.append("f.message_timestamp < :end_before")
+        params["end_before"] = datetime.combine(end_date + timedelta(days=1), time.min)
+
+    keyset = ""
+    if after:
+        # rank is a real: compare against a real, not the double the client saw
+        keyset = "WHERE (rank, channel_key, message_id) < (CAST(:after_rank AS real), :after_channel, :after_id)"
+        # Coerced here so a tampered cursor fails before it reaches SQL (TypeError/ValueError)
+        params.update(after_rank=float(after[0]), after_channel=int(after[1]), after_id=int(after[2]))
+
+    sql = text(f"""
+        SELECT * FROM (
+            SELECT f.message_id, f.channel_key, c.channel_name, f.message_text,
+                   f.message_timestamp AS timestamp,
+                   ts_rank(f.search_vector, {TSQUERY_SQL}) AS rank
+            FROM marts.fct_messages f
+            JOIN marts.dim_channels c ON f.channel_key = c.channel_key
+            WHERE {' AND '.join(filters)}
+        ) matches
+        {keyset}
+        ORDER BY rank DESC, channel_key DESC, message_id DESC
+        LIMIT :limit
+    """)
+    return sql, params
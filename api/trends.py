@@ -0,0 +1,90 @@
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import text
+
+# Bucket sizes accepted by the trend endpoints, passed to date_trunc()
+GRANULARITIES = ("day", "week", "month")
+
+
+def _date_filters(alias: str, start_date: Optional[date], end_date: Optional[date], filters: list, params: dict):
+    if start_date:
+        filters.append(f"{alias}.date_key >= :start_date")
+        params["start_date"] = start_date
+    if end_date:
+        filters.append(f"{alias}.date_key <= :end_date")
+        params["end_date"] = end_date
+
+
+def build_channel_trends_query(granularity: str = "day", start_date: Optional[date] = None,
+                               end_date: Optional[date] = None, channel: Optional[str] = None):
+    """
+    Builds the per-channel message trend over marts.agg_channel_daily.
+
+    Weeks and months are summed from the daily rows, and the image share is
+    re-derived from the summed counts rather than averaged.
+
+    Returns:
+        tuple: (TextClause, params)
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    filters, params = [], {"granularity": granularity}
+    _date_filters("a", start_date, end_date, filters, params)
+    if channel:
+        filters.append("c.channel_name = :channel")
+        params["channel"] = channel
+
+    return text(f"""
+        SELECT date_trunc(:granularity, a.date_key::timestamp)::date AS bucket,
+               c.channel_name,
+               sum(a.message_count) AS message_count,
+               sum(a.image_message_count) AS image_message_count,
+               sum(a.image_message_count)::float / nullif(sum(a.message_count), 0) AS image_share,
+               sum(a.total_views) AS total_views,
+               sum(a.total_forwards) AS total_forwards
+        FROM marts.agg_channel_daily a
+        JOIN marts.dim_channels c ON a.channel_key = c.channel_key
+        {'WHERE ' + ' AND '.join(filters) if filters else ''}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    """), params
+
+
+def build_detection_trends_query(granularity: str = "day", start_date: Optional[date] = None,
+                                 end_date: Optional[date] = None, channel: Optional[str] = None,
+                                 detected_class: Optional[str] = None, image_category: Optional[str] = None):
+    """
+    Builds the detection trend per class and image category over marts.agg_detections_daily.
+
+    The average confidence of a bucket is weighted by detections
+    (sum of confidences / count), not a mean of daily means.
+
+    Returns:
+        tuple: (TextClause, params)
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    filters, params = [], {"granularity": granularity}
+    _date_filters("a", start_date, end_date, filters, params)
+    if channel:
+        filters.append("a.channel_key = (SELECT channel_key FROM marts.dim_channels WHERE channel_name = :channel)")
+        params["channel"] = channel
+    if detected_class:
+        filters.append("a.detected_class = :detected_class")
+        params["detected_class"] = detected_class
+    if image_category:
+        filters.append("a.image_category = :image_category")
+        params["image_category"] = image_category
+
+    return text(f"""
+        SELECT date_trunc(:granularity, a.date_key::timestamp)::date AS bucket,
+               a.detected_class,
+               a.image_category,
+               sum(a.detection_count) AS detection_count,
+               sum(a.confidence_sum)::float / nullif(sum(a.detection_count), 0) AS avg_confidence
+        FROM marts.agg_detections_daily a
+        {'WHERE ' + ' AND '.join(filters) if filters else ''}
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+    """), params
@@ -0,0 +1,140 @@
+"""
+Module: bench_api_load.py
+Description: Load-tests the API's database layer, sync vs. async. The async side is the
+             real service (api.main:app on the asyncpg pool); the sync side is the same
+             search query served by blocking def endpoints on the psycopg2 SessionLocal,
+             as the API did before. Each server runs in its own uvicorn process against
+             the local PostgreSQL, and a pool of concurrent HTTP clients hammers the
+             same URL for a fixed duration.
+Author: Addisu
+
+Usage:
+    python benchmarks/bench_api_load.py --clients 200 --duration 20
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+from typing import List
+
+import httpx
+from fastapi import Depends, FastAPI
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Make 'api.*' importable when run from the project root
+sys.path.insert(0, ROOT)
+
+# --- Sync baseline: blocking sessions on the threadpool ---
+sync_app = FastAPI()
+
+
+def get_sync_db():
+    from api import database
+    db = database.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _sync_search_response_model():
+    from api import schemas
+    return List[schemas.MessageSearch]
+
+
+@sync_app.get("/health")
+def sync_health():
+    return {"status": "healthy"}
+
+
+@sync_app.get("/analytics/search", response_model=_sync_search_response_model())
+def sync_search(query: str, limit: int = 50, substring: bool = True, db=Depends(get_sync_db)):
+    from api.search import build_search_query
+    sql, params = build_search_query(query, limit=limit, substring=substring)
+    return db.execute(sql, params).mappings().all()[:limit]
+
+
+def start_server(app: str, port: int, app_dir: str) -> subprocess.Popen:
+    """Starts uvicorn in a subprocess and waits until /health answers."""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', app, '--app-dir', app_dir, '--port', str(port),
+         '--log-level', 'warning'],
+        cwd=ROOT
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{app} did not start on port {port}")
+
+
+async def load(url: str, clients: int, duration: float) -> dict:
+    """Runs `clients` concurrent request loops for `duration` seconds."""
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append((time.perf_counter() - started) * 1000)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+    return {'requests': len(latencies), 'errors': errors, 'rps': len(latencies) / elapsed,
+            'p50': pick(0.50), 'p99': pick(0.99)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='API load test: sync vs. async database layer')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=20)
+    # An index-only lookup by default, so the database layer rather than ranking dominates
+    parser.add_argument('--path', default='/analytics/search?query=ibuprofen&substring=false&limit=20')
+    parser.add_argument('--modes', nargs='+', default=['sync', 'async'])
+    args = parser.parse_args()
+
+    servers = {'sync': ('bench_api_load:sync_app', os.path.dirname(os.path.abspath(__file__)), 8701),
+               'async': ('api.main:app', ROOT, 8702)}
+    results = {}
+    for mode in args.modes:
+        app, app_dir, port = servers[mode]
+        process = start_server(app, port, app_dir)
+        try:
+            url = f"http://127.0.0.1:{port}{args.path}"
+            asyncio.run(load(url, min(args.clients, 10), 2))  # warm up the pools
+            results[mode] = asyncio.run(load(url, args.clients, args.duration))
+        finally:
+            process.terminate()
+            process.wait()
+
+    print(f"\n{args.clients} clients, {args.duration:.0f}s, GET {args.path}")
+    print(f"{'mode':>6} | {'requests':>8} | {'errors':>6} | {'req/s':>8} | {'p50 ms':>8} | {'p99 ms':>8}")
+    for mode, stats in results.items():
+        print(f"{mode:>6} | {stats['requests']:>8} | {stats['errors']:>6} | {stats['rps']:>8.1f} | "
+              f"{stats['p50']:>8.1f} | {stats['p99']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
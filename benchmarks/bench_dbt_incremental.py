@@ -0,0 +1,146 @@
+"""
+Module: bench_dbt_incremental.py
+Description: Measures `dbt run` time for the incremental models against a full
+             refresh. A throwaway database on the local PostgreSQL server is filled
+             with synthetic raw.telegram_messages / raw.detection_results history,
+             built once with --full-refresh, then a "day" of new and edited
+             messages is ingested and the incremental run is timed.
+Author: Addisu
+
+Usage:
+    python benchmarks/bench_dbt_incremental.py --rows 2000000 --daily 20000
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import subprocess
+
+import psycopg2
+
+DBT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'kara_dbt'))
+
+PROFILE = """kara_dbt:
+  target: bench
+  outputs:
+    bench:
+      type: postgres
+      host: 127.0.0.1
+      port: 5432
+      user: "{user}"
+      password: "{password}"
+      dbname: {db_name}
+      schema: public
+      threads: 4
+"""
+
+
+def _admin_connection():
+    conn = psycopg2.connect(host="127.0.0.1", port=5432, database="postgres",
+                            user=os.getenv("POSTGRES_USER"), password=os.getenv("POSTGRES_PASSWORD"))
+    conn.autocommit = True
+    return conn
+
+
+def ingest(conn, first_id: int, rows: int, channels: int, edited: int = 0) -> None:
+    """
+    Appends `rows` synthetic messages (every fifth with an image and a detection)
+    and re-ingests `edited` existing ones with new view counts, the way
+    ingest_to_db.py's upsert bumps ingested_at.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO raw.telegram_messages (channel, content)
+            SELECT 'channel_' || (g %% %(channels)s),
+                   jsonb_build_object(
+                       'id', g,
+                       'date', (timestamp '2024-01-01' + (g %% 730) * interval '1 day')::text,
+                       'text', 'Paracetamol 500mg tablets, message ' || g,
+                       'views', g %% 5000, 'forwards', g %% 40,
+                       'image_path', CASE WHEN g %% 5 = 0 THEN 'img_' || g || '.jpg' END)
+            FROM generate_series(%(first)s, %(last)s) g
+        """, {"first": first_id, "last": first_id + rows - 1, "channels": channels})
+        cur.execute("""
+            INSERT INTO raw.detection_results (message_id, channel, image_path, label, confidence)
+            SELECT g, 'channel_' || (g %% %(channels)s), 'img_' || g || '.jpg',
+                   (ARRAY['pill', 'bottle', 'syrup'])[1 + g %% 3], (g %% 97) / 97.0
+            FROM generate_series(%(first)s, %(last)s) g WHERE g %% 5 = 0
+        """, {"first": first_id, "last": first_id + rows - 1, "channels": channels})
+        if edited:
+            cur.execute("""
+                UPDATE raw.telegram_messages
+                SET content = jsonb_set(content, '{views}', to_jsonb((content->>'views')::int + 1)),
+                    ingested_at = CURRENT_TIMESTAMP
+                WHERE (content->>'id')::int %% %(step)s = 0 AND (content->>'id')::int < %(first)s
+            """, {"step": max(1, first_id // edited), "first": first_id})
+    conn.commit()
+
+
+def dbt_run(profiles_dir: str, *args) -> float:
+    """Runs dbt in kara_dbt/ and returns the wall time in seconds."""
+    started = time.perf_counter()
+    subprocess.run(["dbt", "run", "--profiles-dir", profiles_dir, "--vars",
+                    "{enable_trigram_search: false, incremental_lookback_minutes: 0}", *args],
+                   cwd=DBT_DIR, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='dbt run time: full refresh vs. incremental')
+    parser.add_argument('--rows', type=int, default=2000000, help="Messages of history")
+    parser.add_argument('--daily', type=int, default=20000, help="New messages per day")
+    parser.add_argument('--edited', type=int, default=5000, help="Older messages re-ingested with new counts")
+    parser.add_argument('--channels', type=int, default=8)
+    args = parser.parse_args()
+
+    db_name = f"bench_dbt_{os.getpid()}"
+    admin = _admin_connection()
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE DATABASE {db_name}")
+    conn = psycopg2.connect(host="127.0.0.1", port=5432, database=db_name,
+                            user=os.getenv("POSTGRES_USER"), password=os.getenv("POSTGRES_PASSWORD"))
+    try:
+        with conn.cursor() as cur:
+            cur.execute("CREATE SCHEMA raw")
+            cur.execute("""
+                CREATE TABLE raw.telegram_messages (
+                    id SERIAL PRIMARY KEY, channel TEXT, content JSONB,
+                    ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)
+            """)
+            cur.execute("CREATE INDEX ON raw.telegram_messages (ingested_at)")
+            cur.execute("""
+                CREATE TABLE raw.detection_results (
+                    message_id BIGINT, channel TEXT, image_path TEXT, label TEXT, confidence FLOAT,
+                    x_min FLOAT, y_min FLOAT, x_max FLOAT, y_max FLOAT,
+                    ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)
+            """)
+            cur.execute("CREATE INDEX ON raw.detection_results (ingested_at)")
+        conn.commit()
+
+        started = time.perf_counter()
+        ingest(conn, 1, args.rows, args.channels)
+        print(f"Loaded {args.rows} raw messages in {time.perf_counter() - started:.1f}s")
+
+        with tempfile.TemporaryDirectory() as profiles_dir:
+            with open(os.path.join(profiles_dir, "profiles.yml"), "w") as f:
+                f.write(PROFILE.format(user=os.getenv("POSTGRES_USER"),
+                                       password=os.getenv("POSTGRES_PASSWORD") or "", db_name=db_name))
+            full = dbt_run(profiles_dir, "--full-refresh")
+            print(f"dbt run --full-refresh over {args.rows} messages: {full:.1f}s")
+
+            ingest(conn, args.rows + 1, args.daily, args.channels, edited=args.edited)
+            incremental = dbt_run(profiles_dir)
+            print(f"dbt run after +{args.daily} new / {args.edited} edited messages: {incremental:.1f}s")
+            empty = dbt_run(profiles_dir)
+            print(f"dbt run with nothing new: {empty:.1f}s  (dbt start-up and hooks)")
+            print(f"\nIncremental run is {full / incremental:.1f}x faster than the full refresh")
+    finally:
+        conn.close()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {db_name}")
+        admin.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Module: bench_detection.py
+Description: Measures YOLO detection throughput (images/s) for different batch 
+             sizes and process-worker counts on a synthetic image set. Runs on a 
+             CPU-only machine; requires ultralytics (the weights are downloaded 
+             on first use).
+Author: Addisu
+
+Usage:
+    python benchmarks/bench_detection.py --images 256 --batch-sizes 1 8 16 --workers 1 2
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+import cv2
+import numpy as np
+
+# Make 'scripts.*' importable when run from the project root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts import yolo_detection
+
+
+def write_images(root: str, count: int, channels: int = 4, seed: int = 7) -> list:
+    """Draws `count` product-photo-like JPEGs (shapes on noise) across channel folders."""
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    for index in range(count):
+        channel = f"channel{index % channels}"
+        os.makedirs(os.path.join(root, channel), exist_ok=True)
+        height, width = rng.choice([(720, 1280), (1080, 1080), (960, 720)])
+        img = np_rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        for _ in range(rng.randint(1, 4)):
+            x, y = rng.randint(0, width - 200), rng.randint(0, height - 300)
+            color = tuple(rng.randint(0, 255) for _ in range(3))
+            cv2.rectangle(img, (x, y), (x + rng.randint(60, 200), y + rng.randint(100, 300)), color, -1)
+        cv2.imwrite(os.path.join(root, channel, f"{channel}_{index}.jpg"), img)
+    return yolo_detection.list_images(root)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='YOLO detection throughput benchmark')
+    parser.add_argument('--images', type=int, default=128)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--imgsz', type=int, default=yolo_detection.IMAGE_SIZE)
+    parser.add_argument('--decode-workers', type=int, default=yolo_detection.DECODE_WORKERS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        items = write_images(root, args.images)
+        # Warm-up: load the weights and run the first (slow) forward pass
+        yolo_detection.detect_images(items[:2], batch_size=2, imgsz=args.imgsz)
+
+        print(f"{'workers':>7} | {'batch':>5} | {'seconds':>8} | {'images/s':>8}")
+        for workers in args.workers:
+            for batch_size in args.batch_sizes:
+                start = time.perf_counter()
+                yolo_detection.detect_all(items, batch_size=batch_size, imgsz=args.imgsz,
+                                          decode_workers=args.decode_workers,
+                                          process_workers=workers)
+                elapsed = time.perf_counter() - start
+                print(f"{workers:>7} | {batch_size:>5} | {elapsed:>8.2f} | {len(items) / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Module: bench_export.py
+Description: Compares the per-row cost of pulling marts.fct_image_detections through the
+             JSON API (keyset pages of /analytics/detections, validated by pydantic)
+             against the NDJSON stream and the columnar /export endpoint (Arrow IPC and
+             Parquet). A synthetic mart is built in a throwaway database on the local
+             PostgreSQL server and the app is driven in-process with TestClient.
+Author: Addisu
+
+Usage:
+    python benchmarks/bench_export.py --rows 500000
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+
+import psycopg2
+
+# Make 'api.*' importable when run from the project root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def _admin_connection():
+    conn = psycopg2.connect(host="127.0.0.1", port=5432, database="postgres",
+                            user=os.getenv("POSTGRES_USER"), password=os.getenv("POSTGRES_PASSWORD"))
+    conn.autocommit = True
+    return conn
+
+
+def build_marts(db_name: str, rows: int) -> None:
+    """Creates marts.dim_channels and a synthetic marts.fct_image_detections."""
+    conn = psycopg2.connect(host="127.0.0.1", port=5432, database=db_name,
+                            user=os.getenv("POSTGRES_USER"), password=os.getenv("POSTGRES_PASSWORD"))
+    with conn, conn.cursor() as cur:
+        cur.execute("CREATE SCHEMA marts")
+        cur.execute("""
+            CREATE TABLE marts.dim_channels AS
+            SELECT g::bigint AS channel_key, 'channel_' || g AS channel_name FROM generate_series(1, 7) g
+        """)
+        cur.execute("""
+            CREATE TABLE marts.fct_image_detections AS
+            SELECT g::bigint AS detection_id,
+                   (g / 2)::int AS message_id,
+                   (1 + g %% 7)::bigint AS channel_key,
+                   date '2025-01-01' + (g / 2000) AS date_key,
+                   (ARRAY['bottle', 'pill', 'syrup', 'person', 'cup'])[1 + g %% 5] AS detected_class,
+                   random() AS confidence_score,
+                   CASE WHEN g %% 5 IN (1, 2) THEN 'Medication' ELSE 'Medical Equipment' END AS image_category
+            FROM generate_series(1, %s) g
+        """, (rows,))
+        cur.execute("CREATE UNIQUE INDEX ON marts.fct_image_detections (date_key, message_id, detection_id)")
+        cur.execute("ANALYZE marts.fct_image_detections")
+    conn.close()
+
+
+def timed(label: str, rows: int, func) -> float:
+    started = time.perf_counter()
+    received = func()
+    seconds = time.perf_counter() - started
+    assert received == rows, f"{label}: expected {rows} rows, got {received}"
+    print(f"{label:>22} | {seconds:>8.2f} | {seconds / rows * 1e6:>8.2f}")
+    return seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='JSON vs. columnar export benchmark')
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--page-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    db_name = f"bench_export_{os.getpid()}"
+    admin = _admin_connection()
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE DATABASE {db_name}")
+    try:
+        build_marts(db_name, args.rows)
+        os.environ['DATABASE_URL'] = (f"postgresql://{os.getenv('POSTGRES_USER')}:"
+                                      f"{os.getenv('POSTGRES_PASSWORD') or ''}@127.0.0.1:5432/{db_name}")
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from fastapi.testclient import TestClient
+        from api.main import app
+
+        with TestClient(app) as client:
+            def json_pages():
+                received, cursor = 0, None
+                while True:
+                    params = {'limit': args.page_size}
+                    if cursor:
+                        params['cursor'] = cursor
+                    response = client.get('/analytics/detections', params=params)
+                    received += len(response.json())
+                    cursor = response.headers.get('x-next-cursor')
+                    if not cursor:
+                        return received
+
+            def ndjson_stream():
+                response = client.get('/analytics/detections', params={'stream': 'true'})
+                return response.text.count('\n')
+
+            def export(fmt):
+                response = client.get('/export/fct_image_detections', params={'format': fmt})
+                if fmt == 'arrow':
+                    return pa.ipc.open_stream(io.BytesIO(response.content)).read_all().num_rows
+                return pq.read_table(io.BytesIO(response.content)).num_rows
+
+            print(f"\n{'path':>22} | {'seconds':>8} | {'us/row':>8}")
+            baseline = timed(f"JSON pages of {args.page_size}", args.rows, json_pages)
+            timed("NDJSON stream", args.rows, ndjson_stream)
+            arrow = timed("export arrow", args.rows, lambda: export('arrow'))
+            timed("export parquet", args.rows, lambda: export('parquet'))
+            print(f"\nArrow export is {baseline / arrow:.1f}x cheaper per row than JSON pages")
+    finally:
+        from api import database
+        database.engine.dispose()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {db_name} WITH (FORCE)")
+        admin.close()
+
+
+if __name__ == "__main__":
+    main()
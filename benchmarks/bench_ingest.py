@@ -0,0 +1,74 @@
+"""
+Module: bench_ingest.py
+Description: Benchmarks the raw message loaders in scripts/ingest_to_db.py 
+             (batched INSERT via execute_values vs. COPY FROM STDIN) on a synthetic 
+             NDJSON corpus. Each method loads into its own throwaway database on 
+             the local PostgreSQL server, which is dropped afterwards.
+Author: Addisu
+
+Usage:
+    python benchmarks/bench_ingest.py --messages 1000000
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+
+import psycopg2
+
+# Make 'scripts.*' importable when run from the project root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts import ingest_to_db
+from benchmarks.datagen import write_messages
+
+def _admin_connection():
+    conn = psycopg2.connect(host="127.0.0.1", port=5432, database="postgres",
+                            user=os.getenv("POSTGRES_USER"), password=os.getenv("POSTGRES_PASSWORD"))
+    conn.autocommit = True
+    return conn
+
+
+def run_method(method: str, corpus: str, mode: str) -> dict:
+    """Loads the corpus into a fresh database with the given method."""
+    db_name = f"bench_ingest_{method}_{os.getpid()}"
+    admin = _admin_connection()
+    with admin.cursor() as cur:
+        cur.execute(f"DROP DATABASE IF EXISTS {db_name}")
+        cur.execute(f"CREATE DATABASE {db_name}")
+    previous_db = os.environ.get('POSTGRES_DB')
+    os.environ['POSTGRES_DB'] = db_name
+    try:
+        return ingest_to_db.ingest_data(method=method, mode=mode, base_path=corpus)
+    finally:
+        if previous_db is None:
+            os.environ.pop('POSTGRES_DB', None)
+        else:
+            os.environ['POSTGRES_DB'] = previous_db
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {db_name}")
+        admin.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Raw message loader benchmark')
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--methods', nargs='+', default=['insert', 'copy'])
+    parser.add_argument('--mode', choices=['append', 'upsert'], default='append',
+                        help="'append' isolates the loader; 'upsert' adds the staging merge")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as corpus:
+        write_messages(corpus, args.messages)
+        results = {method: run_method(method, corpus, args.mode) for method in args.methods}
+
+    print(f"\n{'method':>8} | {'rows':>9} | {'seconds':>8} | {'rows/s':>10}")
+    for method, stats in results.items():
+        print(f"{method:>8} | {stats['rows']:>9} | {stats['seconds']:>8.2f} | {stats['rows_per_sec']:>10.0f}")
+    if 'insert' in results and 'copy' in results:
+        print(f"\nCOPY speedup: {results['insert']['seconds'] / results['copy']['seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
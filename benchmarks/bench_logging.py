@@ -0,0 +1,94 @@
+"""
+Module: bench_logging.py
+Description: Measures what logging costs the pipeline's hot loops. The same loop
+             (a message record serialized per item, like the scraper's landing
+             writer) runs without logging, with the scraper's pattern (a DEBUG
+             line per item, INFO every 1000 items), with a DEBUG line per item and
+             with an INFO line per item; once with the handlers writing
+             synchronously (LOG_MODE=sync, the previous behaviour) and once
+             through the background writer thread (LOG_MODE=queue, with DEBUG
+             sampling). The time the writer thread still needs after each loop
+             is reported separately. Console output goes to /dev/null; the log
+             files go to a temporary directory.
+Author: Addisu
+
+Usage:
+    python benchmarks/bench_logging.py --items 50000
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+
+# Make 'scripts.*' importable when run from the project root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts import logger_config
+
+PATTERNS = ('no logging', 'pipeline', 'DEBUG per item', 'INFO per item')
+
+
+def hot_loop(logger: logging.Logger, items: int, pattern: str) -> float:
+    """Seconds per item of the loop with the given logging pattern."""
+    started = time.perf_counter()
+    for i in range(items):
+        json.dumps({'id': i, 'channel': 'CheMed123', 'text': 'Paracetamol 500mg', 'views': i * 3})
+        if pattern == 'INFO per item':
+            logger.info("Scraped message %s (photo: %s)", i, i % 2 == 0)
+        elif pattern == 'DEBUG per item':
+            logger.debug("Scraped message %s (photo: %s)", i, i % 2 == 0)
+        elif pattern == 'pipeline':
+            # What the scraper does: a sampled DEBUG line per item, INFO per 1000 items
+            logger.debug("Scraped message %s (photo: %s)", i, i % 2 == 0)
+            if i % 1000 == 0:
+                logger.info("Scraped %s messages", i)
+    return (time.perf_counter() - started) / items
+
+
+def run(mode: str, log_dir: str, items: int, sample_every: int) -> dict:
+    """Per-item seconds of every pattern, and the seconds the writer needed after each loop."""
+    results, drain = {}, {}
+    for pattern in PATTERNS:
+        # A fresh writer per pattern, so no backlog of the previous loop competes with it
+        logger_config.configure(log_dir=log_dir, mode=mode, level='DEBUG',
+                                sample_every=sample_every, force=True)
+        logger = logger_config.get_logger(f"bench.{mode}")
+        with logger_config.log_context(stage='bench', channel='CheMed123', run_id='local'):
+            results[pattern] = hot_loop(logger, items, pattern)
+        started = time.perf_counter()
+        logger_config.shutdown()
+        drain[pattern] = time.perf_counter() - started
+    return results, drain
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Synchronous vs. queued logging in a hot loop')
+    parser.add_argument('--items', type=int, default=50_000, help='Loop iterations per measurement')
+    parser.add_argument('--sample-every', type=int, default=logger_config.LOG_DEBUG_SAMPLE_EVERY)
+    args = parser.parse_args()
+
+    stderr, sys.stderr = sys.stderr, open(os.devnull, 'w')
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # The previous behaviour: handlers called synchronously, every DEBUG call written
+            sync, _ = run('sync', os.path.join(tmp, 'sync'), args.items, 1)
+            queued, drain = run('queue', os.path.join(tmp, 'queue'), args.items, args.sample_every)
+    finally:
+        sys.stderr.close()
+        sys.stderr = stderr
+
+    print(f"{args.items} items per loop; queue mode samples DEBUG 1/{args.sample_every}\n")
+    print(f"{'logging':>16} | {'sync us/item':>12} | {'queue us/item':>13} | "
+          f"{'logging cost sync -> queue (us/item)':>36} | {'writer drain s':>14}")
+    for pattern in PATTERNS:
+        cost = (f"{(sync[pattern] - sync['no logging']) * 1e6:>6.2f} -> "
+                f"{(queued[pattern] - queued['no logging']) * 1e6:.2f}")
+        print(f"{pattern:>16} | {sync[pattern] * 1e6:>12.2f} | {queued[pattern] * 1e6:>13.2f} | "
+              f"{cost:>36} | {drain[pattern]:>14.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Module: bench_scraper.py
+Description: Benchmarks sequential vs. concurrent channel scraping against a fake, 
+             local TelegramClient that simulates network latency. No Telegram 
+             credentials or network access are required.
+Author: Addisu
+
+Usage:
+    python benchmarks/bench_scraper.py --messages 100 --latency 0.01
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime, timezone
+
+# Make 'scripts.*' importable when run from the project root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts import scraper
+
+
+class FakeMessage:
+    """Minimal stand-in for a Telethon Message."""
+
+    def __init__(self, message_id: int, with_photo: bool):
+        self.id = message_id
+        self.date = datetime.now(timezone.utc)
+        self.text = f"Synthetic message {message_id}"
+        self.views = message_id * 3
+        self.forwards = message_id % 7
+        self.photo = object() if with_photo else None
+
+
+class FakeTelegramClient:
+    """
+    Simulates the subset of TelegramClient used by the scraper.
+
+    Every page of 20 messages costs `latency` seconds and every media download 
+    costs `download_latency` seconds, both as asyncio sleeps so concurrency 
+    behaves like real network I/O.
+    """
+
+    def __init__(self, messages_per_channel: int, latency: float,
+                 download_latency: float, photo_ratio: float = 0.5):
+        self.messages_per_channel = messages_per_channel
+        self.latency = latency
+        self.download_latency = download_latency
+        self.photo_every = max(1, round(1 / photo_ratio)) if photo_ratio else 0
+
+    async def iter_messages(self, channel_username, limit=None, **kwargs):
+        total = self.messages_per_channel if limit is None else min(limit, self.messages_per_channel)
+        for i in range(total, 0, -1):
+            if i % 20 == 0 or i == total:
+                await asyncio.sleep(self.latency)
+            yield FakeMessage(i, bool(self.photo_every) and i % self.photo_every == 0)
+
+    async def download_media(self, media, file=None):
+        await asyncio.sleep(self.download_latency)
+        with open(file, 'wb') as f:
+            f.write(b'\xff\xd8fake-jpeg\xff\xd9')
+        return file
+
+
+async def _timed_run(client: FakeTelegramClient, channels: list,
+                     concurrency: int, media_concurrency: int) -> float:
+    start = time.perf_counter()
+    await scraper.scrape_all(client, channels, max_concurrent_channels=concurrency,
+                             media_concurrency=media_concurrency)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Sequential vs. concurrent scraping benchmark')
+    parser.add_argument('--messages', type=int, default=100, help='Messages per channel')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per page of history')
+    parser.add_argument('--download-latency', type=float, default=0.05, help='Seconds per photo')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 3, 7])
+    parser.add_argument('--media-concurrency', type=int, default=scraper.MEDIA_CONCURRENCY)
+    args = parser.parse_args()
+
+    client = FakeTelegramClient(args.messages, args.latency, args.download_latency)
+    project_root = os.getcwd()
+
+    print(f"{'channels in flight':>20} | {'seconds':>8} | {'speedup':>7}")
+    baseline = None
+    for concurrency in args.concurrency:
+        # The scraper writes relative to the CWD, so isolate each run in a temp dir
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            try:
+                elapsed = asyncio.run(_timed_run(client, scraper.CHANNELS, concurrency,
+                                                 args.media_concurrency))
+            finally:
+                os.chdir(project_root)
+        baseline = baseline or elapsed
+        print(f"{concurrency:>20} | {elapsed:>8.2f} | {baseline / elapsed:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
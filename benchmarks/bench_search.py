@@ -0,0 +1,158 @@
+"""
+Module: bench_search.py
+Description: Benchmarks the /analytics/search query (api/search.py) against the
+             previous unindexed ILIKE scan on a synthetic multi-million-row
+             marts.fct_messages, built in a throwaway database on the local
+             PostgreSQL server with the same indexes dbt creates. The pg_trgm index
+             is only built when the server ships the extension.
+Author: Addisu
+
+Usage:
+    python benchmarks/bench_search.py --rows 2000000
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+import psycopg2
+from sqlalchemy import create_engine, text
+
+# Make 'api.*' importable when run from the project root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api.search import build_search_query
+from api.pagination import decode_cursor, encode_cursor
+
+WORDS = ['Paracetamol', 'Amoxicillin', 'syrup', 'tablet', 'tablets', 'ፓራሲታሞል', 'መድሃኒት',
+         'price', 'ብር', 'available', 'delivery', 'Addis', 'Ababa', 'cream', 'mg']
+
+# Frequent English, stemmed English, Amharic, a rare word and a mid-word substring
+QUERIES = ['Amoxicillin', 'tablets', 'ፓራሲታሞል', 'ibuprofen', 'racetam']
+
+LEGACY_SQL = text("""
+    SELECT message_id, channel_key, message_text, message_timestamp
+    FROM marts.fct_messages
+    WHERE message_text ILIKE :q
+    LIMIT 50
+""")
+
+
+def _admin_connection():
+    conn = psycopg2.connect(host="127.0.0.1", port=5432, database="postgres",
+                            user=os.getenv("POSTGRES_USER"), password=os.getenv("POSTGRES_PASSWORD"))
+    conn.autocommit = True
+    return conn
+
+
+def build_table(engine, rows: int) -> bool:
+    """Creates the synthetic marts tables and their indexes; returns whether pg_trgm is used."""
+    words = "ARRAY[" + ", ".join(f"'{word}'" for word in WORDS) + "]"
+    with engine.begin() as conn:
+        trigram = conn.execute(text(
+            "SELECT count(*) FROM pg_available_extensions WHERE name = 'pg_trgm'")).scalar() > 0
+        if trigram:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text("CREATE SCHEMA marts"))
+        conn.execute(text("""
+            CREATE TABLE marts.dim_channels AS
+            SELECT g AS channel_key, 'channel_' || g AS channel_name FROM generate_series(1, 7) g
+        """))
+        # The words subquery references g so it is re-evaluated for every row
+        conn.execute(text(f"""
+            CREATE TABLE marts.fct_messages AS
+            SELECT g AS message_id,
+                   1 + g % 7 AS channel_key,
+                   ts::date AS date_key,
+                   ts AS message_timestamp,
+                   body AS message_text,
+                   setweight(to_tsvector('english', body), 'A') ||
+                   setweight(to_tsvector('simple', body), 'B') AS search_vector
+            FROM (
+                SELECT g,
+                       timestamp '2025-01-01' + (g % 600) * interval '1 day' + (g % 86400) * interval '1 second' AS ts,
+                       (SELECT string_agg(({words})[1 + floor(random() * {len(WORDS)})::int], ' ')
+                        FROM generate_series(1, 5 + g % 30))
+                       || CASE WHEN g % 10000 = 0 THEN ' ibuprofen' ELSE '' END AS body
+                FROM generate_series(1, :rows) g
+            ) generated
+        """), {"rows": rows})
+        conn.execute(text("CREATE INDEX ON marts.fct_messages USING gin (search_vector)"))
+        conn.execute(text("CREATE INDEX ON marts.fct_messages (channel_key, message_timestamp)"))
+        if trigram:
+            conn.execute(text("CREATE INDEX ON marts.fct_messages USING gin (message_text gin_trgm_ops)"))
+        conn.execute(text("ANALYZE marts.fct_messages"))
+    return trigram
+
+
+def time_query(engine, sql, params, repeat: int) -> tuple:
+    """Returns (p50 ms, p95 ms, rows) over `repeat` executions."""
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = conn.execute(sql, params).mappings().all()
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(0.95 * (len(timings) - 1))], result
+
+
+def time_search(engine, query: str, substring: bool, repeat: int, pages: int) -> tuple:
+    """Times the first page and page `pages` (via the keyset cursor) of a search."""
+    sql, params = build_search_query(query, limit=50, substring=substring)
+    first = time_query(engine, sql, params, repeat)
+
+    # Walk the cursor down to the requested page, then time that page
+    after, rows = None, first[2]
+    for _ in range(pages - 1):
+        if len(rows) <= 50:
+            break
+        after = decode_cursor(encode_cursor(
+            (rows[49]["rank"], rows[49]["channel_key"], rows[49]["message_id"])), 3)
+        sql, params = build_search_query(query, limit=50, after=after, substring=substring)
+        with engine.connect() as conn:
+            rows = conn.execute(sql, params).mappings().all()
+    deep = time_query(engine, sql, params, repeat) if after else first
+    return first[0], first[1], deep[0], min(len(first[2]), 50)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Message search latency benchmark')
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--pages', type=int, default=5, help="Page depth timed with the keyset cursor")
+    args = parser.parse_args()
+
+    db_name = f"bench_search_{os.getpid()}"
+    admin = _admin_connection()
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE DATABASE {db_name}")
+    engine = create_engine(f"postgresql+psycopg2://{os.getenv('POSTGRES_USER')}:"
+                           f"{os.getenv('POSTGRES_PASSWORD') or ''}@127.0.0.1:5432/{db_name}")
+    try:
+        started = time.perf_counter()
+        trigram = build_table(engine, args.rows)
+        print(f"Built {args.rows} rows in {time.perf_counter() - started:.1f}s "
+              f"(pg_trgm index: {'yes' if trigram else 'no, extension not available'})")
+        print("legacy = unordered ILIKE scan with LIMIT 50; it stops at the first 50 hits, "
+              "so frequent words are cheap and rare ones scan the whole table.")
+
+        print(f"\n{'query':>12} | {'legacy p50/p95':>16} | {'search p50/p95':>16} | "
+              f"{'page ' + str(args.pages) + ' p50':>10} | {'full-text only p50/p95':>22} | {'hits':>4}  (ms)")
+        for query in QUERIES:
+            legacy = time_query(engine, LEGACY_SQL, {"q": f"%{query}%"}, args.repeat)
+            search = time_search(engine, query, True, args.repeat, args.pages)
+            fts = time_search(engine, query, False, args.repeat, 1)
+            print(f"{query:>12} | {legacy[0]:>7.1f} / {legacy[1]:>6.1f} | {search[0]:>7.1f} / {search[1]:>6.1f} | "
+                  f"{search[2]:>10.1f} | {fts[0]:>13.1f} / {fts[1]:>6.1f} | {fts[3]:>4}")
+    finally:
+        engine.dispose()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {db_name}")
+        admin.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Module: bench_trends.py
+Description: Benchmarks the /analytics/trends queries (api/trends.py), which read the
+             daily rollup marts, against the same trends aggregated on demand from
+             the fact tables. Synthetic marts.fct_messages / fct_image_detections are
+             built in a throwaway database on the local PostgreSQL server, and the
+             rollups are derived from them with the same SQL as the dbt models.
+Author: Addisu
+
+Usage:
+    python benchmarks/bench_trends.py --rows 5000000 --channels 50
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+from datetime import date
+
+import psycopg2
+from sqlalchemy import create_engine, text
+
+# Make 'api.*' importable when run from the project root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api.trends import build_channel_trends_query, build_detection_trends_query
+
+CLASSES = ['pill', 'capsule', 'syrup', 'bottle', 'cream', 'syringe']
+
+# The trends as they would be computed without the rollups
+FACT_CHANNEL_SQL = text("""
+    SELECT date_trunc(:granularity, f.date_key::timestamp)::date AS bucket,
+           c.channel_name,
+           count(*) AS message_count,
+           count(*) FILTER (WHERE f.has_image) AS image_message_count,
+           count(*) FILTER (WHERE f.has_image)::float / count(*) AS image_share,
+           coalesce(sum(f.views), 0) AS total_views,
+           coalesce(sum(f.forwards), 0) AS total_forwards
+    FROM marts.fct_messages f
+    JOIN marts.dim_channels c ON f.channel_key = c.channel_key
+    WHERE f.date_key >= :start_date AND f.date_key <= :end_date
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+""")
+
+FACT_DETECTION_SQL = text("""
+    SELECT date_trunc(:granularity, d.date_key::timestamp)::date AS bucket,
+           d.detected_class,
+           d.image_category,
+           count(*) AS detection_count,
+           avg(d.confidence_score) AS avg_confidence
+    FROM marts.fct_image_detections d
+    WHERE d.date_key >= :start_date AND d.date_key <= :end_date
+    GROUP BY 1, 2, 3
+    ORDER BY 1, 2, 3
+""")
+
+
+def _admin_connection():
+    conn = psycopg2.connect(host="127.0.0.1", port=5432, database="postgres",
+                            user=os.getenv("POSTGRES_USER"), password=os.getenv("POSTGRES_PASSWORD"))
+    conn.autocommit = True
+    return conn
+
+
+def build_tables(engine, rows: int, channels: int) -> dict:
+    """Creates the synthetic facts, the rollups and their indexes; returns the row counts."""
+    classes = "ARRAY[" + ", ".join(f"'{label}'" for label in CLASSES) + "]"
+    with engine.begin() as conn:
+        conn.execute(text("CREATE SCHEMA marts"))
+        conn.execute(text("""
+            CREATE TABLE marts.dim_channels AS
+            SELECT g AS channel_key, 'channel_' || g AS channel_name FROM generate_series(1, :channels) g
+        """), {"channels": channels})
+        # Two years of messages, every fifth message with an image and one detection
+        conn.execute(text("""
+            CREATE TABLE marts.fct_messages AS
+            SELECT g AS message_id,
+                   1 + g % :channels AS channel_key,
+                   date '2024-01-01' + (g % 730) AS date_key,
+                   g % 5 = 0 AS has_image,
+                   (g::bigint * 7919) % 20000 AS views,
+                   g % 40 AS forwards
+            FROM generate_series(1, :rows) g
+        """), {"rows": rows, "channels": channels})
+        conn.execute(text(f"""
+            CREATE TABLE marts.fct_image_detections AS
+            SELECT message_id, channel_key, date_key,
+                   ({classes})[1 + message_id % {len(CLASSES)}] AS detected_class,
+                   (message_id % 97) / 97.0 AS confidence_score,
+                   CASE WHEN message_id % {len(CLASSES)} < 3 THEN 'Medication'
+                        ELSE 'Medical Equipment' END AS image_category
+            FROM marts.fct_messages WHERE has_image
+        """))
+        conn.execute(text("CREATE INDEX ON marts.fct_messages (date_key)"))
+        conn.execute(text("CREATE INDEX ON marts.fct_image_detections (date_key)"))
+
+        # Same aggregation as models/marts/agg_*_daily.sql
+        conn.execute(text("""
+            CREATE TABLE marts.agg_channel_daily AS
+            SELECT date_key, channel_key,
+                   count(*) AS message_count,
+                   count(*) FILTER (WHERE has_image) AS image_message_count,
+                   coalesce(sum(views), 0) AS total_views,
+                   coalesce(sum(forwards), 0) AS total_forwards
+            FROM marts.fct_messages GROUP BY date_key, channel_key
+        """))
+        conn.execute(text("""
+            CREATE TABLE marts.agg_detections_daily AS
+            SELECT date_key, channel_key, detected_class, image_category,
+                   count(*) AS detection_count, sum(confidence_score) AS confidence_sum
+            FROM marts.fct_image_detections
+            GROUP BY date_key, channel_key, detected_class, image_category
+        """))
+        conn.execute(text("CREATE UNIQUE INDEX ON marts.agg_channel_daily (date_key, channel_key)"))
+        conn.execute(text("CREATE UNIQUE INDEX ON marts.agg_detections_daily "
+                          "(date_key, channel_key, detected_class, image_category)"))
+        counts = {}
+        for table in ('fct_messages', 'fct_image_detections', 'agg_channel_daily', 'agg_detections_daily'):
+            conn.execute(text(f"ANALYZE marts.{table}"))
+            counts[table] = conn.execute(text(f"SELECT count(*) FROM marts.{table}")).scalar()
+    return counts
+
+
+def time_query(engine, sql, params, repeat: int) -> tuple:
+    """Returns (p50 ms, rows) over `repeat` executions."""
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = conn.execute(sql, params).all()
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), len(result)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Trend queries: daily rollups vs. fact tables')
+    parser.add_argument('--rows', type=int, default=5000000, help="Messages in the synthetic fct_messages")
+    parser.add_argument('--channels', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    db_name = f"bench_trends_{os.getpid()}"
+    admin = _admin_connection()
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE DATABASE {db_name}")
+    engine = create_engine(f"postgresql+psycopg2://{os.getenv('POSTGRES_USER')}:"
+                           f"{os.getenv('POSTGRES_PASSWORD') or ''}@127.0.0.1:5432/{db_name}")
+    try:
+        started = time.perf_counter()
+        counts = build_tables(engine, args.rows, args.channels)
+        print(f"Built in {time.perf_counter() - started:.1f}s: " +
+              ", ".join(f"{table} {count}" for table, count in counts.items()))
+
+        # A quarter, half a year and the whole range
+        ranges = [(date(2025, 10, 1), date(2025, 12, 31)), (date(2025, 7, 1), date(2025, 12, 31)),
+                  (date(2024, 1, 1), date(2025, 12, 31))]
+        print(f"\n{'trend':>10} | {'range':>23} | {'bucket':>6} | {'facts p50':>10} | {'rollup p50':>10} | "
+              f"{'speedup':>7} | {'rows':>5}  (ms)")
+        for start_date, end_date in ranges:
+            for granularity in ('day', 'month'):
+                params = {"granularity": granularity, "start_date": start_date, "end_date": end_date}
+                for name, fact_sql, builder in (('channels', FACT_CHANNEL_SQL, build_channel_trends_query),
+                                                ('detections', FACT_DETECTION_SQL, build_detection_trends_query)):
+                    facts = time_query(engine, fact_sql, params, args.repeat)
+                    rollup = time_query(engine, *builder(granularity, start_date, end_date), args.repeat)
+                    print(f"{name:>10} | {start_date} - {end_date} | {granularity:>6} | {facts[0]:>10.1f} | "
+                          f"{rollup[0]:>10.1f} | {facts[0] / rollup[0]:>6.1f}x | {rollup[1]:>5}")
+    finally:
+        engine.dispose()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {db_name}")
+        admin.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Module: datagen.py
+Description: Deterministic synthetic data for the benchmarks. Generates
+             scraper-format landing partitions (data/raw/telegram_messages/
+             <date>/<channel>.ndjson), the photos those messages point to
+             (data/raw/images/<channel>/<channel>_<id>.jpg) and a detections
+             CSV in the yolo_detection.py export format, at the 10k / 100k / 1m
+             scales. The same scale and seed always produce the same bytes, so
+             benchmark results of different commits are comparable.
+Author: Addisu
+
+Usage:
+    python benchmarks/datagen.py --scale 100k --out /tmp/bench_data
+"""
+
+import os
+import sys
+import csv
+import json
+import random
+import argparse
+
+# Make 'scripts.*' importable when run from the project root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.scraper import CHANNELS
+from scripts.detection_sink import RESULT_COLUMNS
+
+# Messages, photo files and detection rows per scale. Photo files are kept to
+# 1% of the messages: YOLO on CPU, not the disk, bounds the detection cases
+SCALES = {
+    '10k': {'messages': 10_000, 'images': 100, 'detections': 10_000},
+    '100k': {'messages': 100_000, 'images': 1_000, 'detections': 100_000},
+    '1m': {'messages': 1_000_000, 'images': 10_000, 'detections': 1_000_000},
+}
+
+WORDS = ['Paracetamol', 'Amoxicillin', 'syrup', 'tablet', 'ፓራሲታሞል', 'መድሃኒት',
+         'price', 'ብር', 'available', 'delivery', 'Addis', 'Ababa', 'cream', 'mg']
+LABELS = ['bottle', 'person', 'cup', 'cell phone', 'book', 'handbag']
+
+
+def has_photo(message_id: int) -> bool:
+    """Two messages in five carry a photo."""
+    return message_id % 5 < 2
+
+
+def photo_messages(messages: int, days: int = 10):
+    """Yields (channel, message id) of the photo messages of write_messages, in order."""
+    per_file = max(1, messages // (days * len(CHANNELS)))
+    for message_id in range(1, per_file * days * len(CHANNELS) + 1):
+        if has_photo(message_id):
+            yield CHANNELS[(message_id - 1) // per_file % len(CHANNELS)], message_id
+
+
+def write_messages(root: str, messages: int, days: int = 10, seed: int = 42) -> list:
+    """
+    Writes `messages` synthetic scraper records spread over channels and days.
+
+    Args:
+        root (str): Landing directory (the scraper's data/raw/telegram_messages).
+        messages (int): Total records, split evenly into days x channels files.
+        days (int): Date partitions, from 2026-01-01.
+        seed (int): Seed of the message texts, hours and counts.
+
+    Returns:
+        list: Paths of the written files.
+    """
+    rng = random.Random(seed)
+    per_file = max(1, messages // (days * len(CHANNELS)))
+    message_id = 0
+    files = []
+    for day in range(days):
+        date_path = os.path.join(root, f"2026-01-{day + 1:02d}")
+        os.makedirs(date_path, exist_ok=True)
+        for channel in CHANNELS:
+            path = os.path.join(date_path, f"{channel}.ndjson")
+            with open(path, 'w', encoding='utf-8') as f:
+                for _ in range(per_file):
+                    message_id += 1
+                    f.write(json.dumps({
+                        'channel': channel,
+                        'id': message_id,
+                        'date': f"2026-01-{day + 1:02d} {rng.randint(0, 23):02d}:00:00+00:00",
+                        'text': ' '.join(rng.choices(WORDS, k=rng.randint(5, 40))),
+                        'views': rng.randint(0, 20000),
+                        'forwards': rng.randint(0, 50),
+                        'image_path': f"{channel}_{message_id}.jpg" if has_photo(message_id) else None,
+                    }, ensure_ascii=False) + '\n')
+            files.append(path)
+    return files
+
+
+def write_images(root: str, count: int, messages: int = None, size: tuple = (320, 320),
+                 seed: int = 7) -> list:
+    """
+    Draws product-photo-like JPEGs (shapes on noise) for the first `count`
+    photo messages (requires opencv-python and numpy).
+
+    Args:
+        root (str): Image directory (the scraper's data/raw/images).
+        count (int): Number of photos.
+        messages (int): Size of the message corpus the photos belong to; by
+                        default as many messages as needed.
+        size (tuple): (height, width) of every photo.
+        seed (int): Seed of the pixels and shapes.
+
+    Returns:
+        list: (channel, image file name, image path) tuples, as yolo_detection.list_images.
+    """
+    import cv2
+    import numpy as np
+
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    height, width = size
+    items = []
+    for channel, message_id in photo_messages(messages or count * 3):
+        if len(items) == count:
+            break
+        os.makedirs(os.path.join(root, channel), exist_ok=True)
+        img = np_rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        for _ in range(rng.randint(1, 4)):
+            x, y = rng.randint(0, width - width // 3), rng.randint(0, height - height // 2)
+            color = tuple(rng.randint(0, 255) for _ in range(3))
+            cv2.rectangle(img, (x, y), (x + rng.randint(width // 10, width // 3),
+                                        y + rng.randint(height // 6, height // 2)), color, -1)
+        name = f"{channel}_{message_id}.jpg"
+        path = os.path.join(root, channel, name)
+        cv2.imwrite(path, img)
+        items.append((channel, name, path))
+    return items
+
+
+def write_detections_csv(path: str, rows: int, messages: int, seed: int = 11) -> int:
+    """
+    Writes `rows` detections (1 to 4 per photo) of the corpus' photo messages
+    in the yolo_detection.py CSV format (RESULT_COLUMNS).
+
+    Args:
+        path (str): CSV file to write.
+        rows (int): Number of detections; the photos are cycled through if needed.
+        messages (int): Size of the message corpus the photos belong to.
+        seed (int): Seed of the labels, confidences and boxes.
+
+    Returns:
+        int: Rows written.
+    """
+    rng = random.Random(seed)
+    photos = list(photo_messages(messages))
+    written = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_COLUMNS)
+        while written < rows:
+            channel, message_id = photos[written % len(photos)]
+            for _ in range(min(rng.randint(1, 4), rows - written)):
+                x, y = rng.uniform(0, 500), rng.uniform(0, 500)
+                writer.writerow([message_id, channel, f"{channel}_{message_id}.jpg",
+                                 rng.choice(LABELS), round(rng.uniform(0.25, 0.99), 4),
+                                 round(x, 1), round(y, 1),
+                                 round(x + rng.uniform(20, 140), 1), round(y + rng.uniform(20, 140), 1)])
+                written += 1
+    return written
+
+
+def generate(out: str, scale: str, images: bool = True) -> dict:
+    """
+    Writes the messages, photos and detections of a scale under `out`.
+
+    Returns:
+        dict: 'messages_dir', 'images_dir', 'detections_csv' and the scale's sizes
+              ('messages' rounded down to whole files of the channels x days split).
+    """
+    spec = dict(SCALES[scale])
+    paths = {
+        'messages_dir': os.path.join(out, 'data', 'raw', 'telegram_messages'),
+        'images_dir': os.path.join(out, 'data', 'raw', 'images'),
+        'detections_csv': os.path.join(out, 'data', 'yolo_results.csv'),
+    }
+    files = write_messages(paths['messages_dir'], spec['messages'])
+    spec['messages'] = spec['messages'] // len(files) * len(files)
+    if images:
+        write_images(paths['images_dir'], spec['images'], spec['messages'])
+    write_detections_csv(paths['detections_csv'], spec['detections'], spec['messages'])
+    return {**paths, **spec}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Generate the synthetic benchmark data')
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--out', required=True, help="Directory to write data/raw/... under")
+    parser.add_argument('--no-images', action='store_true', help="Skip the photos")
+    args = parser.parse_args()
+
+    generated = generate(args.out, args.scale, images=not args.no_images)
+    print(f"{args.scale}: {generated['messages']} messages, "
+          f"{0 if args.no_images else generated['images']} photos and "
+          f"{generated['detections']} detections under {args.out}")
+
+
+if __name__ == "__main__":
+    main()
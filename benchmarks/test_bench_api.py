@@ -0,0 +1,49 @@
+"""Every API endpoint against the synthetic warehouse, with the response cache disabled."""
+import os
+
+import pytest
+
+WINDOW = "granularity=week&start_date=2026-01-01&end_date=2026-01-10"
+
+CASES = {
+    "/": "/",
+    "/health": "/health",
+    "/analytics/channel-activity": "/analytics/channel-activity",
+    "/analytics/search": "/analytics/search?query=Paracetamol",
+    "/analytics/visual-report": "/analytics/visual-report",
+    "/analytics/trends/channels": f"/analytics/trends/channels?{WINDOW}",
+    "/analytics/trends/detections": f"/analytics/trends/detections?{WINDOW}",
+    "/analytics/detections": "/analytics/detections?min_confidence=0.5&limit=100",
+    "/analytics/detections (stream)": "/analytics/detections?min_confidence=0.5&stream=true",
+    "/export/{mart}": "/export/fct_messages?format=arrow",
+    "/export/{mart} (parquet)": "/export/fct_messages?format=parquet",
+}
+
+
+@pytest.fixture(scope="module")
+def client(marts):
+    """A TestClient of the API on the session database (imported once DATABASE_URL points at it)."""
+    from fastapi.testclient import TestClient
+
+    # Measure the queries, not cache hits
+    os.environ["API_CACHE_TTL"] = "0"
+    from api.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.mark.parametrize("url", CASES.values(), ids=CASES.keys())
+def test_endpoint(benchmark, client, url):
+    benchmark.group = "api"
+    response = benchmark(client.get, url)
+    assert response.status_code == 200, response.text
+
+
+def test_every_endpoint_has_a_case():
+    """New GET routes must be added to CASES."""
+    from api.main import app
+
+    paths = {route.path for route in app.routes
+             if "GET" in getattr(route, "methods", ()) and not route.path.startswith(("/docs", "/redoc", "/openapi"))}
+    assert paths <= {name.split(" ")[0] for name in CASES}
@@ -0,0 +1,37 @@
+"""dbt runs over the synthetic warehouse: full refresh, and incremental runs with and without new data."""
+import psycopg2
+
+
+def add_new_day(db_params: dict, rows: int) -> None:
+    """Ingests `rows` new messages (copies of existing ones under new ids), as a daily load would."""
+    with psycopg2.connect(**db_params) as conn, conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO raw.telegram_messages (channel, content)
+            SELECT channel, jsonb_set(content, '{id}', to_jsonb((content->>'id')::bigint + top.id))
+            FROM raw.telegram_messages,
+                 (SELECT max((content->>'id')::bigint) AS id FROM raw.telegram_messages) top
+            ORDER BY raw.telegram_messages.id
+            LIMIT %s
+        """, (rows,))
+    conn.close()
+
+
+def test_dbt_full_refresh(benchmark, warehouse, dbt):
+    """dbt run --full-refresh of every model."""
+    benchmark.group = "dbt"
+    benchmark.pedantic(dbt, args=("run", "--full-refresh"), rounds=2)
+
+
+def test_dbt_incremental_new_day(benchmark, warehouse, bench_data, dbt):
+    """An incremental dbt run after a day's worth (1/10 of the corpus) of new messages."""
+    benchmark.group = "dbt"
+    dbt("run")
+    benchmark.pedantic(dbt, args=("run",), setup=lambda: add_new_day(warehouse, bench_data["messages"] // 10),
+                       rounds=2)
+
+
+def test_dbt_incremental_nothing_new(benchmark, warehouse, dbt):
+    """An incremental dbt run with no new raw rows: dbt start-up, hooks and watermark lookups."""
+    benchmark.group = "dbt"
+    dbt("run")
+    benchmark.pedantic(dbt, args=("run",), rounds=3)
@@ -0,0 +1,67 @@
+"""The detection loop: YOLO over the synthetic photos, and the export of its results."""
+import os
+from itertools import groupby
+
+import psycopg2
+import pytest
+
+from scripts import yolo_detection
+from scripts.detection_cache import DetectionCache
+from scripts.detection_sink import DetectionSink
+from scripts.ingest_detections import setup_raw_schema
+
+
+def test_detection_loop(benchmark, bench_db, bench_data, tmp_path, monkeypatch):
+    """yolo_detection.run_detection over every photo, with an empty detection cache each round."""
+    pytest.importorskip("ultralytics")
+    if not os.path.isdir(bench_data["images_dir"]):
+        pytest.skip("No synthetic photos (opencv-python is not installed)")
+    benchmark.group = "detection"
+    # run_detection reads data/raw/images relative to the working directory
+    monkeypatch.chdir(bench_data["root"])
+    items = yolo_detection.list_images(bench_data["images_dir"])
+    rounds = iter(range(100))
+
+    def fresh_cache():
+        return (), {"items": items, "cache_path": str(tmp_path / f"cache_{next(rounds)}.sqlite")}
+
+    summary = benchmark.pedantic(yolo_detection.run_detection, setup=fresh_cache,
+                                 rounds=2, warmup_rounds=1)
+    assert summary["inferred"] == len(items)
+    benchmark.extra_info["images"] = len(items)
+
+
+def test_detection_export(benchmark, bench_db, bench_data, tmp_path):
+    """
+    DetectionSink: the detection loop minus inference (Parquet parts, the COPY into
+    raw.detection_results and the cache), fed with the boxes of the detections CSV.
+    """
+    benchmark.group = "detection"
+    setup_raw_schema(bench_db)
+    with open(bench_data["detections_csv"], encoding="utf-8") as f:
+        next(f)
+        rows = [line.rstrip("\n").split(",") for line in f]
+    images = [((channel, img_name), [(label, float(c), float(x1), float(y1), float(x2), float(y2))
+                                     for _, _, _, label, c, x1, y1, x2, y2 in group])
+              for (channel, img_name), group in groupby(rows, key=lambda row: (row[1], row[2]))]
+    rounds = iter(range(100))
+
+    def export():
+        round_dir = tmp_path / f"round_{next(rounds)}"
+        cache = DetectionCache(str(round_dir / "cache.sqlite"))
+        conn = psycopg2.connect(**bench_db)
+        try:
+            entries = {image: (f"hash-{i}", f"key-{i}", 0, 0.0) for i, (image, _) in enumerate(images)}
+            sink = DetectionSink(cache, entries, conn=conn, parquet_dir=str(round_dir / "parquet"),
+                                 message_id=yolo_detection.parse_message_id)
+            for (channel, img_name), boxes in images:
+                sink.add(channel, img_name, boxes)
+            sink.close()
+            return sink.boxes
+        finally:
+            conn.close()
+            cache.close()
+
+    boxes = benchmark.pedantic(export, rounds=3)
+    assert boxes == bench_data["detections"]
+    benchmark.extra_info["rows"] = boxes
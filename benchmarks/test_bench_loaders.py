@@ -0,0 +1,44 @@
+"""Raw loaders: landing NDJSON into raw.telegram_messages, the detections CSV into raw.detection_results."""
+import psycopg2
+import pytest
+
+from scripts.ingest_to_db import ingest_data
+from scripts.ingest_detections import load_detections, setup_raw_schema
+
+
+def truncate(db_params: dict, *tables: str) -> None:
+    with psycopg2.connect(**db_params) as conn, conn.cursor() as cur:
+        for table in tables:
+            cur.execute(f"SELECT to_regclass('{table}')")
+            if cur.fetchone()[0]:
+                cur.execute(f"TRUNCATE {table}")
+    conn.close()
+
+
+@pytest.mark.parametrize("method", ["copy", "insert"])
+def test_ingest_messages(benchmark, bench_db, bench_data, method):
+    """ingest_to_db.ingest_data into an empty landing table (manifest cleared, so every file loads)."""
+    benchmark.group = "ingest_data"
+    stats = benchmark.pedantic(
+        ingest_data, kwargs={"method": method, "base_path": bench_data["messages_dir"]},
+        setup=lambda: truncate(bench_db, "raw.telegram_messages", "raw.ingest_manifest"),
+        rounds=3)
+    assert stats["rows"] == bench_data["messages"]
+    benchmark.extra_info["rows"] = stats["rows"]
+
+
+def test_ingest_messages_unchanged(benchmark, bench_db, bench_data):
+    """A re-run over files the manifest already holds: the steady-state cost of a scheduled load."""
+    benchmark.group = "ingest_data"
+    ingest_data(base_path=bench_data["messages_dir"])
+    stats = benchmark.pedantic(ingest_data, kwargs={"base_path": bench_data["messages_dir"]}, rounds=3)
+    assert stats["rows"] == 0 and stats["files_skipped"] > 0
+
+
+def test_load_detections(benchmark, bench_db, bench_data):
+    """ingest_detections.load_detections of the detections CSV (replace mode)."""
+    benchmark.group = "load_detections"
+    setup_raw_schema(bench_db)
+    stats = benchmark.pedantic(load_detections, args=(bench_data["detections_csv"], bench_db), rounds=3)
+    assert stats["rows"] == bench_data["detections"]
+    benchmark.extra_info["rows"] = stats["rows"]
@@ -0,0 +1,20 @@
+{#
+    Stamps a new warehouse refresh version at the end of every dbt run/build.
+    The API keys its response cache on this version, so cached aggregates are
+    dropped as soon as the marts have been rebuilt.
+#}
+{% macro bump_refresh_version() %}
+    {% if execute and flags.WHICH in ('run', 'build') %}
+        create schema if not exists marts;
+        create table if not exists marts.warehouse_refresh (
+            id integer primary key default 1,
+            version bigint not null,
+            refreshed_at timestamptz not null
+        );
+        insert into marts.warehouse_refresh (id, version, refreshed_at)
+        values (1, 1, now())
+        on conflict (id) do update
+            set version = marts.warehouse_refresh.version + 1,
+                refreshed_at = now();
+    {% endif %}
+{% endmacro %}
@@ -0,0 +1,13 @@
+{#
+    High-water mark of an incremental model: the newest `column` already in
+    {{ this }}, minus `incremental_lookback_minutes`. The overlap re-reads rows
+    of ingest transactions that started before the last run but committed
+    after it; the models merge on their keys, so re-reading is harmless.
+#}
+{% macro incremental_watermark(column) %}
+    (
+        select coalesce(max({{ column }}), '-infinity'::timestamp)
+               - interval '{{ var("incremental_lookback_minutes") }} minutes'
+        from {{ this }}
+    )
+{% endmacro %}
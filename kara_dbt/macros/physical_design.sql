@@ -0,0 +1,89 @@
+{#
+    Physical design of the marts, applied as post-hooks.
+
+    primary_key(columns)
+        Declares the model's primary key unless it already has one (incremental
+        runs keep the table, and the hook runs after every build).
+
+    partition_by_date(column)
+        With `partition_marts: true`, turns the freshly built table into one
+        range-partitioned by month on `column`, with a partition per month of
+        dim_dates and a default partition for rows outside the calendar.
+        Later runs only add partitions for months dim_dates has gained. The
+        table's indexes are recreated on the partitioned table; unique ones
+        that do not contain `column` become plain indexes, since Postgres only
+        enforces uniqueness per partition (the dbt unique tests still apply).
+        Models using it need dim_dates as a dependency.
+#}
+
+{% macro primary_key(columns) %}
+    {%- set relation = this.include(database=False) -%}
+    do $$
+    begin
+        if not exists (
+            select 1 from pg_constraint
+            where conrelid = '{{ relation }}'::regclass and contype = 'p'
+        ) then
+            alter table {{ relation }} add primary key ({{ columns | join(', ') }});
+        end if;
+    end $$
+{% endmacro %}
+
+
+{% macro partition_by_date(column) %}
+    {%- if var('partition_marts') -%}
+    {%- set relation = this.include(database=False) -%}
+    {%- set calendar = ref('dim_dates').include(database=False) -%}
+    do $$
+    declare
+        month_start date;
+        index_defs text[];
+        index_def text;
+        converted boolean := false;
+    begin
+        if not exists (select 1 from pg_partitioned_table where partrelid = '{{ relation }}'::regclass) then
+            -- Keep the index definitions, pointed at the new table
+            select array_agg(
+                       regexp_replace(
+                           case when i.indisunique and not ('{{ column }}' = any(
+                                    select attname from pg_attribute
+                                    where attrelid = i.indrelid and attnum = any(i.indkey)))
+                                then replace(pg_get_indexdef(i.indexrelid), 'CREATE UNIQUE INDEX', 'CREATE INDEX')
+                                else pg_get_indexdef(i.indexrelid)
+                           end,
+                           ' ON \S+ USING ', ' ON {{ relation }} USING '))
+            into index_defs
+            from pg_index i
+            where i.indrelid = '{{ relation }}'::regclass;
+
+            alter table {{ relation }} rename to {{ this.identifier }}__unpartitioned;
+            create table {{ relation }}
+                (like {{ this.schema }}.{{ this.identifier }}__unpartitioned including defaults)
+                partition by range ({{ column }});
+            create table {{ this.schema }}.{{ this.identifier }}_default
+                partition of {{ relation }} default;
+            converted := true;
+        end if;
+
+        -- One partition per calendar month (new months when dim_dates grows)
+        for month_start in
+            select distinct date_trunc('month', date_key)::date from {{ calendar }} order by 1
+        loop
+            execute format(
+                'create table if not exists {{ this.schema }}.%I partition of {{ relation }} for values from (%L) to (%L)',
+                '{{ this.identifier }}_p' || to_char(month_start, 'YYYYMM'),
+                month_start, (month_start + interval '1 month')::date
+            );
+        end loop;
+
+        if converted then
+            insert into {{ relation }} select * from {{ this.schema }}.{{ this.identifier }}__unpartitioned;
+            drop table {{ this.schema }}.{{ this.identifier }}__unpartitioned;
+            foreach index_def in array coalesce(index_defs, '{}') loop
+                execute index_def;
+            end loop;
+            execute 'analyze {{ relation }}';
+        end if;
+    end $$
+    {%- endif -%}
+{% endmacro %}
@@ -0,0 +1,42 @@
+-- Daily message rollup per channel, the source of the /analytics/trends endpoints.
+-- Incremental: each run re-aggregates the days that received new or re-ingested
+-- messages (ingested_at past the watermark, including backfilled old days) plus
+-- the last `rollup_lookback_days` days, and replaces those rows by key.
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['date_key', 'channel_key'],
+    indexes=[
+        {'columns': ['date_key', 'channel_key'], 'unique': True},
+    ]
+) }}
+
+select
+    f.date_key,
+    f.channel_key,
+    count(*) as message_count,
+    count(*) filter (where f.has_image) as image_message_count,
+    -- Counts are kept next to the share so coarser buckets can re-derive it
+    round(count(*) filter (where f.has_image)::numeric / count(*), 4) as image_share,
+    coalesce(sum(f.views), 0) as total_views,
+    coalesce(sum(f.forwards), 0) as total_forwards,
+    -- High-water mark of the facts rolled up (see incremental_watermark)
+    max(f.ingested_at) as ingested_at
+from {{ ref('fct_messages') }} f
+where f.date_key is not null
+{% if is_incremental() %}
+  and (
+      -- Every day with facts (re)loaded since the last run, however old
+      -- (partition backfills, late ingests)
+      f.date_key in (
+          select distinct date_key from {{ ref('fct_messages') }}
+          where ingested_at > {{ incremental_watermark('ingested_at') }}
+      )
+      -- and, as a floor, the last `rollup_lookback_days` days
+      or f.date_key >= (
+          select coalesce(max(date_key), '1900-01-01'::date) - {{ var('rollup_lookback_days') }}
+          from {{ this }}
+      )
+  )
+{% endif %}
+group by f.date_key, f.channel_key
@@ -0,0 +1,42 @@
+-- Daily YOLO detection rollup per class, image category and channel.
+-- Incremental like agg_channel_daily: the days with new or re-ingested
+-- detections, plus the last `rollup_lookback_days` days, are re-aggregated on
+-- every run and replaced by key.
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['date_key', 'channel_key', 'detected_class', 'image_category'],
+    indexes=[
+        {'columns': ['date_key', 'channel_key', 'detected_class', 'image_category'], 'unique': True},
+    ]
+) }}
+
+select
+    d.date_key,
+    d.channel_key,
+    d.detected_class,
+    d.image_category,
+    count(*) as detection_count,
+    -- Summed so weekly/monthly buckets get a correctly weighted average
+    sum(d.confidence_score) as confidence_sum,
+    avg(d.confidence_score) as avg_confidence,
+    -- High-water mark of the facts rolled up (see incremental_watermark)
+    max(d.ingested_at) as ingested_at
+from {{ ref('fct_image_detections') }} d
+where d.date_key is not null
+{% if is_incremental() %}
+  and (
+      -- Every day with facts (re)loaded since the last run, however old
+      -- (partition backfills, late ingests)
+      d.date_key in (
+          select distinct date_key from {{ ref('fct_image_detections') }}
+          where ingested_at > {{ incremental_watermark('ingested_at') }}
+      )
+      -- and, as a floor, the last `rollup_lookback_days` days
+      or d.date_key >= (
+          select coalesce(max(date_key), '1900-01-01'::date) - {{ var('rollup_lookback_days') }}
+          from {{ this }}
+      )
+  )
+{% endif %}
+group by d.date_key, d.channel_key, d.detected_class, d.image_category
@@ -1,10 +1,25 @@
+-- Append-only: a channel keeps its key forever and new channels are numbered
+-- after the existing ones, so incremental facts never point at a reused key.
+{{ config(
+    materialized='incremental',
+    incremental_strategy='append',
+    indexes=[
+        {'columns': ['channel_name'], 'unique': True},
+    ],
+    post_hook="{{ primary_key(['channel_key']) }}"
+) }}
+
 with unique_channels as (
     select distinct
         channel as channel_name
     from {{ ref('stg_telegram_data') }}
+    {% if is_incremental() %}
+    where channel not in (select channel_name from {{ this }})
+    {% endif %}
 )
 
 select
+    {% if is_incremental() %}(select coalesce(max(channel_key), 0) from {{ this }}) + {% endif %}
     row_number() over (order by channel_name) as channel_key,
     channel_name
-from unique_channels
\ No newline at end of file
+from unique_channels
@@ -1,4 +1,7 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='table',
+    post_hook="{{ primary_key(['date_key']) }}"
+) }}
 
 with date_series as (
     -- Generates every day from 2024 to the end of 2026
@@ -1,15 +1,57 @@
 -- kara_dbt/models/marts/fct_image_detections.sql
-{{ config(materialized='table') }}
+-- Detections join their message on the typed (channel, message_id) key: the
+-- channel name is resolved to channel_key through dim_channels, then matched
+-- against fct_messages' unique (channel_key, message_id) index.
+-- Incremental: every detection of a message is rebuilt when the message or
+-- one of its detections was (re)loaded since the last run, replacing the
+-- previous set (delete+insert on (channel_key, message_id)). Messages whose
+-- detections were all removed keep their old rows until `dbt run --full-refresh`.
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['channel_key', 'message_id'],
+    indexes=[
+        {'columns': ['date_key', 'channel_key', 'message_id', 'detection_id'], 'unique': True},
+        {'columns': ['detected_class']},
+        {'columns': ['channel_key', 'message_id']},
+        {'columns': ['ingested_at']},
+    ],
+    post_hook="{{ partition_by_date('date_key') }}"
+) }}
+-- depends_on: {{ ref('dim_dates') }}
+
+{% if is_incremental() %}
+with changed_messages as (
+    select channel_key, message_id from {{ ref('fct_messages') }}
+    where ingested_at > {{ incremental_watermark('ingested_at') }}
+    union
+    select c.channel_key, d.message_id from {{ ref('stg_detection_results') }} d
+    join {{ ref('dim_channels') }} c on c.channel_name = d.channel
+    where d.ingested_at > {{ incremental_watermark('ingested_at') }}
+)
+{% endif %}
 
 SELECT 
+    -- Ordinal of the detection within its message: a stable tie-breaker for
+    -- keyset pagination that does not shift when other messages change
+    -- (message ids are only unique within a channel, hence the channel_key)
+    row_number() over (
+        PARTITION BY m.channel_key, m.message_id
+        ORDER BY d.image_path, d.detected_item, d.confidence DESC
+    ) as detection_id,
     m.message_id,
     m.channel_key,
     m.date_key as date_key,           -- Rubric Alignment
-    d.label as detected_class,        -- Rubric Alignment
+    d.detected_item as detected_class, -- Rubric Alignment
     d.confidence as confidence_score, -- Rubric Alignment
     CASE 
-        WHEN d.label IN ('pill', 'capsule', 'syrup') THEN 'Medication'
+        WHEN d.detected_item IN ('pill', 'capsule', 'syrup') THEN 'Medication'
         ELSE 'Medical Equipment'
-    END AS image_category
-FROM {{ ref('fct_messages') }} m
-JOIN {{ ref('stg_detection_results') }} d ON m.message_id = d.message_id
\ No newline at end of file
+    END AS image_category,
+    greatest(m.ingested_at, d.ingested_at) as ingested_at
+FROM {{ ref('stg_detection_results') }} d
+JOIN {{ ref('dim_channels') }} c ON c.channel_name = d.channel
+JOIN {{ ref('fct_messages') }} m ON m.channel_key = c.channel_key AND m.message_id = d.message_id
+{% if is_incremental() %}
+WHERE (m.channel_key, m.message_id) IN (select channel_key, message_id from changed_messages)
+{% endif %}
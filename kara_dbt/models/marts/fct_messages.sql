@@ -1,5 +1,24 @@
+-- Incremental: messages (re)ingested since the last run are merged on
+-- (channel_key, message_id); late edits to views/forwards overwrite the old row.
+{{ config(
+    materialized='incremental',
+    incremental_strategy='merge',
+    unique_key=['channel_key', 'message_id'],
+    indexes=[
+        {'columns': ['channel_key', 'message_id'], 'unique': True},
+        {'columns': ['ingested_at']},
+        {'columns': ['date_key']},
+        {'columns': ['search_vector'], 'type': 'gin'},
+        {'columns': ['channel_key', 'message_timestamp']},
+    ] + ([{'columns': ['message_text gin_trgm_ops'], 'type': 'gin'}] if var('enable_trigram_search') else []),
+    post_hook="{{ partition_by_date('date_key') }}"
+) }}
+
 with messages as (
     select * from {{ ref('stg_telegram_data') }}
+    {% if is_incremental() %}
+    where ingested_at > {{ incremental_watermark('ingested_at') }}
+    {% endif %}
 ),
 channels as (
     select * from {{ ref('dim_channels') }}
@@ -17,12 +36,21 @@ select
     d.date_key,
     
     -- Fact Attributes
+    m.message_timestamp,
     m.message_text,
     m.message_length,
     m.has_image,
     m.views,
     m.forwards,
-    m.image_path
+    m.image_path,
+
+    -- Full-text search: stemmed English terms rank above exact tokens, and the
+    -- 'simple' config keeps Amharic (and any other script) words as-is
+    setweight(to_tsvector('english', coalesce(m.message_text, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(m.message_text, '')), 'B') as search_vector,
+
+    -- High-water mark of the incremental loads
+    m.ingested_at
 from messages m
 left join channels c on m.channel = c.channel_name
 left join dates d on m.date_key = d.date_key
\ No newline at end of file
@@ -1,9 +1,18 @@
+-- One row per detected box, keyed on the message it belongs to:
+-- (channel, message_id) comes typed from the detector, not from parsing file names
 with raw_detections as (
     select * from {{ source('telegram_raw', 'detection_results') }}
 )
 select
     channel,
+    message_id,
     image_path,
     label as detected_item,
-    confidence
+    confidence,
+    x_min,
+    y_min,
+    x_max,
+    y_max,
+    ingested_at
 from raw_detections
+where message_id is not null
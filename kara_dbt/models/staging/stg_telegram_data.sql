@@ -1,9 +1,25 @@
+-- Incremental: only raw rows (re)ingested since the last run are parsed, and
+-- merged on (channel, message_id) so edited messages (views, forwards) replace
+-- their previous version. `dbt run --full-refresh` re-parses everything.
+{{ config(
+    materialized='incremental',
+    incremental_strategy='merge',
+    unique_key=['channel', 'message_id'],
+    indexes=[
+        {'columns': ['channel', 'message_id'], 'unique': True},
+        {'columns': ['ingested_at']},
+    ]
+) }}
+
 with raw_data as (
     select * from {{ source('telegram_raw', 'telegram_messages') }}
+    {% if is_incremental() %}
+    where ingested_at > {{ incremental_watermark('ingested_at') }}
+    {% endif %}
 )
 
 select
-    (content->>'id')::int as message_id,
+    (content->>'id')::bigint as message_id,
     channel,
     (content->>'date')::timestamp as message_timestamp,
     (content->>'date')::date as date_key,
@@ -15,5 +31,6 @@ select
     end as has_image,
     (content->>'views')::int as views,
     (content->>'forwards')::int as forwards,
-    content->>'image_path' as image_path -- <--- ENSURE THIS ALIAS IS HERE
-from raw_data
\ No newline at end of file
+    content->>'image_path' as image_path, -- <--- ENSURE THIS ALIAS IS HERE
+    ingested_at
+from raw_data
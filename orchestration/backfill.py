@@ -0,0 +1,64 @@
+"""
+Module: backfill.py
+Description: Backfills a range of days with one command. Every channel of every
+             day in the range is materialized in a single Dagster run (the
+             assets' single-run backfill policy), so channels are scraped
+             concurrently over one Telegram session and detection loads the
+             model once, then dbt runs once at the end. Days whose partitions
+             are all materialized already are skipped unless --force is given.
+             Runs are recorded in the instance at $DAGSTER_HOME, like `dagster dev`.
+Author: Addisu
+
+Usage:
+    python -m orchestration.backfill 2026-01-01 2026-01-07
+    python -m orchestration.backfill 2026-01-01 2026-01-07 --channel CheMed123 --force
+"""
+
+import os
+import argparse
+from datetime import date, timedelta
+
+from dagster import DagsterInstance
+
+from orchestration.definitions import CHANNELS, defs, partition_range_tags, telegram_scraper
+
+
+def missing_days(instance, days: list, channels: list) -> list:
+    """The days on which at least one of the channels has no scraped partition yet."""
+    materialized = instance.get_materialized_partitions(telegram_scraper.key)
+    return [day for day in days
+            if any(f"{channel}|{day.isoformat()}" not in materialized for channel in channels)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Backfill the daily pipeline partitions in one run')
+    parser.add_argument('start', type=date.fromisoformat, help="First day (YYYY-MM-DD)")
+    parser.add_argument('end', type=date.fromisoformat, help="Last day, inclusive")
+    parser.add_argument('--channel', choices=CHANNELS, help="Only this channel (default: all)")
+    parser.add_argument('--force', action='store_true', help="Also re-run days that are complete")
+    args = parser.parse_args()
+
+    if os.getenv("DAGSTER_HOME"):
+        instance = DagsterInstance.get()
+    else:
+        print("DAGSTER_HOME is not set: the run is not recorded and every day is treated as missing.")
+        instance = DagsterInstance.ephemeral()
+
+    channels = [args.channel] if args.channel else CHANNELS
+    days = [args.start + timedelta(days=i) for i in range((args.end - args.start).days + 1)]
+    if not args.force:
+        days = missing_days(instance, days, channels)
+        if not days:
+            print("Every partition in the range is materialized already (use --force to re-run).")
+            return
+
+    # Ranges are contiguous: from the first to the last day that needs work
+    start, end = days[0].isoformat(), days[-1].isoformat()
+    print(f"Backfilling {len(channels)} channel(s) from {start} to {end} in one run...")
+    result = defs.resolve_job_def("medical_pipeline_job").execute_in_process(
+        instance=instance, tags=partition_range_tags(start, end, channels), raise_on_error=False)
+    print("Backfill " + ("succeeded." if result.success else "failed; see the run's logs."))
+
+
+if __name__ == "__main__":
+    main()
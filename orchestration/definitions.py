@@ -1,47 +1,183 @@
-from dagster import asset, Definitions, define_asset_job, ScheduleDefinition
-import subprocess
+from dagster import (
+    AutomationCondition,
+    BackfillPolicy,
+    DailyPartitionsDefinition,
+    Definitions,
+    Failure,
+    MaterializeResult,
+    MultiPartitionsDefinition,
+    RunRequest,
+    StaticPartitionsDefinition,
+    asset,
+    define_asset_job,
+    schedule,
+)
+import asyncio
 import os
 import sys
+from datetime import date, timedelta
 
-PYTHON_EXE = sys.executable
+# Add the project root to the import path
+# The assets call the pipeline scripts in-process instead of running them as subprocesses
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
 
-# Add the project root to the environment variables
-# This allows scripts to find modules like 'scripts.logger_config'
-custom_env = os.environ.copy()
-custom_env["PYTHONPATH"] = os.getcwd()
+from scripts.scraper import CHANNELS, LANDING_DIR, posted_partition_path  # noqa: E402
+from scripts.instrumentation import dagster_metadata, stage  # noqa: E402
+from scripts.logger_config import log_context  # noqa: E402
 
-@asset(group_name="extraction")
-def telegram_scraper():
-    """Step 1: Scrape raw messages and images from Telegram."""
-    # We pass the custom_env here
-    subprocess.run([PYTHON_EXE, "scripts/scraper.py"], env=custom_env, check=True)
+DBT_DIR = os.path.join(PROJECT_ROOT, "kara_dbt")
+IMAGE_DIR = "data/raw/images"
 
-@asset(deps=[telegram_scraper], group_name="detection")
-def yolo_object_detection():
-    """Step 2: Run YOLO model on downloaded images."""
-    subprocess.run([PYTHON_EXE, "scripts/yolo_detection.py"], env=custom_env, check=True)
+# First day of the daily partitions
+PIPELINE_START_DATE = os.getenv("PIPELINE_START_DATE", "2026-01-01")
 
-@asset(deps=[yolo_object_detection], group_name="transformation")
-def dbt_warehouse_models():
-    """Step 3: Run dbt to transform raw data."""
-    dbt_path = os.path.join(os.getcwd(), "kara_dbt")
-    # Note: dbt doesn't usually need the PYTHONPATH, but it doesn't hurt
-    subprocess.run(["dbt", "run"], cwd=dbt_path, check=True)
+# One partition per channel and day (UTC); the channel dimension keeps CHANNELS' order
+pipeline_partitions = MultiPartitionsDefinition({
+    "date": DailyPartitionsDefinition(start_date=PIPELINE_START_DATE),
+    "channel": StaticPartitionsDefinition(CHANNELS),
+})
 
-defs = Definitions(
-    assets=[telegram_scraper, yolo_object_detection, dbt_warehouse_models],
-)
+# Tags Dagster sets on a run that materializes a range of partitions at once
+PARTITION_RANGE_START_TAG = "dagster/asset_partition_range_start"
+PARTITION_RANGE_END_TAG = "dagster/asset_partition_range_end"
+
+
+def partition_range_tags(start: str, end: str, channels: list = CHANNELS) -> dict:
+    """Run tags covering every day from `start` to `end` (ISO dates) for a contiguous run of channels."""
+    return {
+        PARTITION_RANGE_START_TAG: f"{channels[0]}|{start}",
+        PARTITION_RANGE_END_TAG: f"{channels[-1]}|{end}",
+    }
+
+
+def run_partitions(context) -> list:
+    """(channel, date) of every partition in the run: one for a single partition, many for a ranged run."""
+    return [
+        (key.keys_by_dimension["channel"], date.fromisoformat(key.keys_by_dimension["date"]))
+        for key in context.partition_keys
+    ]
+
+
+def landing_files(partitions: list) -> list:
+    """Existing posted-day landing files (NDJSON, or Parquet once compacted) of the partitions."""
+    files = []
+    for channel, day in partitions:
+        for extension in (".ndjson", ".parquet"):
+            path = posted_partition_path(channel, day, LANDING_DIR, extension)
+            if os.path.exists(path):
+                files.append(path)
+    return files
+
+
+# Every partitioned asset can run a whole range of partitions in one run, so a
+# backfill loads the libraries and the YOLO model once and works on all its
+# channels at the same time instead of running one process per partition
+@asset(partitions_def=pipeline_partitions, backfill_policy=BackfillPolicy.single_run(),
+       group_name="extraction", code_version="2")
+def telegram_scraper(context) -> MaterializeResult:
+    """Step 1: Scrape each channel's messages and images of the partition's days."""
+    from telethon import TelegramClient
+    from scripts import scraper
+
+    partitions = run_partitions(context)
+
+    async def scrape():
+        async with TelegramClient("menorah_session", scraper.api_id, scraper.api_hash) as client:
+            return await scraper.scrape_partitions(client, partitions)
+
+    with log_context(run_id=context.run_id), stage("telegram_scraper") as metrics:
+        stats = asyncio.run(scrape())
+        metrics.count("partitions", len(partitions))
+        metrics.count("messages", sum(s["messages"] for s in stats.values()))
+        metrics.count("photos", sum(s["photos"] for s in stats.values()))
+        metrics.count("bytes_downloaded", sum(s["bytes"] for s in stats.values()))
+    return MaterializeResult(metadata=dagster_metadata(metrics.close()))
 
-# 1. Define the Job
-medical_pipeline_job = define_asset_job("medical_pipeline_job", selection="*")
 
-# 2. Define the Schedule (Daily at Midnight)
-daily_medical_schedule = ScheduleDefinition(
-    job=medical_pipeline_job,
-    cron_schedule="0 0 * * *",
+@asset(deps=[telegram_scraper], partitions_def=pipeline_partitions,
+       backfill_policy=BackfillPolicy.single_run(), group_name="loading",
+       automation_condition=AutomationCondition.eager(), code_version="1")
+def raw_telegram_messages(context) -> MaterializeResult:
+    """Step 2: Load the partitions' landing files into raw.telegram_messages."""
+    from scripts.ingest_to_db import ingest_data
+
+    files = landing_files(run_partitions(context))
+    if not files:
+        return MaterializeResult(metadata={"rows": 0, "files": 0})
+    with log_context(run_id=context.run_id):
+        stats = ingest_data(base_path=LANDING_DIR, paths=files)
+    if not stats:
+        raise Failure(description="Loading the landing files into raw.telegram_messages failed")
+    return MaterializeResult(metadata={
+        **dagster_metadata(stats["metrics"]),
+        "unchanged_files": stats["files_skipped"],
+    })
+
+
+@asset(deps=[telegram_scraper], partitions_def=pipeline_partitions,
+       backfill_policy=BackfillPolicy.single_run(), group_name="detection",
+       automation_condition=AutomationCondition.eager(), code_version="1")
+def yolo_object_detection(context) -> MaterializeResult:
+    """Step 3: Run YOLO on the photos of the partitions' messages."""
+    from scripts.ingest_to_db import iter_landing_records
+    from scripts.yolo_detection import run_detection
+
+    items = []
+    for path in landing_files(run_partitions(context)):
+        for chunk in iter_landing_records(path):
+            for record in chunk:
+                image_path = os.path.join(IMAGE_DIR, record["channel"], record["image_path"] or "")
+                if record["image_path"] and os.path.exists(image_path):
+                    items.append((record["channel"], record["image_path"], image_path))
+    if not items:
+        return MaterializeResult(metadata={"images": 0, "inferred": 0, "detections": 0})
+    with log_context(run_id=context.run_id):
+        summary = run_detection(items=items)
+    if not summary:
+        raise Failure(description="YOLO detection found no image directory")
+    return MaterializeResult(metadata={
+        **dagster_metadata(summary["metrics"]),
+        "exported": summary["exported"],
+    })
+
+
+@asset(deps=[raw_telegram_messages, yolo_object_detection], group_name="transformation",
+       automation_condition=AutomationCondition.eager())
+def dbt_warehouse_models(context) -> MaterializeResult:
+    """Step 4: Run dbt to transform raw data."""
+    from dbt.cli.main import dbtRunner
+
+    command = ["run", "--project-dir", DBT_DIR]
+    # The models are incremental; DBT_FULL_REFRESH=1 rebuilds them from scratch
+    if os.getenv("DBT_FULL_REFRESH", "0") == "1":
+        command.append("--full-refresh")
+    with stage("dbt_run", run_id=context.run_id, full_refresh="--full-refresh" in command) as metrics:
+        result = dbtRunner().invoke(command)
+        if not result.success:
+            raise Failure(description=f"dbt run failed: {result.exception or 'see the dbt log'}")
+        metrics.count("models", len(result.result.results))
+        for model in result.result.results:
+            metrics.add_time(f"model.{model.node.name}", model.execution_time)
+    return MaterializeResult(metadata=dagster_metadata(metrics.close()))
+
+
+# 1. Define the Job: every channel of a day (or of a range of days) in one run
+medical_pipeline_job = define_asset_job(
+    "medical_pipeline_job", selection="*", partitions_def=pipeline_partitions,
 )
 
+
+# 2. Define the Schedule (Daily at Midnight): the day that just ended, all channels
+@schedule(job=medical_pipeline_job, cron_schedule="0 0 * * *", execution_timezone="UTC")
+def daily_medical_schedule(context):
+    day = (context.scheduled_execution_time - timedelta(days=1)).date().isoformat()
+    return RunRequest(run_key=day, tags=partition_range_tags(day, day))
+
+
 defs = Definitions(
-    assets=[telegram_scraper, yolo_object_detection, dbt_warehouse_models],
-    schedules=[daily_medical_schedule], # This adds the "Automation" requirement
-)
\ No newline at end of file
+    assets=[telegram_scraper, raw_telegram_messages, yolo_object_detection, dbt_warehouse_models],
+    jobs=[medical_pipeline_job],
+    schedules=[daily_medical_schedule],  # This adds the "Automation" requirement
+)
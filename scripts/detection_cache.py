@@ -0,0 +1,324 @@
+"""
+Module: detection_cache.py
+Description: A persistent, SQLite-backed cache of YOLO detections. Results are keyed
+             on the image content hash, the model weights hash and the inference
+             parameters, so an image only goes through the model again when its
+             bytes, the model or the settings change. Perceptual hashes of the
+             images let reposts with different bytes (re-encoded or resized
+             copies) reuse the detections of the photo they copy.
+Author: Addisu
+"""
+
+import os
+import sqlite3
+import hashlib
+from scripts.perceptual_hash import MultiIndexHash, hash_file
+
+# Default location of the cache database, next to the CSV export
+DEFAULT_CACHE_PATH = 'data/detection_cache.sqlite'
+
+# Columns stored per bounding box
+BOX_COLUMNS = ('label', 'confidence', 'x_min', 'y_min', 'x_max', 'y_max')
+
+def file_sha256(file_path: str) -> str:
+    """Hashes a file in 1 MB blocks and returns the hex digest."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1_048_576), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def model_fingerprint(weights: str, **params) -> str:
+    """
+    Identifies a model configuration: the weights file's hash (or its name if the
+    file is not on disk) plus every inference parameter that changes the output.
+
+    Args:
+        weights (str): Path or name of the YOLO weights file.
+        **params: Inference parameters, e.g. imgsz=640.
+
+    Returns:
+        str: A hex digest that changes whenever the weights or parameters do.
+    """
+    weights_id = file_sha256(weights) if os.path.exists(weights) else weights
+    settings = ','.join(f"{name}={params[name]}" for name in sorted(params))
+    return hashlib.sha256(f"{weights_id}|{settings}".encode('utf-8')).hexdigest()
+
+class DetectionCache:
+    """
+    Maps image content + model fingerprint to the detections YOLO produced.
+
+    Four tables are kept:
+    - images: where each (channel, image_path) last pointed, with its size,
+      mtime and content hash, so unchanged files are not re-hashed, and
+      whether its rows have reached PostgreSQL.
+    - results: one row per processed cache key (also for images with no boxes),
+      with the key whose boxes it copies when it is a near-duplicate.
+    - detections: the bounding boxes of each cache key.
+    - perceptual_hashes: the dHash and size of each image content hash.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        """
+        Args:
+            path (str): Location of the SQLite database. It is created if missing.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS images (
+                channel TEXT NOT NULL,
+                image_path TEXT NOT NULL,
+                image_hash TEXT NOT NULL,
+                cache_key TEXT NOT NULL,
+                size_bytes INTEGER,
+                mtime REAL,
+                exported INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (channel, image_path)
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                cache_key TEXT PRIMARY KEY,
+                box_count INTEGER NOT NULL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                source_key TEXT
+            );
+            CREATE TABLE IF NOT EXISTS detections (
+                cache_key TEXT NOT NULL,
+                label TEXT,
+                confidence REAL,
+                x_min REAL,
+                y_min REAL,
+                x_max REAL,
+                y_max REAL
+            );
+            CREATE INDEX IF NOT EXISTS ix_detections_cache_key ON detections (cache_key);
+            CREATE TABLE IF NOT EXISTS perceptual_hashes (
+                image_hash TEXT PRIMARY KEY,
+                phash INTEGER NOT NULL,
+                width INTEGER,
+                height INTEGER
+            );
+        """)
+        # Caches written before exports were tracked: their rows went out with the run
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(images)")}
+        if 'exported' not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE images ADD COLUMN exported INTEGER NOT NULL DEFAULT 1")
+        # Caches written before near-duplicate reuse: every result came from the model
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(results)")}
+        if 'source_key' not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE results ADD COLUMN source_key TEXT")
+
+    def close(self) -> None:
+        """Closes the underlying SQLite connection."""
+        self.conn.close()
+
+    @staticmethod
+    def cache_key(image_hash: str, fingerprint: str) -> str:
+        """Combines an image content hash with a model fingerprint."""
+        return hashlib.sha256(f"{image_hash}|{fingerprint}".encode('utf-8')).hexdigest()
+
+    def plan(self, items: list, fingerprint: str) -> tuple:
+        """
+        Splits images into those that need inference and those already cached.
+
+        Files whose size and mtime match the last run reuse the stored content
+        hash; anything else is hashed again.
+
+        Args:
+            items (list): (channel, image file name, image path) tuples.
+            fingerprint (str): The current model fingerprint.
+
+        Returns:
+            tuple: (entries, to_run, changed) where `entries` maps
+                   (channel, image_path) to (image_hash, cache_key, size, mtime),
+                   `to_run` lists the items whose cache key has no result yet, and
+                   `changed` is the set of (channel, image_path) whose cache key
+                   differs from the previous run (new, edited, or re-keyed images)
+                   or whose rows were never exported.
+        """
+        known = {
+            (channel, image_path): (image_hash, cache_key, size, mtime, exported)
+            for channel, image_path, image_hash, cache_key, size, mtime, exported in self.conn.execute(
+                "SELECT channel, image_path, image_hash, cache_key, size_bytes, mtime, exported FROM images"
+            )
+        }
+        processed = {key for (key,) in self.conn.execute("SELECT cache_key FROM results")}
+
+        entries, to_run, changed = {}, [], set()
+        queued_keys = set()
+        for channel, img_name, img_path in items:
+            stat = os.stat(img_path)
+            previous = known.get((channel, img_name))
+            if previous and previous[2] == stat.st_size and previous[3] == stat.st_mtime:
+                image_hash = previous[0]
+            else:
+                image_hash = file_sha256(img_path)
+            key = self.cache_key(image_hash, fingerprint)
+            entries[(channel, img_name)] = (image_hash, key, stat.st_size, stat.st_mtime)
+
+            if not previous or previous[1] != key or not previous[4]:
+                changed.add((channel, img_name))
+            # Identical bytes under several names only go through the model once
+            if key not in processed and key not in queued_keys:
+                to_run.append((channel, img_name, img_path))
+                queued_keys.add(key)
+        return entries, to_run, changed
+
+    def store(self, results: dict, entries: dict, exported: bool = True,
+              sources: dict = None) -> None:
+        """
+        Saves new detections and image entries in a single transaction.
+
+        Args:
+            results (dict): cache_key -> list of box tuples in BOX_COLUMNS order.
+            entries (dict): (channel, image_path) -> (image_hash, cache_key, size, mtime).
+            exported (bool): Whether the entries' rows are already in PostgreSQL.
+            sources (dict): cache_key -> key of the result it was copied from, for
+                            the results of near-duplicates.
+
+        Returns:
+            None
+        """
+        sources = sources or {}
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results (cache_key, box_count, source_key) VALUES (?, ?, ?)",
+                [(key, len(boxes), sources.get(key)) for key, boxes in results.items()]
+            )
+            self.conn.executemany("DELETE FROM detections WHERE cache_key = ?",
+                                  [(key,) for key in results])
+            self.conn.executemany(
+                f"INSERT INTO detections (cache_key, {', '.join(BOX_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(key, *box) for key, boxes in results.items() for box in boxes]
+            )
+            self.conn.executemany(
+                """INSERT OR REPLACE INTO images
+                   (channel, image_path, image_hash, cache_key, size_bytes, mtime, exported)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                [(channel, image_path, *entry, int(exported))
+                 for (channel, image_path), entry in entries.items()]
+            )
+
+    def near_duplicates(self, to_run: list, entries: dict, fingerprint: str,
+                        max_distance: int) -> tuple:
+        """
+        Takes the near-duplicates of already-detected photos out of the images
+        that need inference.
+
+        Every image's dHash is computed once per content hash and persisted. The
+        hashes of the images the model has processed under `fingerprint` are
+        loaded into a multi-index hash table; an image within `max_distance`
+        of one of them reuses its boxes. Images are taken in order and those
+        that still need inference join the table, so reposts within the same
+        run only go through the model once too.
+
+        Args:
+            to_run (list): Items needing inference, as returned by plan.
+            entries (dict): The image entries returned by plan.
+            fingerprint (str): The current model fingerprint.
+            max_distance (int): Hamming distance threshold (of 64 bits).
+
+        Returns:
+            tuple: (to_run, near) where `to_run` keeps the items that still need
+                   inference and `near` lists (item, source cache_key, (scale_x,
+                   scale_y)) for the others; the scales map the source's boxes
+                   onto the near-duplicate's size.
+        """
+        hashes = {
+            image_hash: (phash % (1 << 64), width, height)
+            for image_hash, phash, width, height in self.conn.execute(
+                "SELECT image_hash, phash, width, height FROM perceptual_hashes"
+            )
+        }
+        new_hashes = {}
+        for channel, img_name, img_path in to_run:
+            image_hash = entries[(channel, img_name)][0]
+            if image_hash not in hashes and image_hash not in new_hashes:
+                hashed = hash_file(img_path)
+                if hashed:
+                    new_hashes[image_hash] = hashed
+        with self.conn:
+            # SQLite integers are signed 64-bit
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO perceptual_hashes (image_hash, phash, width, height) VALUES (?, ?, ?, ?)",
+                [(image_hash, phash - (1 << 64) if phash >= 1 << 63 else phash, width, height)
+                 for image_hash, (phash, width, height) in new_hashes.items()]
+            )
+        hashes.update(new_hashes)
+
+        # Results the model produced for this fingerprint (not copies of other results)
+        index = MultiIndexHash(max_distance)
+        for image_hash, key in self.conn.execute("""
+            SELECT DISTINCT i.image_hash, i.cache_key
+            FROM images i
+            JOIN results r ON r.cache_key = i.cache_key
+            WHERE r.source_key IS NULL
+            ORDER BY r.rowid
+        """):
+            if image_hash in hashes and self.cache_key(image_hash, fingerprint) == key:
+                index.add(key, hashes[image_hash][0], hashes[image_hash][1:])
+
+        remaining, near = [], []
+        for item in to_run:
+            image_hash, key, _, _ = entries[(item[0], item[1])]
+            hashed = hashes.get(image_hash)
+            match = index.nearest(hashed[0]) if hashed else None
+            if match:
+                source_key, _, (width, height) = match
+                near.append((item, source_key, (hashed[1] / width, hashed[2] / height)))
+            else:
+                remaining.append(item)
+                if hashed:
+                    index.add(key, hashed[0], hashed[1:])
+        return remaining, near
+
+    def boxes_for(self, keys: list) -> dict:
+        """
+        Looks up the cached boxes of the given cache keys.
+
+        Args:
+            keys (list): Cache keys that already have a result.
+
+        Returns:
+            dict: cache_key -> list of box tuples in BOX_COLUMNS order (empty
+                  for images without detections).
+        """
+        boxes = {key: [] for key in keys}
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            cursor = self.conn.execute(
+                f"SELECT cache_key, {', '.join(BOX_COLUMNS)} FROM detections "
+                f"WHERE cache_key IN ({', '.join('?' * len(chunk))}) ORDER BY rowid",
+                chunk
+            )
+            for key, *box in cursor:
+                boxes[key].append(tuple(box))
+        return boxes
+
+    def iter_rows(self, images: set = None):
+        """
+        Yields one detection row per bounding box, joined to the images that
+        currently point at each cache key.
+
+        Args:
+            images (set): Optional subset of (channel, image_path) to return.
+
+        Yields:
+            tuple: (channel, image_path, label, confidence, x_min, y_min, x_max, y_max)
+        """
+        cursor = self.conn.execute(f"""
+            SELECT i.channel, i.image_path, {', '.join('d.' + c for c in BOX_COLUMNS)}
+            FROM images i
+            JOIN detections d ON d.cache_key = i.cache_key
+            ORDER BY i.channel, i.image_path, d.rowid
+        """)
+        for row in cursor:
+            if images is None or (row[0], row[1]) in images:
+                yield row
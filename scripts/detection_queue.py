@@ -0,0 +1,78 @@
+"""
+Module: detection_queue.py
+Description: A file spool of photos waiting for object detection. The scraper's
+             live mode appends one JSON line per newly downloaded photo, and
+             `yolo_detection.py --from-queue` claims the spool (an atomic rename),
+             detects just those images and deletes the claimed file, so new
+             photos reach raw.detection_results within seconds instead of at the
+             next full run.
+Author: Addisu
+"""
+
+import os
+import json
+import glob
+import time
+
+# Default location of the spool, next to the raw landing data
+DEFAULT_QUEUE_PATH = os.getenv('DETECTION_QUEUE_PATH', 'data/raw/detection_queue.ndjson')
+
+class DetectionQueue:
+    """
+    An append-only NDJSON spool of (channel, image file name) entries.
+
+    Producers append whole lines; the consumer renames the spool before
+    reading it, so producers start a fresh file and no entry is read twice.
+    A claimed file is only deleted once its images are detected, so a consumer
+    that crashes leaves it to be claimed again. The full detection run still
+    scans every image, so an entry lost in between is picked up there.
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH):
+        """
+        Args:
+            path (str): Location of the spool file. It is created on the first put.
+        """
+        self.path = path
+
+    def put(self, entries: list) -> None:
+        """
+        Appends photos to the spool.
+
+        Args:
+            entries (list): (channel, image file name) tuples.
+        """
+        if not entries:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps({'channel': channel, 'image_path': image_name}) + '\n'
+                            for channel, image_name in entries))
+
+    def claim(self) -> tuple:
+        """
+        Takes over the current spool and any file left claimed by an earlier consumer.
+
+        Returns:
+            tuple: (claimed file paths, unique (channel, image file name) tuples in spool order)
+        """
+        if os.path.exists(self.path):
+            os.replace(self.path, f"{self.path}.{time.time_ns()}.claimed")
+        claimed = sorted(glob.glob(f"{glob.escape(self.path)}.*.claimed"))
+        entries = {}
+        for claimed_path in claimed:
+            with open(claimed_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # line cut short by a crashed producer
+                    entries[(record['channel'], record['image_path'])] = None
+        return claimed, list(entries)
+
+    def ack(self, claimed: list) -> None:
+        """Deletes claimed files whose images have been detected."""
+        for claimed_path in claimed:
+            os.remove(claimed_path)
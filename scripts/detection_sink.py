@@ -0,0 +1,204 @@
+"""
+Module: detection_sink.py
+Description: A streaming sink for YOLO detections. Boxes are buffered per image and
+             flushed in fixed-size chunks to a Parquet part file (float32 boxes),
+             to PostgreSQL via COPY, and finally to the detection cache, so a crashed
+             run resumes after the last flushed chunk instead of starting over.
+Author: Addisu
+"""
+
+import io
+import os
+import csv
+from datetime import datetime, timezone
+from scripts.detection_cache import BOX_COLUMNS
+
+# Column order of data/yolo_results.csv, the Parquet parts and raw.detection_results
+RESULT_COLUMNS = ['message_id', 'channel', 'image_path', *BOX_COLUMNS]
+
+# Images buffered between flushes
+FLUSH_EVERY = int(os.getenv('YOLO_FLUSH_EVERY', 500))
+
+# Root of the Parquet output; every run writes its own run=<timestamp> directory
+DETECTIONS_DIR = os.getenv('YOLO_DETECTIONS_DIR', 'data/detections')
+
+class DetectionSink:
+    """
+    Buffers the detections of each image and flushes them every `flush_every`
+    images. A flush:
+    1. Writes the chunk to `<parquet_dir>/run=<ts>/part-NNNNN.parquet` (needs the
+       optional 'pyarrow' package; skipped with a notice otherwise).
+    2. Replaces the chunk's images in raw.detection_results (DELETE + COPY) and
+       commits, when a PostgreSQL connection is available.
+    3. Records the results and image entries in the detection cache. This comes
+       last, so an image is only skipped on restart once its rows are safely out.
+    """
+
+    def __init__(self, cache, entries: dict, conn=None, flush_every: int = FLUSH_EVERY,
+                 parquet_dir: str = DETECTIONS_DIR, message_id=None):
+        """
+        Args:
+            cache (DetectionCache): Cache receiving each flushed chunk.
+            entries (dict): (channel, image_path) -> (image_hash, cache_key, size, mtime),
+                            as returned by DetectionCache.plan.
+            conn: Optional psycopg2 connection; without one only Parquet and the
+                  cache are written, and the images are exported on a later run.
+            flush_every (int): Images per flush.
+            parquet_dir (str): Root directory of the Parquet parts.
+            message_id (callable): Maps an image file name to its message id.
+        """
+        self.cache = cache
+        self.entries = entries
+        self.conn = conn
+        self.flush_every = max(1, flush_every)
+        self.run_dir = os.path.join(
+            parquet_dir, f"run={datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}")
+        self.message_id = message_id or (lambda img_name: None)
+        self.parts = 0
+        self.images = 0
+        self.boxes = 0
+        self._written = set()
+        self._images = {}
+        self._results = {}
+        self._sources = {}
+        self._parquet = True
+
+    def add(self, channel: str, img_name: str, boxes: list, new_result: bool = True,
+            source_key: str = None) -> None:
+        """
+        Buffers one image's boxes, flushing when the chunk is full.
+
+        Args:
+            channel (str): Channel the image belongs to.
+            img_name (str): Image file name.
+            boxes (list): (label, confidence, x_min, y_min, x_max, y_max) tuples.
+            new_result (bool): False when the boxes came out of the cache and
+                               only the image entry needs recording.
+            source_key (str): Cache key the boxes were copied from, when the
+                              image is a near-duplicate of an earlier photo.
+        """
+        image = (channel, img_name)
+        self._images[image] = boxes
+        if new_result:
+            self._results[self.entries[image][1]] = boxes
+            if source_key:
+                self._sources[self.entries[image][1]] = source_key
+        if len(self._images) >= self.flush_every:
+            self.flush()
+
+    def add_cached(self, images: set) -> None:
+        """
+        Emits images whose result is already cached but whose rows still have
+        to go out (new file names for known content, or unexported images).
+
+        Args:
+            images (set): (channel, image_path) pairs; those already written by
+                          this sink are ignored.
+        """
+        # Results buffered so far must be in the cache before they are looked up
+        self.flush()
+        pending = sorted(image for image in images if image not in self._written)
+        for i in range(0, len(pending), self.flush_every):
+            chunk = pending[i:i + self.flush_every]
+            boxes = self.cache.boxes_for(list({self.entries[image][1] for image in chunk}))
+            for channel, img_name in chunk:
+                self.add(channel, img_name, boxes[self.entries[(channel, img_name)][1]],
+                         new_result=False)
+
+    def rows(self):
+        """Yields the buffered detections as tuples in RESULT_COLUMNS order."""
+        for (channel, img_name), boxes in self._images.items():
+            msg_id = self.message_id(img_name)
+            for box in boxes:
+                yield (msg_id, channel, img_name, *box)
+
+    def flush(self) -> None:
+        """Writes the buffered chunk to Parquet, PostgreSQL and the cache."""
+        if not self._images:
+            return
+        rows = list(self.rows())
+        self._write_parquet(rows)
+        exported = self._export(rows)
+        self.cache.store(self._results, {image: self.entries[image] for image in self._images},
+                         exported=exported, sources=self._sources)
+
+        self.images += len(self._images)
+        self.boxes += len(rows)
+        self._written.update(self._images)
+        self._images, self._results, self._sources = {}, {}, {}
+
+    def close(self) -> None:
+        """Flushes whatever is still buffered."""
+        self.flush()
+
+    def _write_parquet(self, rows: list) -> None:
+        """Writes one part file, via a temporary name so readers never see half a part."""
+        if not self._parquet:
+            return
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("pyarrow is not installed; skipping the Parquet output.")
+            self._parquet = False
+            return
+
+        schema = pa.schema([
+            ('message_id', pa.int64()),
+            ('channel', pa.string()),
+            ('image_path', pa.string()),
+            ('label', pa.string()),
+            ('confidence', pa.float32()),
+            ('x_min', pa.float32()),
+            ('y_min', pa.float32()),
+            ('x_max', pa.float32()),
+            ('y_max', pa.float32()),
+        ])
+        columns = list(zip(*rows)) if rows else [[] for _ in RESULT_COLUMNS]
+        table = pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema
+        )
+
+        os.makedirs(self.run_dir, exist_ok=True)
+        part_path = os.path.join(self.run_dir, f"part-{self.parts:05d}.parquet")
+        pq.write_table(table, part_path + '.tmp')
+        os.replace(part_path + '.tmp', part_path)
+        self.parts += 1
+
+    def _export(self, rows: list) -> bool:
+        """
+        Replaces the chunk's images in raw.detection_results in one transaction.
+
+        Returns:
+            bool: True if the rows were committed. On failure the connection is
+                  dropped and the remaining chunks only go to Parquet and the cache.
+        """
+        if self.conn is None:
+            return False
+
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        channels, image_paths = zip(*self._images)
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(
+                    """DELETE FROM raw.detection_results
+                       WHERE (channel, image_path) IN
+                             (SELECT * FROM unnest(%s::text[], %s::text[]))""",
+                    (list(channels), list(image_paths))
+                )
+                cur.copy_expert(
+                    f"COPY raw.detection_results ({', '.join(RESULT_COLUMNS)}) "
+                    "FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+            self.conn.commit()
+            return True
+        except Exception as e:
+            self.conn.rollback()
+            print(f"Database Export Failed: {e}")
+            print("Continuing with the local Parquet/CSV outputs; rows will be exported on the next run.")
+            self.conn = None
+            return False
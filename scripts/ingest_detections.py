@@ -1,18 +1,23 @@
 """
 Module: ingest_detections.py
 Description: This script handles the ingestion of YOLO object detection results from a 
-             CSV file into a PostgreSQL data warehouse. It ensures the target schema 
-             exists and performs a verification count after ingestion.
+             CSV or Parquet export into a PostgreSQL data warehouse. It ensures the
+             target schema exists and loads the rows with COPY through a staging
+             table, so the live table is replaced atomically.
 Author: Addisu
 """
 
+import io
 import os
-import pandas as pd
+import csv
+import time
+import argparse
 import psycopg2
-from sqlalchemy import create_engine, text
-from sqlalchemy.exc import SQLAlchemyError
+from psycopg2 import sql
 from dotenv import load_dotenv
-from logger_config import get_logger  
+from sqlalchemy.engine import make_url
+from scripts.logger_config import get_logger
+from scripts.detection_sink import RESULT_COLUMNS
 
 # Load environment variables from .env file
 load_dotenv()
@@ -20,6 +25,16 @@ load_dotenv()
 # Initialize professional logger
 logger = get_logger("DetectionIngest")
 
+# Rows per batch when streaming a Parquet export into COPY
+CHUNK_ROWS = int(os.getenv('DETECTIONS_CHUNK_ROWS', 50000))
+
+# Detection values stored as float4: the detector's precision, half the width of FLOAT
+REAL_COLUMNS = ['confidence', 'x_min', 'y_min', 'x_max', 'y_max']
+
+# Message id embedded in the scraper's `<channel>_<id>.jpg` file names, used to
+# key rows of exports written before message_id was parsed correctly
+MESSAGE_ID_FROM_PATH = r"substring(image_path from '(?:^|_)(\d+)\.[^.]+$')::bigint"
+
 def setup_raw_schema(db_params: dict) -> None:
     """
     Creates the 'raw' schema and the 'detection_results' table if they do not exist.
@@ -40,19 +55,43 @@ def setup_raw_schema(db_params: dict) -> None:
             # Ensure the raw schema exists for the data warehouse
             cur.execute("CREATE SCHEMA IF NOT EXISTS raw;")
             
-            # Create the results table with specific types for detection data
+            # Create the results table with specific types for detection data;
+            # (channel, message_id) is the key of the message the image belongs to
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS raw.detection_results (
+                    message_id BIGINT,
                     channel TEXT,
                     image_path TEXT,
                     label TEXT,
-                    confidence FLOAT,
-                    x_min FLOAT,
-                    y_min FLOAT,
-                    x_max FLOAT,
-                    y_max FLOAT
+                    confidence REAL,
+                    x_min REAL,
+                    y_min REAL,
+                    x_max REAL,
+                    y_max REAL,
+                    ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 );
             """)
+            # Tables created before message_id was exported get the column added
+            cur.execute("ALTER TABLE raw.detection_results ADD COLUMN IF NOT EXISTS message_id BIGINT;")
+            migrate_detection_columns(cur)
+            # Load time, the high-water mark of the incremental dbt models
+            cur.execute("""
+                ALTER TABLE raw.detection_results
+                ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS ix_detection_results_ingested_at
+                ON raw.detection_results (ingested_at);
+            """)
+            # The fact build joins on the message key; reloads delete by image
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS ix_detection_results_message
+                ON raw.detection_results (channel, message_id);
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS ix_detection_results_image
+                ON raw.detection_results (channel, image_path);
+            """)
             conn.commit()
             logger.info("Database schema and table verified.")
     except psycopg2.Error as e:
@@ -62,45 +101,187 @@ def setup_raw_schema(db_params: dict) -> None:
         if 'conn' in locals():
             conn.close()
 
-def ingest_csv_to_postgres(file_path: str, db_url: str) -> None:
+def migrate_detection_columns(cur) -> None:
     """
-    Reads a CSV file containing detections and pushes it to PostgreSQL using SQLAlchemy.
+    Brings a raw.detection_results table from an older layout to the current
+    one: a BIGINT message_id (earlier loads stored it as text) and REAL
+    confidence and box coordinates. Message ids that older runs could not
+    parse are recovered from the image file names. Does nothing on an
+    up-to-date table.
 
-    The function uses pandas for efficient CSV reading and SQLAlchemy for the 
-    database transaction. It replaces the existing table data with new data.
+    Args:
+        cur: An open psycopg2 cursor.
+    """
+    cur.execute("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = 'raw' AND table_name = 'detection_results';
+    """)
+    types = dict(cur.fetchall())
+    retyped = [column for column, wanted in [('message_id', 'bigint'), *((c, 'real') for c in REAL_COLUMNS)]
+               if types.get(column, wanted) != wanted]
+    if not retyped:
+        return
+
+    logger.info(f"Migrating raw.detection_results columns {', '.join(retyped)} to their typed layout...")
+    # Column types cannot change under a view; the dbt staging views are recreated by the next `dbt run`
+    cur.execute("""
+        SELECT DISTINCT r.ev_class::regclass::text FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        WHERE d.refobjid = 'raw.detection_results'::regclass AND r.ev_class <> d.refobjid;
+    """)
+    for (view,) in cur.fetchall():
+        logger.warning(f"Dropping dependent view {view}; run `dbt run` to recreate it.")
+        cur.execute(f"DROP VIEW IF EXISTS {view} CASCADE;")
+    changes = [f"ALTER COLUMN {column} TYPE REAL" for column in retyped if column != 'message_id']
+    if 'message_id' in retyped:
+        changes.append(r"ALTER COLUMN message_id TYPE BIGINT "
+                       r"USING CASE WHEN message_id::text ~ '^\d+$' THEN message_id::text::bigint END")
+    cur.execute(f"ALTER TABLE raw.detection_results {', '.join(changes)};")
+    cur.execute(f"UPDATE raw.detection_results SET message_id = {MESSAGE_ID_FROM_PATH} WHERE message_id IS NULL;")
+
+def iter_copy_sources(file_path: str, chunk_rows: int = CHUNK_ROWS):
+    """
+    Yields the contents of a detections file as CSV streams ready for COPY.
+
+    A CSV export is handed to COPY as a single open file, which psycopg2 reads
+    in small blocks, so it is never loaded into memory. A Parquet export is
+    read `chunk_rows` rows at a time (requires the optional 'pyarrow' package)
+    and each batch is rendered into an in-memory CSV buffer.
 
     Args:
-        file_path (str): The local path to the YOLO results CSV file.
-        db_url (str): The SQLAlchemy-formatted connection string.
+        file_path (str): A '.csv' or '.parquet' detections file (or a directory
+                         of Parquet part files).
+        chunk_rows (int): Rows per Parquet batch.
+
+    Yields:
+        tuple: (columns, file-like object of headerless CSV rows).
+    """
+    if file_path.endswith('.csv'):
+        with open(file_path, newline='', encoding='utf-8') as f:
+            columns = next(csv.reader([f.readline()]))
+            yield columns, f
+        return
+
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(file_path, format='parquet')
+    columns = dataset.schema.names
+    for batch in dataset.to_batches(batch_size=chunk_rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(zip(*(batch.column(i).to_pylist() for i in range(batch.num_columns))))
+        buffer.seek(0)
+        yield columns, buffer
+
+def load_detections(file_path: str, db_params: dict, mode: str = 'replace',
+                    chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Loads detection results into raw.detection_results without ever leaving
+    the table empty or missing.
+
+    The function follows these steps:
+    1. COPYs the file into a temporary staging table shaped like the target
+       (LIKE raw.detection_results), chunk by chunk. Rows of older exports
+       without a parsed message id get it from the image file name on the
+       way into the live table.
+    2. In the same transaction, either replaces the whole table (`replace`:
+       DELETE + INSERT ... SELECT) or only the images present in the file
+       (`merge`). Concurrent readers keep seeing the previous rows until the
+       commit, and the table, its declared column types and the dbt views on
+       top of it are never dropped.
+    3. Logs the row count and throughput.
+
+    Args:
+        file_path (str): A detections CSV, Parquet file or Parquet directory.
+        db_params (dict): psycopg2 connection parameters.
+        mode (str): 'replace' or 'merge'.
+        chunk_rows (int): Rows per Parquet batch.
 
     Returns:
-        None
+        dict: rows, seconds and rows_per_sec of the load (empty if nothing ran).
     """
+    if mode not in ('replace', 'merge'):
+        raise ValueError(f"Unknown load mode: {mode}")
     if not os.path.exists(file_path):
         logger.error(f"Source file not found: {file_path}")
-        return
+        return {}
 
+    started = time.perf_counter()
+    conn = psycopg2.connect(**db_params)
     try:
-        # Load the detection data
-        df = pd.read_csv(file_path)
-        engine = create_engine(db_url)
-        
-        # Load data into PostgreSQL (schema 'raw')
-        # if_exists='replace' ensures the warehouse table is fresh
-        df.to_sql('detection_results', engine, schema='raw', if_exists='replace', index=False)
-        
-        logger.info(f"Successfully ingested {len(df)} rows into raw.detection_results")
-        
-        # Verification step: Count rows in the database to ensure sync
-        with engine.connect() as connection:
-            result = connection.execute(text("SELECT count(*) FROM raw.detection_results"))
-            count = result.scalar()
-            logger.info(f"Verification successful: {count} rows present in DB.")
-            
-    except SQLAlchemyError as e:
-        logger.error(f"SQLAlchemy error during ingestion: {e}")
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        with conn.cursor() as cur:
+            # 1. Stage the file next to the live table
+            cur.execute("""
+                CREATE TEMP TABLE stage_detection_results
+                (LIKE raw.detection_results INCLUDING DEFAULTS) ON COMMIT DROP;
+            """)
+            for columns, source in iter_copy_sources(file_path, chunk_rows):
+                copy = sql.SQL("COPY stage_detection_results ({}) FROM STDIN WITH (FORMAT csv)").format(
+                    sql.SQL(', ').join(map(sql.Identifier, columns)))
+                cur.copy_expert(copy.as_string(cur), source)
+            cur.execute("SELECT count(*) FROM stage_detection_results;")
+            rows = cur.fetchone()[0]
+
+            # 2. Swap the contents in the same transaction
+            if mode == 'replace':
+                cur.execute("DELETE FROM raw.detection_results;")
+            else:
+                cur.execute("""
+                    DELETE FROM raw.detection_results d
+                    USING (SELECT DISTINCT channel, image_path FROM stage_detection_results) s
+                    WHERE d.channel = s.channel AND d.image_path = s.image_path;
+                """)
+            cur.execute(f"""
+                INSERT INTO raw.detection_results ({', '.join(RESULT_COLUMNS)}, ingested_at)
+                SELECT coalesce(message_id, {MESSAGE_ID_FROM_PATH}), {', '.join(RESULT_COLUMNS[1:])}, ingested_at
+                FROM stage_detection_results;
+            """)
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        logger.error(f"PostgreSQL error during ingestion, previous rows kept: {e}")
+        raise
+    finally:
+        conn.close()
+
+    # 3. Report throughput
+    seconds = time.perf_counter() - started
+    stats = {'rows': rows, 'seconds': round(seconds, 2),
+             'rows_per_sec': round(rows / seconds, 1) if seconds else 0.0}
+    logger.info(f"Loaded {rows} rows into raw.detection_results ({mode}) in "
+                f"{stats['seconds']}s ({stats['rows_per_sec']} rows/s)")
+    return stats
+
+def db_params_from_url(db_url: str) -> dict:
+    """
+    Turns a SQLAlchemy-style connection string (e.g. 'postgresql+psycopg2://
+    user:password@host:5432/db') into psycopg2 connection parameters.
+    """
+    url = make_url(db_url)
+    params = {"host": url.host, "port": url.port, "database": url.database,
+              "user": url.username, "password": url.password}
+    return {key: value for key, value in params.items() if value is not None}
+
+def ingest_csv_to_postgres(file_path: str, db_url: str) -> dict:
+    """
+    Loads a detections export into raw.detection_results, replacing its rows.
+
+    Kept for callers of the original SQLAlchemy loader: the connection string
+    is turned into psycopg2 parameters and the load is done by
+    load_detections (replace mode). As before, database errors are logged
+    rather than raised.
+
+    Args:
+        file_path (str): The local path to the YOLO results CSV (or Parquet) file.
+        db_url (str): The SQLAlchemy-formatted connection string.
+
+    Returns:
+        dict: The load statistics of load_detections (empty if nothing ran).
+    """
+    try:
+        return load_detections(file_path, db_params_from_url(db_url))
+    except psycopg2.Error:
+        # Already logged by load_detections; the previous rows are kept
+        return {}
 
 if __name__ == "__main__":
     """
@@ -123,9 +304,12 @@ if __name__ == "__main__":
         "port": DB_PORT
     }
     
-    # Connection string for SQLAlchemy
-    SQLALCHEMY_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    CSV_PATH = 'data/yolo_results.csv'
+    parser = argparse.ArgumentParser(description="Load YOLO detections into raw.detection_results")
+    parser.add_argument('path', nargs='?', default='data/yolo_results.csv',
+                        help="Detections CSV, Parquet file or one run=<ts> directory of Parquet parts")
+    parser.add_argument('--mode', choices=['replace', 'merge'], default='replace',
+                        help="Replace the whole table, or only the images present in the file")
+    args = parser.parse_args()
 
     logger.info("Starting ingestion process...")
     
@@ -133,6 +317,6 @@ if __name__ == "__main__":
     setup_raw_schema(DB_PARAMS)
     
     # 2. Ingest Data
-    ingest_csv_to_postgres(CSV_PATH, SQLALCHEMY_URL)
+    load_detections(args.path, DB_PARAMS, mode=args.mode)
     
     logger.info("Ingestion process completed.")
\ No newline at end of file
@@ -0,0 +1,210 @@
+"""
+Module: instrumentation.py
+Description: Per-stage timing and counters for the pipeline. A stage (a scrape,
+             a load, a detection run) is opened with `stage()`, which collects
+             counters and timed spans while it runs and, when it ends, emits one
+             structured record: wall time, counters, a rate per counter
+             (rows/s, images/s, bytes/s, ...), time spent in each span (e.g.
+             the database load) and the process's peak RSS. Records are logged
+             through logger_config and appended to a JSON-lines metrics file, and
+             the Dagster assets attach them to their materializations. Fields
+             bound with logger_config.log_context (e.g. a run id) label the stages.
+Author: Addisu
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+from scripts.logger_config import current_context, get_logger, log_context
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# JSON-lines file every stage record is appended to ('' disables the file)
+METRICS_PATH = os.getenv('PIPELINE_METRICS_PATH', 'logs/pipeline_metrics.jsonl')
+
+logger = get_logger("PipelineMetrics")
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Returns the highest resident set size of this process so far, in MB.
+
+    This is a high-water mark for the whole process, so a stage reports the
+    peak reached by the end of it, including earlier stages run in the same
+    process. Returns None where the platform does not expose it.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1_048_576 if sys.platform == 'darwin' else 1024), 1)
+
+class StageMetrics:
+    """
+    Counters and span timings of one pipeline stage.
+
+    Counters and spans may be updated from worker threads and from concurrent
+    coroutines; spans with the same name accumulate, so the time of e.g.
+    every COPY batch adds up to the stage's total database load time.
+    """
+
+    def __init__(self, name: str, path: str = None, **labels):
+        """
+        Args:
+            name (str): Stage name, e.g. 'ingest' or 'scrape_channel'.
+            path (str): Metrics file the record is appended to on close (see emit);
+                        METRICS_PATH by default.
+            **labels: Identifying values recorded with the stage (channel, day, run id...),
+                      added to the fields bound with logger_config.log_context.
+        """
+        self.name = name
+        self.path = path
+        labels = {**{k: v for k, v in current_context().items() if k != 'stage'}, **labels}
+        self.labels = {key: str(value) for key, value in labels.items() if value is not None}
+        self.counters = {}
+        self.spans = {}
+        self.status = 'running'
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self._seconds = None
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: float = 1) -> None:
+        """Adds `value` to the counter `name`."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """Adds `seconds` to the span `name`."""
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    @contextmanager
+    def span(self, name: str):
+        """Times the enclosed block and adds it to the span `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def close(self, status: str = 'ok') -> dict:
+        """Stops the stage clock and emits the stage's record (once; later calls only return it)."""
+        if self._seconds is not None:
+            return self.record()
+        self._seconds = time.perf_counter() - self._started
+        self.status = status
+        record = self.record()
+        emit(record, self.path)
+        return record
+
+    @property
+    def seconds(self) -> float:
+        """Wall time of the stage so far (or in total once finished)."""
+        return self._seconds if self._seconds is not None else time.perf_counter() - self._started
+
+    def record(self) -> dict:
+        """
+        Returns the stage as a JSON-serializable record.
+
+        Returns:
+            dict: 'stage', 'status', 'started_at', 'seconds', 'labels',
+                  'counters', 'rates' (counter per second of wall time),
+                  'spans' (seconds) and 'peak_rss_mb'.
+        """
+        elapsed = max(self.seconds, 1e-9)
+        with self._lock:
+            counters = dict(self.counters)
+            spans = {name: round(seconds, 3) for name, seconds in self.spans.items()}
+        return {
+            'stage': self.name,
+            'status': self.status,
+            'started_at': self.started_at.isoformat(),
+            'seconds': round(elapsed, 3),
+            'labels': self.labels,
+            'counters': counters,
+            'rates': {f"{name}_per_sec": round(value / elapsed, 2) for name, value in counters.items()},
+            'spans': spans,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+def emit(record: dict, path: str = None) -> None:
+    """
+    Logs a stage record as one JSON line and appends it to the metrics file.
+
+    Args:
+        record (dict): A StageMetrics record.
+        path (str): JSON-lines file to append to (METRICS_PATH, read at call
+                    time, by default); '' only logs it.
+    """
+    if path is None:
+        path = METRICS_PATH
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    logger.info(line)
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+    except OSError as e:
+        logger.warning(f"Could not write metrics to {path}: {e}")
+
+@contextmanager
+def stage(name: str, path: str = None, **labels):
+    """
+    Instruments a pipeline stage.
+
+    Yields a StageMetrics to count and time the stage's work with; when the
+    block ends (or raises, with status 'failed') the stage's record is emitted.
+    Log records written inside the block carry the stage name and labels.
+
+    Args:
+        name (str): Stage name.
+        path (str): Metrics file (see emit); METRICS_PATH by default.
+        **labels: Identifying values recorded with the stage.
+
+    Example:
+        with stage('ingest', method='copy') as metrics:
+            with metrics.span('db_load'):
+                ...
+            metrics.count('rows', 500)
+    """
+    metrics = StageMetrics(name, path, **labels)
+    try:
+        with log_context(stage=name, **labels):
+            yield metrics
+    except BaseException:
+        metrics.close('failed')
+        raise
+    metrics.close()
+
+def dagster_metadata(record: dict) -> dict:
+    """
+    Flattens a stage record into Dagster materialization metadata.
+
+    Every value is a plain number or string, so Dagster plots each key across
+    materializations (the asset's Plots tab) and run-over-run regressions
+    show up without reading the logs.
+
+    Args:
+        record (dict): A StageMetrics record.
+
+    Returns:
+        dict: e.g. {'seconds': 12.3, 'rows': 5000, 'rows_per_sec': 406.5,
+              'db_load_seconds': 8.1, 'peak_rss_mb': 310.2}
+    """
+    metadata = {'seconds': record['seconds']}
+    metadata.update(record['counters'])
+    metadata.update(record['rates'])
+    metadata.update({f"{name}_seconds": seconds for name, seconds in record['spans'].items()})
+    if record.get('peak_rss_mb') is not None:
+        metadata['peak_rss_mb'] = record['peak_rss_mb']
+    return metadata
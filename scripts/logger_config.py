@@ -1,54 +1,246 @@
 """
 Module: logger_config.py
-Description: Provides a centralized logging configuration for the medical-telegram-warehouse 
-             pipeline. It ensures logs are consistently formatted and directed to both 
-             the console and a persistent log file.
+Description: Provides a centralized logging configuration for the medical-telegram-warehouse
+             pipeline. It ensures logs are consistently formatted and directed to both
+             the console and persistent, size-rotated log files: a text log and a
+             JSON-lines log whose entries carry the stage, channel and run id bound
+             with log_context(). By default loggers only enqueue their records and a
+             background thread does the formatting and disk I/O, so the asyncio
+             scraper and the detection loop never block on a log write.
 Author: Addisu
 """
 
-import logging
 import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Logging settings (overridable through the .env file)
+# Directory of the log files
+LOG_DIR = os.getenv('LOG_DIR', 'logs')
+# 'queue': a background thread writes the records; 'sync': the logging call writes them
+LOG_MODE = os.getenv('LOG_MODE', 'queue')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+# Each log file is rotated at this size, keeping LOG_BACKUP_COUNT old files
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+# Only 1 of every N debug() calls of a call site is logged (per-item logs in hot loops)
+LOG_DEBUG_SAMPLE_EVERY = int(os.getenv('LOG_DEBUG_SAMPLE_EVERY', 100))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Fields that may also be passed per call, e.g. logger.info(..., extra={'channel': name})
+CONTEXT_FIELDS = ('stage', 'channel', 'run_id')
+
+# Fields added to every record logged in the current context (see log_context)
+_context = ContextVar('log_context', default={})
+
+@contextmanager
+def log_context(**fields):
+    """
+    Binds fields (stage, channel, run_id...) to every record logged inside the
+    block, including by the asyncio tasks it starts.
+
+    Example:
+        with log_context(stage='scrape_channel', channel='CheMed123'):
+            logger.info("Starting scrape")
+    """
+    token = _context.set({**_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+def current_context() -> dict:
+    """Returns the fields bound by the enclosing log_context blocks."""
+    return dict(_context.get())
+
+class ContextFilter(logging.Filter):
+    """Copies the bound context onto each record, in the thread that logs it."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.context = _context.get()
+        return True
+
+# The shared handlers and the loggers using them (see configure)
+_lock = threading.RLock()
+_state = {'handlers': None, 'writers': [], 'listener': None, 'filter': ContextFilter(),
+          'level': logging.INFO, 'sample_every': 1}
+_loggers = set()
+# Calls seen per debug() call site (see PipelineLogger)
+_debug_calls = {}
+
+class PipelineLogger(logging.Logger):
+    """
+    A Logger whose debug() keeps only the 1st, (N+1)th, (2N+1)th... call of
+    every call site (N = LOG_DEBUG_SAMPLE_EVERY). Dropped calls return before
+    a record is even built, so per-item debug logs in hot loops cost next to
+    nothing; kept records note the rate in their 'sample_every' field.
+    """
+
+    def debug(self, msg, *args, **kwargs):
+        if not self.isEnabledFor(logging.DEBUG):
+            return
+        every = _state['sample_every']
+        if every > 1:
+            caller = sys._getframe(1)
+            site = (caller.f_code.co_filename, caller.f_lineno)
+            # Unlocked: a race only shifts which call of the site is kept
+            seen = _debug_calls.get(site, 0)
+            _debug_calls[site] = seen + 1
+            if seen % every:
+                return
+            kwargs['extra'] = {**(kwargs.get('extra') or {}), 'sample_every': every}
+        # Report the caller of debug(), not this method
+        kwargs['stacklevel'] = kwargs.get('stacklevel', 1) + 1
+        self._log(logging.DEBUG, msg, args, **kwargs)
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'context', {}))
+        for field in CONTEXT_FIELDS + ('sample_every',):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def _build_writers(log_dir: str, max_bytes: int, backup_count: int) -> list:
+    """Console, rotating text log and rotating JSON-lines log handlers."""
+    os.makedirs(log_dir, exist_ok=True)
+    formatter = logging.Formatter(TEXT_FORMAT)
+
+    # Console Handler: For real-time monitoring in the terminal
+    ch = logging.StreamHandler()
+    ch.setFormatter(formatter)
+
+    # File Handlers: For persistent record keeping, rotated by size
+    fh = RotatingFileHandler(os.path.join(log_dir, 'warehouse_pipeline.log'),
+                             maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    fh.setFormatter(formatter)
+    jh = RotatingFileHandler(os.path.join(log_dir, 'warehouse_pipeline.jsonl'),
+                             maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    jh.setFormatter(JsonFormatter())
+    return [ch, fh, jh]
+
+def configure(log_dir: str = None, mode: str = None, level: str = None,
+              max_bytes: int = None, backup_count: int = None,
+              sample_every: int = None, force: bool = False) -> None:
+    """
+    Sets up the shared log handlers; get_logger calls it on first use.
+
+    In 'queue' mode each logger gets one QueueHandler, which only puts the
+    record on an in-memory queue, and a QueueListener thread writes it to
+    the console and the log files. In 'sync' mode the loggers write to them
+    directly, as before. Settings default to the LOG_* environment variables.
+
+    Args:
+        log_dir (str): Directory of the log files, created if needed.
+        mode (str): 'queue' or 'sync'.
+        level (str): Level of the pipeline's loggers, e.g. 'DEBUG'.
+        max_bytes (int): Size at which a log file is rotated.
+        backup_count (int): Rotated files kept per log.
+        sample_every (int): Keep 1 of every N debug() calls per call site.
+        force (bool): Rebuild the handlers even if they exist (the loggers
+                      created so far are moved to the new ones).
+    """
+    with _lock:
+        if _state['handlers'] is not None and not force:
+            return
+        shutdown()
+        writers = _build_writers(log_dir or LOG_DIR, max_bytes or LOG_MAX_BYTES,
+                                 LOG_BACKUP_COUNT if backup_count is None else backup_count)
+        if (mode or LOG_MODE) == 'queue':
+            records = queue.SimpleQueue()
+            listener = QueueListener(records, *writers, respect_handler_level=True)
+            listener.start()
+            handlers = [QueueHandler(records)]
+        else:
+            listener = None
+            handlers = writers
+        _state.update(
+            handlers=handlers, writers=writers, listener=listener,
+            level=logging.getLevelName((level or LOG_LEVEL).upper()),
+            sample_every=max(1, sample_every or LOG_DEBUG_SAMPLE_EVERY),
+        )
+        for name in _loggers:
+            _attach(logging.getLogger(name))
+
+def shutdown() -> None:
+    """Writes out the queued records and closes the log files (also run at exit)."""
+    with _lock:
+        if _state['listener'] is not None:
+            _state['listener'].stop()
+        for handler in _state['writers']:
+            handler.close()
+        _state.update(handlers=None, writers=[], listener=None)
+
+atexit.register(shutdown)
+
+def reset() -> None:
+    """
+    Shuts the handlers down and detaches them from the pipeline's loggers,
+    leaving no writer thread or open file behind (e.g. between tests). The
+    next get_logger() or configure() call sets them up again.
+    """
+    with _lock:
+        shutdown()
+        for name in _loggers:
+            logger = logging.getLogger(name)
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+        _debug_calls.clear()
+
+def _attach(logger: logging.Logger) -> None:
+    """Replaces the logger's handlers and filters with the shared ones."""
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.setLevel(_state['level'])
+    for handler in _state['handlers']:
+        logger.addHandler(handler)
+    logger.addFilter(_state['filter'])
 
 def get_logger(name: str) -> logging.Logger:
     """
     Configures and returns a unified logger instance for the project.
 
-    This function sets up a logger that outputs to both the standard console (stdout) 
-    and a log file located in the 'logs/' directory. It prevents duplicate handlers 
-    if the logger is initialized multiple times across different modules.
+    This function sets up a logger that outputs to both the standard console (stdout)
+    and the log files in LOG_DIR, through the shared handlers of configure(). It
+    prevents duplicate handlers if the logger is initialized multiple times across
+    different modules.
 
     Args:
-        name (str): The name of the logger, typically the module name 
+        name (str): The name of the logger, typically the module name
                     (e.g., __name__ or 'Scraper').
 
     Returns:
-        logging.Logger: A configured logger instance set to the INFO level.
+        logging.Logger: A configured logger instance set to LOG_LEVEL (INFO by default).
     """
-    # Create logs directory if it doesn't exist to prevent FileNotFoundError
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-
+    configure()
     # Get a logger with the specified name
     logger = logging.getLogger(name)
-    
+
     # Check if handlers already exist to avoid duplicate logs in long-running processes
-    if not logger.handlers:
-        logger.setLevel(logging.INFO)
-        
-        # Define a consistent format: [Timestamp] - [Module Name] - [Log Level] - [Message]
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
-        # Console Handler: For real-time monitoring in the terminal
-        ch = logging.StreamHandler()
-        ch.setFormatter(formatter)
-        
-        # File Handler: For persistent record keeping
-        # We use 'a' (append) mode by default and UTF-8 encoding for safety
-        fh = logging.FileHandler('logs/warehouse_pipeline.log', encoding='utf-8')
-        fh.setFormatter(formatter)
-
-        # Add both handlers to the logger instance
-        logger.addHandler(ch)
-        logger.addHandler(fh)
-        
-    return logger
\ No newline at end of file
+    with _lock:
+        if name not in _loggers:
+            _loggers.add(name)
+            # PipelineLogger only overrides debug(), so a plain Logger can switch class
+            if type(logger) is logging.Logger:
+                logger.__class__ = PipelineLogger
+            _attach(logger)
+    return logger
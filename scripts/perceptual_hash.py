@@ -0,0 +1,209 @@
+"""
+Module: perceptual_hash.py
+Description: Perceptual hashes of the scraped photos, to recognise reposts of the same
+             picture whose bytes (and so content hashes) differ: re-encoded,
+             resized or lightly edited copies. A 64-bit difference hash (dHash) is
+             computed with OpenCV, and a multi-index hash table finds a stored hash
+             within a Hamming distance of a query by probing a few buckets instead
+             of comparing against every stored hash. The detection cache persists
+             the hashes; this module can also report, without running YOLO, how
+             much inference near-duplicate reuse would save on an image directory.
+Author: Addisu
+
+Usage:
+    python -m scripts.perceptual_hash data/raw/images --max-distance 6
+"""
+
+import os
+import argparse
+from itertools import combinations
+import cv2
+import numpy as np
+
+# Largest Hamming distance between the dHashes of two images treated as the same
+# photo (out of 64 bits); a negative value disables near-duplicate reuse
+MAX_DISTANCE = int(os.getenv('YOLO_NEAR_DUP_DISTANCE', 6))
+
+HASH_BITS = 64
+# The multi-index table splits every hash into this many disjoint bands
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+def dhash(image) -> int:
+    """
+    Computes the 64-bit difference hash of an image.
+
+    The image is shrunk to 9x8 grey pixels and each bit records whether a
+    pixel is brighter than its right neighbour, so re-encoding, resizing and
+    small edits flip only a few bits.
+
+    Args:
+        image: BGR or grayscale numpy array, as returned by cv2.imread.
+
+    Returns:
+        int: The hash, 0 <= hash < 2**64.
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def hash_file(img_path: str):
+    """
+    Reads an image and returns its dHash and size.
+
+    Returns:
+        tuple: (dhash, width, height), or None if the file is not a readable image.
+    """
+    image = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    height, width = image.shape
+    return dhash(image), width, height
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count('1')
+
+def scale_boxes(boxes: list, scale_x: float, scale_y: float) -> list:
+    """
+    Maps the boxes detected on one image onto a resized copy of it.
+
+    Args:
+        boxes (list): (label, confidence, x_min, y_min, x_max, y_max) tuples.
+        scale_x (float): Width of the copy divided by the width of the original.
+        scale_y (float): Same for the heights.
+
+    Returns:
+        list: The boxes in the copy's pixel coordinates.
+    """
+    if scale_x == 1 and scale_y == 1:
+        return list(boxes)
+    return [(label, conf, x1 * scale_x, y1 * scale_y, x2 * scale_x, y2 * scale_y)
+            for label, conf, x1, y1, x2, y2 in boxes]
+
+class MultiIndexHash:
+    """
+    An in-memory multi-index hash table of 64-bit hashes (Norouzi et al., 2012).
+
+    Every hash is cut into BANDS 16-bit bands, each indexing its own table. If
+    two hashes are within Hamming distance r, at least one of their bands
+    differs in at most r // BANDS bits (pigeonhole), so a query only probes
+    the band values that close to its own in each table, then checks the full
+    distance of the few hashes found there.
+    """
+
+    def __init__(self, max_distance: int = MAX_DISTANCE):
+        """
+        Args:
+            max_distance (int): Largest Hamming distance a match may have.
+        """
+        self.max_distance = max_distance
+        radius = max(0, max_distance) // BANDS
+        # Every band value within `radius` bits of 0; XOR-ing moves them to the query
+        self._flips = [sum(1 << bit for bit in bits)
+                       for flipped in range(radius + 1)
+                       for bits in combinations(range(BAND_BITS), flipped)]
+        self._tables = [{} for _ in range(BANDS)]
+        self._hashes = {}
+        self._added = 0
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def add(self, key, phash: int, payload=None) -> None:
+        """Stores a hash under `key`, with an optional payload returned by matches."""
+        # The insertion sequence breaks distance ties in favour of the earliest hash
+        self._hashes[key] = (phash, payload, self._added)
+        self._added += 1
+        for band, table in enumerate(self._tables):
+            table.setdefault((phash >> (band * BAND_BITS)) & BAND_MASK, []).append(key)
+
+    def nearest(self, phash: int):
+        """
+        Finds the stored hash closest to `phash`, within max_distance.
+
+        Returns:
+            tuple: (key, distance, payload) of the closest hash (the earliest
+                   stored one on ties), or None if none is close enough.
+        """
+        best, best_rank = None, None
+        seen = set()
+        for band, table in enumerate(self._tables):
+            value = (phash >> (band * BAND_BITS)) & BAND_MASK
+            for flip in self._flips:
+                for key in table.get(value ^ flip, ()):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    stored, payload, sequence = self._hashes[key]
+                    distance = hamming(phash, stored)
+                    if distance <= self.max_distance and (best is None or (distance, sequence) < best_rank):
+                        best, best_rank = (key, distance, payload), (distance, sequence)
+        return best
+
+def near_duplicate_report(items: list, max_distance: int = MAX_DISTANCE) -> dict:
+    """
+    Measures how much inference content hashing and near-duplicate reuse save
+    on a set of images, without running the model.
+
+    Images are taken in order; an image needs inference unless one before it
+    has the same bytes (already skipped by the detection cache) or a dHash
+    within `max_distance` of an image that needed inference.
+
+    Args:
+        items (list): (channel, image file name, image path) tuples.
+        max_distance (int): Hamming distance threshold.
+
+    Returns:
+        dict: 'images', 'identical' (same bytes as an earlier image),
+              'near_duplicates', 'inferred', 'cross_channel' (near-duplicates
+              of another channel's photo) and 'saved_fraction' (share of the
+              inference left after content hashing that reuse avoids).
+    """
+    from scripts.detection_cache import file_sha256
+
+    index = MultiIndexHash(max_distance)
+    seen_bytes = set()
+    report = {'images': len(items), 'identical': 0, 'near_duplicates': 0, 'inferred': 0,
+              'cross_channel': 0}
+    for channel, img_name, img_path in items:
+        content = file_sha256(img_path)
+        if content in seen_bytes:
+            report['identical'] += 1
+            continue
+        seen_bytes.add(content)
+        hashed = hash_file(img_path)
+        match = index.nearest(hashed[0]) if hashed and max_distance >= 0 else None
+        if match:
+            report['near_duplicates'] += 1
+            report['cross_channel'] += match[2] != channel
+        else:
+            report['inferred'] += 1
+            if hashed:
+                index.add(img_path, hashed[0], channel)
+    unique = report['near_duplicates'] + report['inferred']
+    report['saved_fraction'] = round(report['near_duplicates'] / unique, 4) if unique else 0.0
+    return report
+
+def main() -> None:
+    from scripts.yolo_detection import list_images
+
+    parser = argparse.ArgumentParser(description='Report the inference saved by near-duplicate reuse')
+    parser.add_argument('image_dir', nargs='?', default='data/raw/images',
+                        help="Root folder with one sub-folder per channel")
+    parser.add_argument('--max-distance', type=int, default=MAX_DISTANCE,
+                        help="Hamming distance threshold (of 64 bits)")
+    args = parser.parse_args()
+
+    report = near_duplicate_report(list_images(args.image_dir), args.max_distance)
+    print(f"{report['images']} images: {report['identical']} identical copies, "
+          f"{report['near_duplicates']} near-duplicates ({report['cross_channel']} across channels), "
+          f"{report['inferred']} need inference.")
+    print(f"Near-duplicate reuse saves {report['saved_fraction']:.1%} of the remaining inference "
+          f"at distance <= {args.max_distance}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Module: scrape_state.py
+Description: Persists the per-channel high-water mark (highest Telegram message id 
+             scraped) in a small JSON state file, so later scraper runs only fetch 
+             messages that arrived since the previous run.
+Author: Addisu
+"""
+
+import os
+import json
+from datetime import datetime
+from typing import Optional
+
+# Default location of the checkpoint file, next to the raw landing data
+DEFAULT_STATE_PATH = 'data/raw/scrape_state.json'
+
+class CheckpointStore:
+    """
+    A JSON-backed store of the highest message id seen per channel.
+
+    The whole state is small (one integer per channel), so it is kept in memory 
+    and rewritten atomically (temp file + rename) on every save; a crash while 
+    saving leaves the previous checkpoint intact rather than a truncated file.
+    """
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH):
+        """
+        Args:
+            path (str): Location of the JSON state file. It is created on first save.
+        """
+        self.path = path
+        self._state = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self._state = json.load(f)
+
+    def get(self, channel: str) -> Optional[int]:
+        """
+        Returns the highest message id recorded for a channel.
+
+        Args:
+            channel (str): The channel username.
+
+        Returns:
+            Optional[int]: The high-water mark, or None if the channel was never scraped.
+        """
+        entry = self._state.get(channel)
+        return entry['last_message_id'] if entry else None
+
+    def update(self, channel: str, last_message_id: int) -> None:
+        """
+        Advances a channel's high-water mark and persists the store.
+
+        The mark never moves backwards, so re-running an older scrape cannot 
+        cause already-ingested history to be fetched again.
+
+        Args:
+            channel (str): The channel username.
+            last_message_id (int): Highest message id that was fully persisted.
+
+        Returns:
+            None
+        """
+        current = self.get(channel)
+        if current is not None and last_message_id <= current:
+            return
+        self._state[channel] = {
+            'last_message_id': int(last_message_id),
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        self.save()
+
+    def save(self) -> None:
+        """Atomically writes the current state to disk."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, self.path)
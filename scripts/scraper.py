@@ -1,18 +1,31 @@
 """
 Module: scraper.py
 Description: Scrapes messages and media from specified Telegram channels using the 
-             Telethon library. Data is partitioned by date in JSON format, and 
-             images are stored in channel-specific directories.
+             Telethon library. Data is partitioned by date and appended as 
+             newline-delimited JSON (optionally compacted to Parquet), and 
+             images are stored in channel-specific directories. Channels are 
+             scraped concurrently with bounded parallelism and FloodWait back-off, 
+             and photos are fetched by a pool of download workers fed through a 
+             bounded queue so message iteration never waits on media. With 
+             --live the scraper runs as a service instead, streaming new and 
+             edited posts into raw.telegram_messages in micro-batches.
 Author: Addisu
 """
 
 import os
 import json
-import logging
-from datetime import datetime
-from telethon import TelegramClient
+import random
+import signal
+import asyncio
+import argparse
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from telethon import TelegramClient, errors, events
 from dotenv import load_dotenv
 from scripts.logger_config import get_logger
+from scripts.scrape_state import CheckpointStore
+from scripts.detection_queue import DetectionQueue
+from scripts.instrumentation import stage
 
 # Load environment variables (TG_API_ID and TG_API_HASH)
 load_dotenv()
@@ -33,82 +46,828 @@ CHANNELS = [
     'ellamedicals'
 ]
 
-async def scrape_channel(client: TelegramClient, channel_username: str) -> None:
+# Concurrency settings (overridable through the .env file)
+# How many channels are scraped at the same time by scrape_all()
+MAX_CONCURRENT_CHANNELS = int(os.getenv('SCRAPER_CHANNEL_CONCURRENCY', 3))
+# How many photo download workers run per channel
+MEDIA_CONCURRENCY = int(os.getenv('SCRAPER_MEDIA_CONCURRENCY', 4))
+# How many pending downloads may be queued before message iteration waits
+MEDIA_QUEUE_SIZE = int(os.getenv('SCRAPER_MEDIA_QUEUE_SIZE', 64))
+# How many times a call is retried after a FloodWait before giving up
+FLOOD_WAIT_RETRIES = int(os.getenv('SCRAPER_FLOOD_WAIT_RETRIES', 5))
+# Messages fetched for a channel that has no checkpoint yet (0 = full history)
+INITIAL_SCRAPE_LIMIT = int(os.getenv('SCRAPER_INITIAL_LIMIT', 100))
+# During oldest-first backfills, checkpoint after this many messages
+CHECKPOINT_EVERY = int(os.getenv('SCRAPER_CHECKPOINT_EVERY', 500))
+# Compact closed date partitions from NDJSON to Parquet after each run (needs pyarrow)
+COMPACT_TO_PARQUET = os.getenv('LANDING_COMPACT_PARQUET', '0') == '1'
+COMPACT_BATCH_SIZE = 10_000
+
+# Root of the landing zone. A `<day>/` folder holds what the batch and live
+# scrapers collected on that day, whenever the messages were posted; a
+# `posted=<day>/` folder holds the messages posted on that day, as scraped for
+# one daily Dagster partition
+LANDING_DIR = 'data/raw/telegram_messages'
+POSTED_DAY_PREFIX = 'posted='
+
+# Live mode: a batch is written once it holds LIVE_BATCH_SIZE messages or its
+# first message has waited LIVE_FLUSH_SECONDS, whichever comes first
+LIVE_BATCH_SIZE = int(os.getenv('SCRAPER_LIVE_BATCH_SIZE', 200))
+LIVE_FLUSH_SECONDS = float(os.getenv('SCRAPER_LIVE_FLUSH_SECONDS', 2.0))
+# Messages buffered in memory before the event handlers wait for the writer
+LIVE_BUFFER_SIZE = int(os.getenv('SCRAPER_LIVE_BUFFER_SIZE', 5000))
+
+async def call_with_flood_wait(func, *args, retries: int = FLOOD_WAIT_RETRIES, **kwargs):
+    """
+    Awaits a Telethon coroutine function, backing off whenever Telegram answers 
+    with a FloodWait error.
+
+    The wait is the larger of the server-requested delay and an exponential 
+    back-off (1s, 2s, 4s, ...), plus a small jitter so concurrent channel tasks 
+    do not all retry at the same instant.
+
+    Args:
+        func: The coroutine function to call (e.g. client.download_media).
+        *args: Positional arguments forwarded to func.
+        retries (int): Maximum number of retries before the error is re-raised.
+        **kwargs: Keyword arguments forwarded to func.
+
+    Returns:
+        The result of the awaited call.
+
+    Raises:
+        errors.FloodWaitError: If the call is still rate-limited after all retries.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await func(*args, **kwargs)
+        except errors.FloodWaitError as e:
+            if attempt >= retries:
+                raise
+            delay = max(e.seconds, 2 ** attempt) + random.uniform(0, 1)
+            attempt += 1
+            logger.warning(f"FloodWait of {e.seconds}s received, retry {attempt}/{retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+async def download_photo(client: TelegramClient, photo, save_path: str) -> Optional[int]:
+    """
+    Downloads a single photo to a temporary '.part' file and renames it into 
+    place once complete, so a crashed or failed download never leaves a 
+    truncated image under its final name.
+
+    Args:
+        client (TelegramClient): An authenticated Telethon client instance.
+        photo: The Telethon photo object attached to the message.
+        save_path (str): Final destination path of the image on disk.
+
+    Returns:
+        Optional[int]: Size of the saved file in bytes, or None if the download failed.
+    """
+    tmp_path = f"{save_path}.part"
+    try:
+        await call_with_flood_wait(client.download_media, photo, file=tmp_path)
+        os.replace(tmp_path, save_path)
+        size = os.path.getsize(save_path)
+        logger.debug("Downloaded %s (%d bytes)", save_path, size)
+        return size
+    except Exception as e:
+        logger.error(f"Failed to download {save_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+class LandingWriter:
+    """
+    Appends message records to a landing partition as newline-delimited JSON.
+
+    Each record is one self-contained line, so a scrape that crashes part-way 
+    leaves every line written so far readable (at worst the final line is 
+    truncated, which the ingest reader skips).
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): The partition file, e.g. data/raw/telegram_messages/<date>/<channel>.ndjson.
+        """
+        self.path = path
+        self.count = 0
+        # Terminate a line left unfinished by a previous crash before appending
+        needs_newline = False
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+        self._file = open(path, 'a', encoding='utf-8')
+        if needs_newline:
+            self._file.write('\n')
+
+    def write(self, record: dict) -> None:
+        """Appends a single record as one JSON line."""
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count += 1
+
+    def flush(self) -> None:
+        """Pushes buffered lines to the operating system."""
+        self._file.flush()
+
+    def close(self) -> None:
+        """Flushes and closes the partition file."""
+        self._file.close()
+
+async def media_worker(client: TelegramClient, queue: asyncio.Queue, on_done) -> None:
+    """
+    Consumer side of the media pipeline: drains (record, photo, path) jobs from 
+    the queue until it receives a None sentinel.
+
+    Args:
+        client (TelegramClient): An authenticated Telethon client instance.
+        queue (asyncio.Queue): Download jobs produced by scrape_channel.
+        on_done: Callback invoked as on_done(record, size) after each job, where 
+                 size is the saved file size in bytes or None on failure.
+
+    Returns:
+        None
     """
-    Scrapes the most recent messages and associated media from a Telegram channel.
+    while True:
+        job = await queue.get()
+        try:
+            if job is None:
+                return
+            data, photo, save_path = job
+            size = await download_photo(client, photo, save_path)
+            on_done(data, size)
+        finally:
+            queue.task_done()
+
+def message_record(channel_username: str, message) -> dict:
+    """Builds the landing record of a Telethon message; image_path is set by the caller."""
+    return {
+        'channel': channel_username,
+        'id': message.id,
+        'date': str(message.date),
+        'text': message.text,
+        'views': message.views,
+        'forwards': message.forwards,
+        'image_path': None  # Default if no photo exists
+    }
+
+def _message_iterator(client: TelegramClient, channel_username: str, last_seen_id,
+                      day: date = None):
+    """
+    Picks the Telethon history query for a channel based on its checkpoint.
+
+    - One day (`day`): the messages posted before the end of that day (UTC), 
+      newest first; the caller stops at the start of the day.
+    - Checkpointed channel: every message newer than the high-water mark, 
+      oldest first and without a limit.
+    - New channel: the latest INITIAL_SCRAPE_LIMIT messages, or the full 
+      history (oldest first) when the limit is 0.
+
+    Returns:
+        tuple: (async message iterator, True if messages arrive oldest first)
+    """
+    if day is not None:
+        day_end = datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+        return client.iter_messages(channel_username, offset_date=day_end), False
+    if last_seen_id is not None:
+        return client.iter_messages(channel_username, min_id=last_seen_id, reverse=True), True
+    if INITIAL_SCRAPE_LIMIT > 0:
+        return client.iter_messages(channel_username, limit=INITIAL_SCRAPE_LIMIT), False
+    return client.iter_messages(channel_username, reverse=True), True
+
+def posted_partition_path(channel_username: str, day: date, base_path: str = LANDING_DIR,
+                          extension: str = '.ndjson') -> str:
+    """
+    Returns the landing file of a channel's messages posted on `day`, e.g.
+    data/raw/telegram_messages/posted=2026-01-17/CheMed123.ndjson.
+    """
+    return os.path.join(base_path, f"{POSTED_DAY_PREFIX}{day.isoformat()}", f"{channel_username}{extension}")
+
+async def scrape_channel(client: TelegramClient, channel_username: str,
+                         media_concurrency: int = MEDIA_CONCURRENCY,
+                         checkpoints: CheckpointStore = None, day: date = None) -> dict:
+    """
+    Scrapes new messages and associated media from a Telegram channel.
 
     The function performs the following steps:
-    1. Creates local directories for image storage and JSON metadata.
-    2. Iterates through the last 100 messages in the channel.
-    3. Downloads photos if present.
-    4. Saves all metadata into a partitioned JSON file.
+    1. Creates local directories for image storage and NDJSON metadata.
+    2. Iterates through the messages newer than the channel's checkpoint 
+       (or the latest INITIAL_SCRAPE_LIMIT messages on a first run).
+    3. Appends each message to the day's partition as soon as it is complete: 
+       immediately for text, or once a download worker has saved its photo. 
+       Photos already on disk are not downloaded again.
+    4. Advances the channel's checkpoint to the highest message id that (with 
+       everything before it) is on disk; during oldest-first backfills this 
+       happens every CHECKPOINT_EVERY messages so a crash loses little work.
+
+    With `day`, the channel's messages posted that day (UTC) are scraped 
+    instead, whatever the checkpoint, into a fresh posted-day partition file 
+    (see posted_partition_path) that replaces the previous one once complete 
+    (the unit of the daily Dagster partitions). The `<day>/` files of the 
+    batch and live scrapers are left alone.
 
     Args:
         client (TelegramClient): An authenticated Telethon client instance.
         channel_username (str): The username/handle of the Telegram channel.
+        media_concurrency (int): Number of photo download workers for this channel.
+        checkpoints (CheckpointStore): Per-channel high-water marks. When None, 
+                                       the channel is scraped without a checkpoint.
+        day (date): Scrape this day's messages only; checkpoints are not used.
 
     Returns:
-        None
+        dict: Throughput statistics (messages, photos, bytes, seconds, 
+              messages_per_sec, mb_per_sec).
     """
     # 1. Directory Setup
     # Path for images: data/raw/images/<channel_name>/
     image_path = f'data/raw/images/{channel_username}'
     os.makedirs(image_path, exist_ok=True)
     
-    # Path for JSON: data/raw/telegram_messages/YYYY-MM-DD/
-    date_str = datetime.now().strftime('%Y-%m-%d')
-    json_path = f'data/raw/telegram_messages/{date_str}'
-    os.makedirs(json_path, exist_ok=True)
-
-    messages_data = []
-    logger.info(f"Starting scrape for {channel_username}...")
-
-    # 2. In-depth Scraping
-    async for message in client.iter_messages(channel_username, limit=100):
-        # Store metadata in a dictionary
-        data = {
-            'channel': channel_username,
-            'id': message.id,
-            'date': str(message.date),
-            'text': message.text,
-            'views': message.views,
-            'forwards': message.forwards,
-            'image_path': None  # Default if no photo exists
-        }
-        
-        # Download Image if the message contains media
+    # Path for NDJSON: data/raw/telegram_messages/YYYY-MM-DD/ (posted=YYYY-MM-DD/ for a day)
+    if day is not None:
+        partition_file = posted_partition_path(channel_username, day)
+    else:
+        partition_file = f"{LANDING_DIR}/{datetime.now().strftime('%Y-%m-%d')}/{channel_username}.ndjson"
+    os.makedirs(os.path.dirname(partition_file), exist_ok=True)
+    if day is not None:
+        # A day is rewritten as a whole and swapped in at the end
+        checkpoints = None
+        if os.path.exists(f"{partition_file}.part"):
+            os.remove(f"{partition_file}.part")
+    writer = LandingWriter(f"{partition_file}.part" if day else partition_file)
+    stats = {'messages': 0, 'photos': 0, 'bytes': 0}
+    pending_ids = set()  # queued for download, not yet written
+    failed_ids = []
+    max_seen_id = None
+
+    def finish(data: dict, size: Optional[int]) -> None:
+        # Called by the workers: a failed photo is dropped from the record
+        pending_ids.discard(data['id'])
+        if size is None:
+            data['image_path'] = None
+            failed_ids.append(data['id'])
+            metrics.count('photos_failed')
+        else:
+            stats['photos'] += 1
+            stats['bytes'] += size
+            metrics.count('photos')
+            metrics.count('bytes_downloaded', size)
+        writer.write(data)
+
+    def save_checkpoint() -> None:
+        # Stop short of pending or failed photos so the next run fetches them again
+        if checkpoints is None or max_seen_id is None:
+            return
+        writer.flush()
+        blocked = pending_ids.union(failed_ids)
+        high_water_mark = min(max_seen_id, min(blocked) - 1) if blocked else max_seen_id
+        if high_water_mark > 0:
+            checkpoints.update(channel_username, high_water_mark)
+
+    # Media pipeline: this coroutine produces download jobs, the workers consume them
+    media_queue = asyncio.Queue(maxsize=MEDIA_QUEUE_SIZE)
+    workers = [
+        asyncio.create_task(media_worker(client, media_queue, finish))
+        for _ in range(max(1, media_concurrency))
+    ]
+    last_seen_id = checkpoints.get(channel_username) if checkpoints else None
+    messages, oldest_first = _message_iterator(client, channel_username, last_seen_id, day)
+    logger.info(f"Starting scrape for {channel_username} "
+                f"({f'day {day}' if day else f'after message id {last_seen_id}'})...")
+
+    # 2. In-depth Scraping (one instrumented stage per channel and run)
+    with stage('scrape_channel', channel=channel_username, day=day) as metrics:
+        try:
+            async for message in messages:
+                if day is not None and message.date.astimezone(timezone.utc).date() < day:
+                    break
+                # Store metadata in a dictionary
+                data = message_record(channel_username, message)
+                stats['messages'] += 1
+                metrics.count('messages')
+                # Per-item debug logs are sampled (LOG_DEBUG_SAMPLE_EVERY) and formatted lazily
+                logger.debug("Scraped message %s (photo: %s)", message.id, message.photo is not None)
+                max_seen_id = message.id if max_seen_id is None else max(max_seen_id, message.id)
+            
+                # 3. Persistence: hand photos to the download workers, write the rest now
+                # Photos never change once posted, so an existing file is reused as-is
+                queued = False
+                if message.photo:
+                    filename = f"{channel_username}_{message.id}.jpg"
+                    save_path = os.path.join(image_path, filename)
+                    data['image_path'] = filename
+                    if not (os.path.exists(save_path) and os.path.getsize(save_path) > 0):
+                        pending_ids.add(message.id)
+                        await media_queue.put((data, message.photo, save_path))
+                        queued = True
+                if not queued:
+                    writer.write(data)
+
+                # 4. Periodic checkpoint while walking history oldest first
+                if oldest_first and stats['messages'] % CHECKPOINT_EVERY == 0:
+                    save_checkpoint()
+
+            # One sentinel per worker, then wait for the queue to drain
+            for _ in workers:
+                await media_queue.put(None)
+            await asyncio.gather(*workers)
+            save_checkpoint()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            writer.close()
+    if day is not None:
+        os.replace(f"{partition_file}.part", partition_file)
+
+    # 5. Throughput Report
+    elapsed = max(metrics.seconds, 1e-9)
+    stats['seconds'] = round(elapsed, 3)
+    stats['messages_per_sec'] = round(stats['messages'] / elapsed, 2)
+    stats['mb_per_sec'] = round(stats['bytes'] / 1_048_576 / elapsed, 3)
+    logger.info(
+        f"Successfully scraped {stats['messages']} new messages from {channel_username} "
+        f"in {stats['seconds']}s ({stats['messages_per_sec']} msg/s, {stats['photos']} photos, "
+        f"{stats['bytes'] / 1_048_576:.2f} MB, {stats['mb_per_sec']} MB/s)"
+    )
+    return stats
+
+def compact_partition(date_path: str) -> list:
+    """
+    Compacts the NDJSON files of a closed date partition into one Parquet file 
+    per channel (requires the optional 'pyarrow' package).
+
+    Records are streamed into the Parquet writer in batches, so memory stays 
+    flat regardless of file size. An existing Parquet file for the channel is 
+    merged in, and the NDJSON source is removed only after the new file has 
+    been written and renamed into place.
+
+    Args:
+        date_path (str): A partition folder, e.g. data/raw/telegram_messages/2026-01-17.
+
+    Returns:
+        list: Paths of the Parquet files written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('channel', pa.string()),
+        ('id', pa.int64()),
+        ('date', pa.string()),
+        ('text', pa.string()),
+        ('views', pa.int64()),
+        ('forwards', pa.int64()),
+        ('image_path', pa.string()),
+    ])
+    written = []
+    for file_name in sorted(os.listdir(date_path)):
+        if not file_name.endswith('.ndjson'):
+            continue
+        channel = file_name[:-len('.ndjson')]
+        ndjson_file = os.path.join(date_path, file_name)
+        parquet_file = os.path.join(date_path, f"{channel}.parquet")
+        tmp_file = f"{parquet_file}.part"
+
+        with pq.ParquetWriter(tmp_file, schema) as pq_writer:
+            if os.path.exists(parquet_file):
+                for batch in pq.ParquetFile(parquet_file).iter_batches(batch_size=COMPACT_BATCH_SIZE):
+                    pq_writer.write_batch(batch)
+            batch = []
+            with open(ndjson_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # truncated line from an interrupted scrape
+                    batch.append({name: record.get(name) for name in schema.names})
+                    if len(batch) >= COMPACT_BATCH_SIZE:
+                        pq_writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+                        batch = []
+            if batch:
+                pq_writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+
+        os.replace(tmp_file, parquet_file)
+        os.remove(ndjson_file)
+        written.append(parquet_file)
+        logger.info(f"Compacted {ndjson_file} into {parquet_file}")
+    return written
+
+def compact_closed_partitions(base_path: str = LANDING_DIR) -> None:
+    """
+    Compacts every date partition (scraped or posted) older than today to 
+    Parquet. Today's partitions are left as NDJSON because later runs may 
+    still append to them.
+    """
+    if not os.path.exists(base_path):
+        return
+    today = datetime.now().strftime('%Y-%m-%d')
+    for date_folder in sorted(os.listdir(base_path)):
+        date_path = os.path.join(base_path, date_folder)
+        if os.path.isdir(date_path) and date_folder.removeprefix(POSTED_DAY_PREFIX) < today:
+            compact_partition(date_path)
+
+async def scrape_all(client: TelegramClient, channels: list,
+                     max_concurrent_channels: int = MAX_CONCURRENT_CHANNELS,
+                     media_concurrency: int = MEDIA_CONCURRENCY,
+                     checkpoints: CheckpointStore = None) -> None:
+    """
+    Scrapes several channels concurrently over a single Telethon client.
+
+    At most `max_concurrent_channels` channels are in flight at once; setting it 
+    to 1 reproduces the original one-channel-at-a-time behaviour. A channel that 
+    hits a FloodWait during iteration is retried with back-off, and a channel 
+    that fails outright is logged without cancelling the others.
+
+    Args:
+        client (TelegramClient): An authenticated Telethon client instance.
+        channels (list): Channel usernames to scrape.
+        max_concurrent_channels (int): Upper bound on channels scraped in parallel.
+        media_concurrency (int): Maximum concurrent photo downloads per channel.
+        checkpoints (CheckpointStore): Shared high-water mark store. Defaults to 
+                                       the state file under data/raw/.
+
+    Returns:
+        None
+    """
+    if checkpoints is None:
+        checkpoints = CheckpointStore()
+    channel_semaphore = asyncio.Semaphore(max(1, max_concurrent_channels))
+
+    async def _scrape_bounded(channel: str) -> None:
+        async with channel_semaphore:
+            try:
+                await call_with_flood_wait(scrape_channel, client, channel,
+                                           media_concurrency=media_concurrency,
+                                           checkpoints=checkpoints)
+            except Exception as e:
+                logger.error(f"Error scraping {channel}: {e}")
+
+    await asyncio.gather(*(_scrape_bounded(channel) for channel in channels))
+
+class LiveIngestor:
+    """
+    Micro-batches live messages into the landing zone and the warehouse.
+
+    Records wait in a bounded queue: when it is full the event handlers wait
+    for the writer instead of growing memory, so at most `buffer_size` +
+    `batch_size` records are held. A flusher task takes up to
+    `batch_size` records, or whatever arrived within `flush_seconds` of the
+    first one, and for each batch:
+    1. appends the records to the day's NDJSON partitions, the durable copy
+       (a batch the database rejects is loaded later by ingest_to_db.py);
+    2. hands them to `sink`, e.g. ingest_to_db.MessageUpserter;
+    3. spools newly downloaded photos to the detection queue;
+    4. advances the channels' checkpoints to the highest message id that,
+       with everything before it, has been written, so a batch scrape after
+       a restart does not fetch the same messages again.
+    """
+
+    def __init__(self, sink, batch_size: int = LIVE_BATCH_SIZE,
+                 flush_seconds: float = LIVE_FLUSH_SECONDS, buffer_size: int = LIVE_BUFFER_SIZE,
+                 checkpoints: CheckpointStore = None, detection_queue: DetectionQueue = None,
+                 base_path: str = LANDING_DIR):
+        """
+        Args:
+            sink: Callable taking a list of records (one per message); it runs
+                  in a worker thread.
+            batch_size (int): Records per batch at most.
+            flush_seconds (float): Longest time a record waits for its batch to fill.
+            buffer_size (int): Records queued before put() waits.
+            checkpoints (CheckpointStore): High-water marks to advance, or None.
+            detection_queue (DetectionQueue): Spool for new photos, or None.
+            base_path (str): Root of the date-partitioned landing zone.
+        """
+        self.sink = sink
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.checkpoints = checkpoints
+        self.detection_queue = detection_queue
+        self.base_path = base_path
+        self.queue = asyncio.Queue(maxsize=max(1, buffer_size))
+        self.task = None
+        # Channels whose history is still being replayed keep their checkpoint
+        self.catching_up = set()
+        self.stats = {'messages': 0, 'batches': 0, 'photos': 0, 'failed_batches': 0}
+        self._queued = {}        # (channel, id) -> records not yet written
+        self._written = {}       # channel -> highest id written
+        self._failed_photo = {}  # channel -> lowest id whose photo failed
+        self._writers = {}
+        self._date = None
+
+    def start(self) -> None:
+        """Starts the flusher task."""
+        self.task = asyncio.create_task(self._run())
+
+    async def put(self, record: dict, new_photo: bool = False, failed_photo: bool = False) -> None:
+        """
+        Queues a record, waiting while the buffer is full.
+
+        Args:
+            record (dict): The landing record.
+            new_photo (bool): Its photo was just downloaded and needs detection.
+            failed_photo (bool): Its photo could not be downloaded.
+        """
+        key = (record['channel'], record['id'])
+        self._queued[key] = self._queued.get(key, 0) + 1
+        if failed_photo:
+            self._failed_photo[key[0]] = min(self._failed_photo.get(key[0], key[1]), key[1])
+        await self.queue.put((record, new_photo))
+
+    async def close(self) -> None:
+        """Writes everything still queued, stops the flusher and closes the landing files."""
+        if not self.task.done():
+            await self.queue.put(None)
+        await self.task  # surfaces flusher errors
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            closing = False
+            while not closing:
+                item = await self.queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                deadline = loop.time() + self.flush_seconds
+                while len(batch) < self.batch_size:
+                    if self.queue.empty():
+                        try:
+                            item = await asyncio.wait_for(self.queue.get(), deadline - loop.time())
+                        except asyncio.TimeoutError:
+                            break
+                    else:
+                        item = self.queue.get_nowait()
+                    if item is None:
+                        closing = True
+                        break
+                    batch.append(item)
+                await self._flush(batch)
+        finally:
+            for writer in self._writers.values():
+                writer.close()
+            self._writers.clear()
+
+    def _writer(self, channel: str) -> LandingWriter:
+        date_str = datetime.now().strftime('%Y-%m-%d')
+        if date_str != self._date:
+            # A new day starts new partitions
+            for writer in self._writers.values():
+                writer.close()
+            self._writers.clear()
+            self._date = date_str
+        if channel not in self._writers:
+            json_path = os.path.join(self.base_path, date_str)
+            os.makedirs(json_path, exist_ok=True)
+            self._writers[channel] = LandingWriter(os.path.join(json_path, f"{channel}.ndjson"))
+        return self._writers[channel]
+
+    async def _flush(self, batch: list) -> None:
+        # The last version of each message wins (e.g. an edit right after the post)
+        latest = {(record['channel'], record['id']): record for record, _ in batch}
+        records = list(latest.values())
+
+        # 1. Landing files first
+        for record in records:
+            self._writer(record['channel']).write(record)
+        for writer in self._writers.values():
+            writer.flush()
+
+        # 2. Warehouse
+        try:
+            await asyncio.to_thread(self.sink, records)
+        except Exception as e:
+            self.stats['failed_batches'] += 1
+            logger.error(f"Live batch of {len(records)} messages not written to the database ({e}); "
+                         f"it stays in the landing files for ingest_to_db.py")
+
+        # 3. Detection queue
+        photos = [(record['channel'], record['image_path']) for record, new_photo in batch if new_photo]
+        if self.detection_queue is not None:
+            self.detection_queue.put(photos)
+
+        # 4. Checkpoints
+        for record, _ in batch:
+            key = (record['channel'], record['id'])
+            self._queued[key] -= 1
+            if not self._queued[key]:
+                del self._queued[key]
+            self._written[key[0]] = max(self._written.get(key[0], key[1]), key[1])
+        if self.checkpoints is not None:
+            for channel in {record['channel'] for record in records}:
+                self.save_checkpoint(channel)
+
+        self.stats['messages'] += len(records)
+        self.stats['batches'] += 1
+        self.stats['photos'] += len(photos)
+
+    def save_checkpoint(self, channel: str) -> None:
+        """Advances a channel's checkpoint, stopping short of queued messages and failed photos."""
+        if channel in self.catching_up or channel not in self._written:
+            return
+        blocked = [message_id for queued_channel, message_id in self._queued if queued_channel == channel]
+        if channel in self._failed_photo:
+            blocked.append(self._failed_photo[channel])
+        high_water_mark = self._written[channel]
+        if blocked:
+            high_water_mark = min(high_water_mark, min(blocked) - 1)
+        if high_water_mark > 0:
+            self.checkpoints.update(channel, high_water_mark)
+
+async def run_live(client: TelegramClient, channels: list, sink,
+                   checkpoints: CheckpointStore = None, detection_queue: DetectionQueue = None,
+                   stop: asyncio.Event = None, catch_up: bool = True,
+                   media_concurrency: int = MEDIA_CONCURRENCY, **ingestor_options) -> dict:
+    """
+    Service mode: streams new and edited channel posts into the warehouse as
+    they arrive, through a LiveIngestor.
+
+    The function performs the following steps:
+    1. Registers NewMessage and MessageEdited handlers for the channels. Each
+       handler downloads the post's photo (at most `media_concurrency` at a
+       time) before queueing the record, so records are complete when written.
+    2. Replays each channel's messages after its checkpoint through the same
+       handlers (unless `catch_up` is False), so a restart leaves no gap; the
+       replay and live events may overlap, which the upsert absorbs.
+    3. Runs until `stop` is set or the ingestor fails.
+    4. Drains gracefully: unregisters the handlers, lets in-flight handlers
+       finish, writes everything buffered and closes the landing files.
+
+    Args:
+        client (TelegramClient): An authenticated Telethon client instance.
+        channels (list): Channel usernames to follow.
+        sink: Batch writer passed to LiveIngestor (e.g. ingest_to_db.MessageUpserter()).
+        checkpoints (CheckpointStore): High-water marks; defaults to the state file.
+        detection_queue (DetectionQueue): Spool for new photos, or None.
+        stop (asyncio.Event): Set to shut down (main() sets it on SIGINT/SIGTERM).
+        catch_up (bool): Replay the history after the checkpoints first.
+        media_concurrency (int): Maximum concurrent photo downloads.
+        **ingestor_options: batch_size, flush_seconds, buffer_size or base_path.
+
+    Returns:
+        dict: The ingestor's statistics (messages, batches, photos, failed_batches).
+    """
+    if checkpoints is None:
+        checkpoints = CheckpointStore()
+    stop = stop or asyncio.Event()
+    ingestor = LiveIngestor(sink, checkpoints=checkpoints, detection_queue=detection_queue,
+                            **ingestor_options)
+    names = {channel.lower(): channel for channel in channels}
+    downloads = asyncio.Semaphore(max(1, media_concurrency))
+    in_flight = set()
+    for channel in channels:
+        os.makedirs(f'data/raw/images/{channel}', exist_ok=True)
+
+    async def ingest(channel: str, message) -> None:
+        data = message_record(channel, message)
+        new_photo = failed_photo = False
         if message.photo:
-            filename = f"{channel_username}_{message.id}.jpg"
-            save_path = os.path.join(image_path, filename)
-            await client.download_media(message.photo, file=save_path)
+            filename = f"{channel}_{message.id}.jpg"
+            save_path = os.path.join(f'data/raw/images/{channel}', filename)
             data['image_path'] = filename
-        
-        messages_data.append(data)
+            # Edits of a post arrive with the photo already on disk
+            if not (os.path.exists(save_path) and os.path.getsize(save_path) > 0):
+                async with downloads:
+                    size = await download_photo(client, message.photo, save_path)
+                new_photo, failed_photo = size is not None, size is None
+                if failed_photo:
+                    data['image_path'] = None
+        await ingestor.put(data, new_photo=new_photo, failed_photo=failed_photo)
 
-    # 3. Data Persistence
-    output_file = f"{json_path}/{channel_username}.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(messages_data, f, ensure_ascii=False, indent=4)
-    
-    logger.info(f"Successfully scraped {len(messages_data)} messages from {channel_username}")
+    async def handle(event) -> None:
+        try:
+            chat = await event.get_chat()
+            channel = names.get((getattr(chat, 'username', None) or '').lower())
+            if channel is not None:
+                await ingest(channel, event.message)
+        except Exception as e:
+            logger.error(f"Failed to ingest live message: {e}")
 
-async def main():
+    async def on_event(event) -> None:
+        # Tracked in its own task so the drain can wait for it
+        task = asyncio.create_task(handle(event))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        await task
+
+    async def replay(channel: str) -> None:
+        ingestor.catching_up.add(channel)
+        try:
+            messages, _ = _message_iterator(client, channel, checkpoints.get(channel))
+            async for message in messages:
+                await ingest(channel, message)
+        except Exception as e:
+            # The checkpoint stays put; the next batch scrape fills the gap
+            logger.error(f"Catch-up of {channel} failed: {e}")
+        else:
+            ingestor.catching_up.discard(channel)
+            ingestor.save_checkpoint(channel)
+
+    for event_type in (events.NewMessage, events.MessageEdited):
+        client.add_event_handler(on_event, event_type(chats=list(channels)))
+    ingestor.start()
+    background = [asyncio.create_task(stop.wait())]
+    if catch_up:
+        background.append(asyncio.gather(*(replay(channel) for channel in channels)))
+    logger.info(f"Live mode: following {len(channels)} channels "
+                f"(batches of {ingestor.batch_size} / {ingestor.flush_seconds}s)...")
+    try:
+        await asyncio.wait([background[0], ingestor.task], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # Graceful drain: no new events, let running handlers finish, flush the buffer
+        client.remove_event_handler(on_event)
+        for task in background:
+            task.cancel()
+        if ingestor.task.done():
+            # The writer is gone; handlers waiting on a full buffer would never return
+            for task in in_flight:
+                task.cancel()
+        await asyncio.gather(*background, *in_flight, return_exceptions=True)
+        await ingestor.close()
+        logger.info(f"Live mode stopped: {ingestor.stats['messages']} messages in "
+                    f"{ingestor.stats['batches']} batches, {ingestor.stats['photos']} photos queued "
+                    f"for detection, {ingestor.stats['failed_batches']} batches left to ingest_to_db.py")
+    return ingestor.stats
+
+async def scrape_partitions(client: TelegramClient, partitions: list,
+                            max_concurrent_channels: int = MAX_CONCURRENT_CHANNELS,
+                            media_concurrency: int = MEDIA_CONCURRENCY) -> dict:
     """
-    Asynchronous main entry point. 
-    Initializes the TelegramClient session and iterates through the channel list.
+    Scrapes (channel, day) partitions, e.g. those of a Dagster run or backfill.
+
+    Channels are scraped concurrently over the one client (at most 
+    `max_concurrent_channels` at a time), the days of a channel one after 
+    another. Unlike scrape_all, a failed partition raises once the others 
+    have finished, so the orchestrator can retry just that run.
+
+    Args:
+        client (TelegramClient): An authenticated Telethon client instance.
+        partitions (list): (channel username, date) tuples.
+        max_concurrent_channels (int): Upper bound on channels scraped in parallel.
+        media_concurrency (int): Maximum concurrent photo downloads per channel.
+
+    Returns:
+        dict: Statistics of scrape_channel per (channel, day).
+
+    Raises:
+        RuntimeError: If any partition failed.
+    """
+    days_by_channel = {}
+    for channel, day in sorted(set(partitions)):
+        days_by_channel.setdefault(channel, []).append(day)
+    channel_semaphore = asyncio.Semaphore(max(1, max_concurrent_channels))
+    results, failures = {}, {}
+
+    async def _scrape_days(channel: str, days: list) -> None:
+        async with channel_semaphore:
+            for day in days:
+                try:
+                    results[(channel, day)] = await call_with_flood_wait(
+                        scrape_channel, client, channel, media_concurrency=media_concurrency, day=day)
+                except Exception as e:
+                    logger.error(f"Error scraping {channel} for {day}: {e}")
+                    failures[(channel, day)] = e
+
+    await asyncio.gather(*(_scrape_days(channel, days) for channel, days in days_by_channel.items()))
+    if failures:
+        raise RuntimeError(f"{len(failures)} of {len(partitions)} partitions failed: "
+                           + ", ".join(f"{channel}|{day}" for channel, day in sorted(failures)))
+    return results
+
+async def main(live: bool = False):
+    """
+    Asynchronous main entry point.
+    Initializes the TelegramClient session and scrapes the channel list concurrently,
+    or, with `live`, follows the channels until SIGINT/SIGTERM.
     """
     # 'menorah_session' stores authentication locally to avoid logging in every time
     async with TelegramClient('menorah_session', api_id, api_hash) as client:
-        for channel in CHANNELS:
+        if live:
+            from scripts.ingest_to_db import MessageUpserter
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, stop.set)
+            client.disconnected.add_done_callback(lambda _: stop.set())
+            sink = MessageUpserter()
             try:
-                await scrape_channel(client, channel)
-            except Exception as e:
-                logger.error(f"Error scraping {channel}: {e}")
+                await run_live(client, CHANNELS, sink, detection_queue=DetectionQueue(), stop=stop)
+            finally:
+                sink.close()
+        else:
+            await scrape_all(client, CHANNELS)
+
+    if COMPACT_TO_PARQUET:
+        compact_closed_partitions()
 
 if __name__ == "__main__":
-    import asyncio
-    
+    parser = argparse.ArgumentParser(description='Scrape the medical Telegram channels')
+    parser.add_argument('--live', action='store_true',
+                        help="Run as a service, streaming new and edited posts into the warehouse")
+    args = parser.parse_args()
+
     # Run the asynchronous event loop
     logger.info("Starting Telegram Scraper service...")
-    asyncio.run(main())
+    asyncio.run(main(live=args.live))
     logger.info("Telegram Scraper service finished.")
\ No newline at end of file
@@ -0,0 +1,31 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# Modules set up logging and metrics when they are imported (during collection),
+# so the defaults point away from the repository's logs/ before anything is imported
+_OUTPUT_DIR = tempfile.mkdtemp(prefix='pipeline_tests_')
+os.environ['PIPELINE_METRICS_PATH'] = os.path.join(_OUTPUT_DIR, 'pipeline_metrics.jsonl')
+os.environ['LOG_DIR'] = os.path.join(_OUTPUT_DIR, 'logs')
+
+from scripts import instrumentation, logger_config  # noqa: E402
+
+
+def pytest_unconfigure(config):
+    logger_config.reset()
+    shutil.rmtree(_OUTPUT_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def pipeline_outputs(tmp_path, monkeypatch):
+    """
+    Sends the logs and stage metrics of each test to its own tmp_path, and
+    stops the log writer thread and closes the files afterwards.
+    """
+    monkeypatch.setattr(instrumentation, 'METRICS_PATH', str(tmp_path / 'pipeline_metrics.jsonl'))
+    monkeypatch.setattr(logger_config, 'LOG_DIR', str(tmp_path / 'logs'))
+    logger_config.configure(force=True)
+    yield tmp_path
+    logger_config.reset()
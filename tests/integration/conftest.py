@@ -0,0 +1,34 @@
+import os
+from urllib.parse import urlparse
+
+import psycopg2
+import pytest
+
+
+@pytest.fixture(scope="module")
+def scratch_database(request):
+    """
+    psycopg2 parameters of a fresh database on the server of DATABASE_URL,
+    dropped after the test module. Skips when no server is reachable.
+    """
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        pytest.skip("DATABASE_URL is not set")
+    server = urlparse(url)
+    params = {"host": server.hostname or "localhost", "port": server.port or 5432,
+              "user": server.username, "password": server.password or ""}
+    try:
+        admin = psycopg2.connect(database="postgres", **params)
+    except psycopg2.OperationalError:
+        pytest.skip("PostgreSQL server is not reachable")
+    admin.autocommit = True
+    dbname = f"{request.module.__name__.rsplit('.', 1)[-1]}_{os.getpid()}"
+    with admin.cursor() as cur:
+        cur.execute(f"DROP DATABASE IF EXISTS {dbname}")
+        cur.execute(f"CREATE DATABASE {dbname}")
+    try:
+        yield {**params, "database": dbname}
+    finally:
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {dbname} WITH (FORCE)")
+        admin.close()
@@ -0,0 +1,123 @@
+"""
+EXPLAIN checks of the API's queries against a built warehouse (DATABASE_URL).
+
+Sequential scans (and sorts, where an index order is expected) are disabled
+while planning, so a test only fails when no index or partition pruning can
+serve the query at all; on small development data the planner would
+otherwise pick seq scans and sorts on cost alone.
+Skipped when no database with the marts is reachable.
+"""
+import os
+import json
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from api.search import build_search_query
+from api.detections import build_detections_query
+from api.trends import build_channel_trends_query, build_detection_trends_query
+from api.columnar import build_export_query
+
+
+@pytest.fixture(scope="module")
+def conn():
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        pytest.skip("DATABASE_URL is not set")
+    engine = create_engine(url)
+    try:
+        connection = engine.connect()
+    except OperationalError:
+        pytest.skip("Warehouse database is not reachable")
+    if connection.execute(text("SELECT to_regclass('marts.fct_image_detections')")).scalar() is None:
+        connection.close()
+        pytest.skip("The marts have not been built (dbt run)")
+    yield connection
+    connection.close()
+    engine.dispose()
+
+
+def plan_nodes(conn, sql, params: dict, disable=("seqscan",)) -> list:
+    """Returns every node of the query's plan, flattened, planned with the `disable`d node types off."""
+    try:
+        for setting in disable:
+            conn.execute(text(f"SET LOCAL enable_{setting} = off"))
+        raw = conn.execute(text("EXPLAIN (FORMAT JSON) " + str(sql)), params).scalar()
+    finally:
+        conn.rollback()
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    nodes, stack = [], [plan]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.get("Plans", []))
+    return nodes
+
+
+def seq_scanned(nodes: list) -> set:
+    return {node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"}
+
+
+def scanned(nodes: list, table: str) -> set:
+    """Relations of `table` (the table itself or its partitions) read by the plan."""
+    return {node["Relation Name"] for node in nodes
+            if node.get("Relation Name", "").startswith(table)}
+
+
+def partitions(conn, table: str) -> list:
+    return conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = (SELECT oid FROM pg_class WHERE relname = :table AND relkind = 'p' LIMIT 1)
+    """), {"table": table}).scalars().all()
+
+
+def test_search_uses_the_full_text_index(conn):
+    """Message search reads the GIN index on search_vector, channels by key."""
+    nodes = plan_nodes(conn, *build_search_query("paracetamol", channel="CheMed123", substring=False))
+    assert not seq_scanned(nodes)
+    assert any(node["Node Type"] == "Bitmap Index Scan" for node in nodes)
+
+
+def test_detection_pages_follow_the_sort_index(conn):
+    """Keyset pages of detections are an ordered index range scan, never a full sort."""
+    nodes = plan_nodes(conn, *build_detections_query(after=["2026-01-05", 3, 42, 1], limit=100),
+                       disable=("seqscan", "sort"))
+    assert not seq_scanned(nodes)
+    assert not any(node["Node Type"] == "Sort" for node in nodes)
+
+    nodes = plan_nodes(conn, *build_detections_query(detected_class="bottle", channel="CheMed123", limit=100))
+    assert not seq_scanned(nodes)
+
+
+def test_trends_read_the_rollups_by_date(conn):
+    """Trend queries touch only the daily rollups, through their key indexes."""
+    for builder in (build_channel_trends_query, build_detection_trends_query):
+        nodes = plan_nodes(conn, *builder("week", date(2026, 1, 1), date(2026, 1, 31)))
+        assert not seq_scanned(nodes)
+        assert not scanned(nodes, "fct_")
+
+
+def test_date_filtered_export_uses_the_date_key(conn):
+    """A date-range export of fct_messages is served by the date_key index or partition pruning."""
+    sql, _ = build_export_query("fct_messages", {"message_id": "integer", "date_key": "date"},
+                                ["message_id", "date_key"], date(2026, 1, 1), date(2026, 1, 31))
+    assert not seq_scanned(plan_nodes(conn, sql, {}))
+
+
+def test_partitioned_facts_prune_by_date(conn):
+    """With partition_marts on, a one-month filter reads only that month's partition."""
+    for table in ("fct_messages", "fct_image_detections"):
+        all_partitions = partitions(conn, table)
+        if not all_partitions:
+            pytest.skip("The facts are not partitioned (dbt var partition_marts)")
+        if table == "fct_messages":
+            sql, _ = build_export_query(table, {"message_id": "integer"}, ["message_id"],
+                                        date(2026, 1, 1), date(2026, 1, 31))
+            nodes = plan_nodes(conn, sql, {})
+        else:
+            nodes = plan_nodes(conn, *build_detections_query(start_date=date(2026, 1, 1),
+                                                             end_date=date(2026, 1, 31), limit=100))
+        assert scanned(nodes, table) == {f"{table}_p202601"}, len(all_partitions)
@@ -0,0 +1,93 @@
+import asyncio
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+
+from api.cache import MemoryBackend, ResponseCache
+
+
+class FakeSession:
+    """Stands in for a SQLAlchemy session: serves the refresh version and counts queries."""
+
+    def __init__(self):
+        self.version = 1
+        self.queries = 0
+
+    async def execute(self, sql):
+        self.queries += 1
+        return self
+
+    def scalar(self):
+        return self.version
+
+
+def _client(cache, db, rows):
+    app = FastAPI()
+
+    async def compute():
+        return list(rows)
+
+    @app.get("/report")
+    async def report(request: Request, session=Depends(lambda: db)):
+        return await cache.respond(request, session, compute)
+
+    return TestClient(app)
+
+
+def test_cached_until_refresh_version_changes():
+    """Repeat hits skip Postgres entirely; a new dbt version recomputes the body."""
+    db, rows = FakeSession(), [{"channel_name": "a", "message_count": 1}]
+    cache = ResponseCache(MemoryBackend(), version_check_seconds=0)
+    client = _client(cache, db, rows)
+
+    first = client.get("/report")
+    assert first.json() == rows and first.headers["cache-control"].startswith("public")
+    assert client.get("/report", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    rows[0]["message_count"] = 2
+    assert client.get("/report").json()[0]["message_count"] == 1  # same version: cached
+    db.version = 2
+    second = client.get("/report")
+    assert second.json()[0]["message_count"] == 2 and second.headers["etag"] != first.headers["etag"]
+
+
+def test_version_check_is_throttled():
+    """Within the check interval not even the version query reaches the database."""
+    db = FakeSession()
+    client = _client(ResponseCache(MemoryBackend(), version_check_seconds=3600), db, [])
+    for _ in range(5):
+        client.get("/report")
+    assert db.queries == 1
+
+
+def test_memory_backend_evicts_least_recently_used():
+    """The LRU drops the entry touched longest ago once it is full."""
+    backend = MemoryBackend(max_entries=2)
+
+    async def scenario():
+        await backend.set("a", 1, 60)
+        await backend.set("b", 2, 60)
+        await backend.get("a")
+        await backend.set("c", 3, 60)
+        return await backend.get("a"), await backend.get("b"), await backend.get("c")
+
+    assert asyncio.run(scenario()) == (1, None, 3)
+
+
+def test_query_values_with_separators_get_their_own_entries():
+    """'&' and '=' inside a parameter value cannot make two queries share a cache key."""
+    db = FakeSession()
+    cache = ResponseCache(MemoryBackend(), version_check_seconds=0)
+    app = FastAPI()
+
+    @app.get("/report")
+    async def report(request: Request, session=Depends(lambda: db)):
+        async def compute():
+            return [dict(request.query_params.multi_items())]
+        return await cache.respond(request, session, compute)
+
+    client = TestClient(app)
+    crafted = client.get("/report", params={"channel": "a&limit=5"}).json()
+    plain = client.get("/report", params={"channel": "a", "limit": "5"}).json()
+    assert crafted == [{"channel": "a&limit=5"}]
+    assert plain == [{"channel": "a", "limit": "5"}]
@@ -2,6 +2,45 @@ import pytest
 import os
 import pandas as pd
 
+# How every incremental model applies a run's rows: (incremental_strategy, unique_key)
+INCREMENTAL_MODELS = {
+    "stg_telegram_data": ("merge", ["channel", "message_id"]),
+    "fct_messages": ("merge", ["channel_key", "message_id"]),
+    "fct_image_detections": ("delete+insert", ["channel_key", "message_id"]),
+    "agg_channel_daily": ("delete+insert", ["date_key", "channel_key"]),
+    "agg_detections_daily": ("delete+insert", ["date_key", "channel_key", "detected_class", "image_category"]),
+    # Append-only: existing channels keep their keys
+    "dim_channels": ("append", None),
+}
+
+# dbt parse renders the models without connecting, so the credentials are never used
+PROFILE = """kara_dbt:
+  target: test
+  outputs:
+    test:
+      type: postgres
+      host: localhost
+      port: 5432
+      user: unused
+      password: ""
+      dbname: unused
+      schema: public
+      threads: 1
+"""
+
+@pytest.fixture(scope="module")
+def dbt_manifest(tmp_path_factory):
+    """The manifest of kara_dbt, as parsed by dbt (project config applied)."""
+    dbt_main = pytest.importorskip("dbt.cli.main")
+    workdir = tmp_path_factory.mktemp("dbt_parse")
+    (workdir / "profiles.yml").write_text(PROFILE)
+    result = dbt_main.dbtRunner().invoke([
+        "parse", "--project-dir", "kara_dbt", "--profiles-dir", str(workdir),
+        "--target-path", str(workdir / "target"), "--log-path", str(workdir / "logs"),
+        "--no-partial-parse", "--quiet"])
+    assert result.success, f"dbt parse failed: {result.exception}"
+    return result.result
+
 def test_yolo_results_schema():
     """Verify the YOLO output has the expected columns for the warehouse."""
     path = "data/yolo_results.csv"
@@ -16,4 +55,12 @@ def test_yolo_results_schema():
 def test_dbt_project_structure():
     """Verify dbt project is correctly configured."""
     assert os.path.exists("kara_dbt/dbt_project.yml")
-    assert os.path.exists("kara_dbt/models/marts/fct_messages.sql")
\ No newline at end of file
+    assert os.path.exists("kara_dbt/models/marts/fct_messages.sql")
+
+def test_incremental_models_apply_runs_on_their_natural_key(dbt_manifest):
+    """Each incremental model merges or replaces a run's rows on the key of the grain it stores."""
+    configs = {node.name: node.config for node in dbt_manifest.nodes.values()
+               if node.resource_type == "model" and node.package_name == "kara_dbt"}
+    incremental = {name: (config.incremental_strategy, config.unique_key)
+                   for name, config in configs.items() if config.materialized == "incremental"}
+    assert incremental == INCREMENTAL_MODELS
@@ -0,0 +1,71 @@
+from scripts.detection_cache import DetectionCache, model_fingerprint
+
+
+def _write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return ('chan', path.name, str(path))
+
+
+def test_only_new_or_changed_images_need_inference(tmp_path):
+    """Cached images are skipped until their bytes or the model settings change."""
+    cache = DetectionCache(str(tmp_path / 'cache.sqlite'))
+    fingerprint = model_fingerprint('yolov8n.pt', imgsz=640)
+    items = [_write(tmp_path / 'img' / 'chan_1.jpg', b'one'),
+             _write(tmp_path / 'img' / 'chan_2.jpg', b'two')]
+
+    entries, to_run, changed = cache.plan(items, fingerprint)
+    assert len(to_run) == 2 and len(changed) == 2
+    cache.store({entries[('chan', 'chan_1.jpg')][1]: [('bottle', 0.9, 1, 2, 3, 4)],
+                 entries[('chan', 'chan_2.jpg')][1]: []}, entries)
+
+    entries, to_run, changed = cache.plan(items, fingerprint)
+    assert to_run == [] and changed == set()
+    assert [row[:3] for row in cache.iter_rows()] == [('chan', 'chan_1.jpg', 'bottle')]
+
+    items.append(_write(tmp_path / 'img' / 'chan_3.jpg', b'one'))  # repost of chan_1
+    _write(tmp_path / 'img' / 'chan_2.jpg', b'edited')
+    entries, to_run, changed = cache.plan(items, fingerprint)
+    assert [name for _, name, _ in to_run] == ['chan_2.jpg']
+    assert changed == {('chan', 'chan_2.jpg'), ('chan', 'chan_3.jpg')}
+
+    _, to_run, _ = cache.plan(items, model_fingerprint('yolov8n.pt', imgsz=320))
+    assert len(to_run) == 2  # chan_1 and chan_3 share bytes, so they run once
+    cache.close()
+
+
+def test_near_duplicates_reuse_an_earlier_result(tmp_path):
+    """Reposts with other bytes take the detected photo's key; in-run reposts run once."""
+    import cv2
+    import numpy as np
+
+    def photo(seed):
+        grid = np.random.default_rng(seed).integers(0, 255, (6, 6, 3), dtype=np.uint8)
+        return cv2.resize(grid, (300, 200), interpolation=cv2.INTER_CUBIC)
+
+    def save(name, image, quality=95):
+        path = tmp_path / 'img' / name
+        path.parent.mkdir(exist_ok=True)
+        cv2.imwrite(str(path), image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return ('chan', name, str(path))
+
+    cache = DetectionCache(str(tmp_path / 'cache.sqlite'))
+    fingerprint = model_fingerprint('yolov8n.pt', imgsz=640)
+    items = [save('chan_1.jpg', photo(1)), save('chan_2.jpg', photo(2))]
+    entries, to_run, _ = cache.plan(items, fingerprint)
+    to_run, near = cache.near_duplicates(to_run, entries, fingerprint, max_distance=6)
+    assert len(to_run) == 2 and near == []
+    cache.store({entries[(c, n)][1]: [] for c, n, _ in to_run}, entries)
+
+    items += [save('chan_3.jpg', cv2.resize(photo(1), (150, 100)), quality=60),
+              save('chan_4.jpg', cv2.resize(photo(2), (600, 400))),
+              save('chan_5.jpg', photo(3)), save('chan_6.jpg', photo(3), quality=70)]
+    entries, to_run, _ = cache.plan(items, fingerprint)
+    to_run, near = cache.near_duplicates(to_run, entries, fingerprint, max_distance=6)
+    assert [name for _, name, _ in to_run] == ['chan_5.jpg']
+    assert [(item[1], source, scale) for item, source, scale in near] == [
+        ('chan_3.jpg', entries[('chan', 'chan_1.jpg')][1], (0.5, 0.5)),
+        ('chan_4.jpg', entries[('chan', 'chan_2.jpg')][1], (2.0, 2.0)),
+        ('chan_6.jpg', entries[('chan', 'chan_5.jpg')][1], (1.0, 1.0)),
+    ]
+    cache.close()
@@ -0,0 +1,49 @@
+import pytest
+
+from scripts.detection_cache import DetectionCache, model_fingerprint
+from scripts.detection_sink import DetectionSink
+
+
+def _write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return ('chan', path.name, str(path))
+
+
+def test_flushed_chunks_are_skipped_on_restart(tmp_path):
+    """Each flush lands in the cache, so a crashed run only redoes the unflushed tail."""
+    cache = DetectionCache(str(tmp_path / 'cache.sqlite'))
+    fingerprint = model_fingerprint('yolov8n.pt', imgsz=640)
+    items = [_write(tmp_path / 'img' / f'{i}.jpg', bytes([i])) for i in range(5)]
+    entries, to_run, _ = cache.plan(items, fingerprint)
+
+    sink = DetectionSink(cache, entries, flush_every=2, parquet_dir=str(tmp_path / 'out'))
+    for channel, img_name, _ in to_run[:3]:
+        sink.add(channel, img_name, [('bottle', 0.5, 1, 2, 3, 4)])
+    # Crash: the third image was buffered but never flushed
+
+    entries, to_run, changed = cache.plan(items, fingerprint)
+    assert [name for _, name, _ in to_run] == ['2.jpg', '3.jpg', '4.jpg']
+    # Nothing reached PostgreSQL, so the flushed images still need exporting
+    assert changed == {('chan', f'{i}.jpg') for i in range(5)}
+    cache.close()
+
+
+def test_parquet_parts_use_float32_boxes(tmp_path):
+    """Every flush writes one part file with float32 coordinates."""
+    pq = pytest.importorskip('pyarrow.parquet')
+    cache = DetectionCache(str(tmp_path / 'cache.sqlite'))
+    items = [_write(tmp_path / 'img' / f'{i}.jpg', bytes([i])) for i in range(3)]
+    entries, to_run, changed = cache.plan(items, model_fingerprint('yolov8n.pt'))
+
+    sink = DetectionSink(cache, entries, flush_every=2, parquet_dir=str(tmp_path / 'out'),
+                         message_id=lambda name: int(name.split('.')[0]))
+    for channel, img_name, _ in to_run:
+        sink.add(channel, img_name, [('pill', 0.75, 1.5, 2, 3, 4)])
+    sink.close()
+
+    table = pq.read_table(sink.run_dir)
+    assert sink.parts == 2 and table.num_rows == 3
+    assert str(table.schema.field('x_min').type) == 'float'
+    assert sorted(table.column('message_id').to_pylist()) == [0, 1, 2]
+    cache.close()
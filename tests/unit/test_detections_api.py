@@ -0,0 +1,29 @@
+import json
+from datetime import date
+
+import pytest
+
+from api.detections import build_detections_query, ndjson_lines
+
+
+def test_detections_query_keyset_and_filters():
+    """Filters are optional; the cursor resumes strictly after (date_key, channel_key, message_id, detection_id)."""
+    sql, params = build_detections_query(limit=100)
+    assert 'WHERE' not in str(sql) and params == {'limit': 101}
+
+    sql, params = build_detections_query(detected_class='bottle', min_confidence=0.0, channel='chan',
+                                         after=['2026-01-05', 3, 42, 7])
+    assert 'LIMIT' not in str(sql)  # streaming mode reads every remaining row
+    assert '(d.date_key, d.channel_key, d.message_id, d.detection_id) > ' in str(sql)
+    assert params['after_date'] == date(2026, 1, 5) and params['min_confidence'] == 0.0
+    assert (params['after_channel'], params['after_message'], params['after_detection']) == (3, 42, 7)
+
+    with pytest.raises(ValueError):
+        build_detections_query(after=['not-a-date', 1, 1, 1])
+
+
+def test_ndjson_lines():
+    """Each row becomes one JSON object per line, dates as ISO strings."""
+    text = ndjson_lines([{'message_id': 1, 'date_key': date(2026, 1, 5)}, {'message_id': 2, 'date_key': None}])
+    assert [json.loads(line) for line in text.splitlines()] == [
+        {'message_id': 1, 'date_key': '2026-01-05'}, {'message_id': 2, 'date_key': None}]
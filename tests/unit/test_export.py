@@ -0,0 +1,76 @@
+from datetime import date, datetime
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+from api.columnar import build_export_query, parse_copy_text
+
+
+def test_copy_text_round_trip():
+    """COPY text escapes, NULLs, booleans and timestamps come back as typed Arrow values."""
+    schema = pa.schema([('message_id', pa.int64()), ('message_text', pa.string()),
+                        ('has_image', pa.bool_()), ('message_timestamp', pa.timestamp('us'))])
+    block = (b'1\tline one\\nline two\\ttab \\\\n literal\tt\t2026-01-05 10:30:00\n'
+             b'2\t\\N\tf\t\\N\n')
+
+    table = parse_copy_text(block, schema)
+    assert table.schema == schema
+    assert table.to_pylist() == [
+        {'message_id': 1, 'message_text': 'line one\nline two\ttab \\n literal',
+         'has_image': True, 'message_timestamp': datetime(2026, 1, 5, 10, 30)},
+        {'message_id': 2, 'message_text': None, 'has_image': False, 'message_timestamp': None},
+    ]
+
+
+def test_export_query_projection_and_dates():
+    """Only requested columns are selected; numerics become doubles; dates are inlined literals."""
+    columns = {'date_key': 'date', 'year': 'numeric', 'search_vector': 'tsvector'}
+    sql, schema = build_export_query('dim_dates', columns, ['date_key', 'year', 'search_vector'],
+                                     start_date=date(2026, 1, 1))
+    assert sql == ('SELECT "date_key", "year"::double precision AS "year", '
+                   '"search_vector"::text AS "search_vector" FROM marts.dim_dates '
+                   'WHERE "date_key" >= DATE \'2026-01-01\'')
+    assert schema.field('year').type == pa.float64()
+
+
+def test_client_disconnect_releases_the_copy_connection(monkeypatch):
+    """Closing the stream mid-export cancels the COPY and returns its connection, even with a full queue."""
+    import asyncio
+    from contextlib import asynccontextmanager
+    from types import SimpleNamespace
+
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://user@localhost/unused')
+    from api import export
+
+    released = []
+
+    class Driver:
+        async def copy_from_query(self, sql, output, format, timeout):
+            for message_id in range(1000):
+                await output(b'%d\n' % message_id)
+
+    class Connection:
+        async def get_raw_connection(self):
+            return SimpleNamespace(driver_connection=Driver())
+
+    @asynccontextmanager
+    async def stream_connection():
+        try:
+            yield Connection()
+        finally:
+            released.append(True)
+
+    monkeypatch.setattr(export.database, 'stream_connection', stream_connection)
+    monkeypatch.setattr(export, 'EXPORT_CHUNK_BYTES', 8)
+
+    async def disconnect_after_first_chunk():
+        stream = export.stream_export('SELECT message_id FROM marts.fct_messages',
+                                      pa.schema([('message_id', pa.int64())]), 'arrow')
+        await stream.__anext__()
+        await asyncio.sleep(0.01)  # the COPY fills the queue meanwhile
+        await stream.aclose()
+        return [task for task in asyncio.all_tasks() if task.get_coro().__name__ == 'copy']
+
+    assert asyncio.run(asyncio.wait_for(disconnect_after_first_chunk(), 5)) == []
+    assert released == [True]
@@ -0,0 +1,219 @@
+import re
+import json
+import importlib
+import logging
+from functools import partial
+
+import psycopg2
+import pytest
+
+from scripts import ingest_to_db
+from scripts.scraper import compact_partition
+
+
+def _write_partition(path, records, truncated_tail=''):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        f.write(truncated_tail)
+
+
+def _records(n):
+    return [{'channel': 'chan', 'id': i, 'date': '2026-01-17 08:00:00+00:00',
+             'text': f'ፓራሲታሞል {i}', 'views': i, 'forwards': 0, 'image_path': None}
+            for i in range(1, n + 1)]
+
+
+class FakeCursor:
+    """Records statements and COPY payloads on its connection's open transaction."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        self.conn.pending.append((' '.join(sql.split()), params))
+
+    def fetchone(self):
+        # The natural key index already exists
+        return ('raw.uq_telegram_messages_channel_message',)
+
+    def fetchall(self):
+        # Empty ingest manifest
+        return []
+
+    def copy_expert(self, sql, file):
+        payload = file.read()
+        if self.conn.fail_on and self.conn.fail_on in payload:
+            raise psycopg2.DataError('invalid input syntax for type json')
+        self.conn.pending.append((sql, payload))
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Keeps the statements of every committed and rolled back transaction."""
+
+    def __init__(self):
+        # COPY fails on a payload containing `fail_on`
+        self.fail_on = None
+        self.pending, self.committed, self.rolled_back = [], [], []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed.append(self.pending)
+        self.pending = []
+
+    def rollback(self):
+        self.rolled_back.append(self.pending)
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Routes ingest_data to a FakeConnection, execute_values included."""
+    conn = FakeConnection()
+    monkeypatch.setattr(ingest_to_db, 'get_db_connection', lambda: conn)
+    monkeypatch.setattr(ingest_to_db.extras, 'execute_values',
+                        lambda cur, sql, values: cur.execute(sql, list(values)))
+    return conn
+
+
+def _copy_rows(payload):
+    """Splits a COPY text payload into unescaped fields, one list per row."""
+    unescape = {'t': '\t', 'r': '\r', 'n': '\n'}
+    return [[re.sub(r'\\(.)', lambda m: unescape.get(m[1], m[1]), field) for field in line.split('\t')]
+            for line in payload.split('\n')[:-1]]
+
+
+def _loads(transaction):
+    """(message ids copied, manifest paths written) by one transaction."""
+    ids, paths = [], []
+    for sql, data in transaction:
+        if sql.startswith('COPY'):
+            ids += [json.loads(content)['id'] for _, content in _copy_rows(data)]
+        elif sql.startswith('INSERT INTO raw.ingest_manifest'):
+            paths += [entry[0] for entry in data]
+    return ids, paths
+
+
+def _landing(base, files, rows):
+    """Writes `files` daily partitions of `rows` messages with distinct ids."""
+    records = _records(files * rows)
+    for day in range(files):
+        (base / f'2026-01-{day + 1:02d}').mkdir()
+        _write_partition(base / f'2026-01-{day + 1:02d}' / 'chan.ndjson',
+                         records[day * rows:(day + 1) * rows])
+    return {f'2026-01-{day + 1:02d}/chan.ndjson': [r['id'] for r in records[day * rows:(day + 1) * rows]]
+            for day in range(files)}
+
+
+def test_ndjson_reader_chunks_and_skips_truncated_line(tmp_path):
+    """A crashed scrape's partial last line is skipped, everything else is read in chunks."""
+    path = tmp_path / 'chan.ndjson'
+    _write_partition(path, _records(7), truncated_tail='{"channel": "chan", "id": 8, "te')
+
+    chunks = list(ingest_to_db.iter_landing_records(str(path), chunk_size=3))
+
+    assert [len(c) for c in chunks] == [3, 3, 1]
+    assert [r['id'] for c in chunks for r in c] == list(range(1, 8))
+
+
+def test_parquet_compaction_round_trip(tmp_path):
+    """Compacted partitions read back the same records as the NDJSON source."""
+    pytest.importorskip('pyarrow')
+    _write_partition(tmp_path / 'chan.ndjson', _records(5))
+
+    written = compact_partition(str(tmp_path))
+
+    assert [p.endswith('chan.parquet') for p in written] == [True]
+    assert not (tmp_path / 'chan.ndjson').exists()
+    records = [r for c in ingest_to_db.iter_landing_records(written[0], chunk_size=2) for r in c]
+    assert records == _records(5)
+
+
+def test_copy_rows_escape_tabs_and_line_breaks():
+    """Tabs, line breaks and backslashes in a value stay inside its COPY field."""
+    conn = FakeConnection()
+    loader = ingest_to_db.CopyLoader(conn.cursor(), batch_rows=10)
+    contents = ['{"id": 1,\t"text": "a\\\\tb"}', '{"id": 2}\r', 'line\nbreak\\']
+
+    loader.add('che\tmed', contents)
+    assert loader.flush() == 3
+
+    [(sql, payload)] = conn.pending
+    assert sql.startswith('COPY raw.telegram_messages (channel, content)')
+    assert _copy_rows(payload) == [['che\tmed', content] for content in contents]
+
+
+def test_upsert_stages_every_copy_before_merging(tmp_path, fake_db):
+    """Repeated messages are all staged in file order, then merged and the stage emptied."""
+    for day, ids in (('2026-01-17', [1, 2]), ('2026-01-18', [1, 3])):
+        (tmp_path / day).mkdir()
+        _write_partition(tmp_path / day / 'chan.ndjson', [_records(3)[i - 1] for i in ids])
+
+    assert ingest_to_db.ingest_data(base_path=str(tmp_path))['rows'] == 4
+
+    # The last transaction loads the data: COPY, merge, truncate, manifest
+    statements = fake_db.committed[-1][-4:]
+    copy_sql, payload = statements[0]
+    assert copy_sql.startswith('COPY stage_telegram_messages (channel, content)')
+    assert [json.loads(content)['id'] for _, content in _copy_rows(payload)] == [1, 2, 1, 3]
+    # The merge keeps the last staged copy of each message
+    assert [sql for sql, _ in statements[1:3]] == [
+        ' '.join(ingest_to_db.MERGE_STAGED_SQL.split()), 'TRUNCATE stage_telegram_messages;']
+    assert "DISTINCT ON (channel, content->>'id')" in statements[1][0]
+    assert "ORDER BY channel, content->>'id', seq DESC" in statements[1][0]
+    manifest_sql, entries = statements[3]
+    assert manifest_sql.startswith('INSERT INTO raw.ingest_manifest')
+    assert [(path, rows) for path, _, _, _, rows in entries] == [
+        ('2026-01-17/chan.ndjson', 2), ('2026-01-18/chan.ndjson', 2)]
+    assert fake_db.rolled_back == []
+
+
+def test_commit_every_bounds_the_rows_per_transaction(tmp_path, fake_db):
+    """Each commit holds whole files, at most commit_every rows plus one file's, with their manifest entries."""
+    files = _landing(tmp_path, files=5, rows=3)
+
+    stats = ingest_to_db.ingest_data(base_path=str(tmp_path), batch_rows=2, commit_every=5)
+
+    assert stats['rows'] == 15
+    loads = [load for load in map(_loads, fake_db.committed) if load[0]]
+    assert [len(ids) for ids, _ in loads] == [6, 6, 3]
+    for ids, paths in loads:
+        assert len(ids) < 5 + 3
+        assert sorted(ids) == sorted(i for path in paths for i in files[path])
+
+
+def test_failure_mid_file_keeps_committed_files_and_manifest(tmp_path, fake_db, monkeypatch):
+    """A COPY failure halfway through a file rolls back only the open transaction."""
+    files = _landing(tmp_path, files=4, rows=3)
+    # The third file fails on its second COPY batch, after the first was sent
+    fake_db.fail_on = '"id": 9,'
+    monkeypatch.setattr(ingest_to_db, 'iter_landing_records',
+                        partial(ingest_to_db.iter_landing_records, chunk_size=2))
+
+    assert ingest_to_db.ingest_data(base_path=str(tmp_path), batch_rows=2, commit_every=3) == {}
+
+    loads = [load for load in map(_loads, fake_db.committed) if load[0]]
+    assert loads == [(files['2026-01-01/chan.ndjson'], ['2026-01-01/chan.ndjson']),
+                     (files['2026-01-02/chan.ndjson'], ['2026-01-02/chan.ndjson'])]
+    assert [_loads(transaction) for transaction in fake_db.rolled_back] == [([7, 8], [])]
+
+
+def test_credentials_stay_out_of_the_output(monkeypatch, capsys, caplog):
+    """Neither importing the module nor connecting prints or logs the database password."""
+    monkeypatch.setenv('POSTGRES_PASSWORD', 's3cret-pw')
+    monkeypatch.setattr(ingest_to_db.psycopg2, 'connect', lambda **params: FakeConnection())
+
+    importlib.reload(ingest_to_db)
+    with caplog.at_level(logging.DEBUG, logger=ingest_to_db.logger.name):
+        ingest_to_db.get_db_connection()
+
+    assert 'Connecting to database' in caplog.text
+    assert 's3cret-pw' not in capsys.readouterr().out + caplog.text
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+import pytest
+
+from scripts.instrumentation import dagster_metadata, stage
+from scripts.logger_config import log_context
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_stage_record_has_rates_spans_and_peak_rss(tmp_path):
+    """A stage emits one JSON line with its counters, per-second rates and accumulated spans."""
+    path = tmp_path / 'metrics.jsonl'
+    with stage('ingest', path=str(path), method='copy') as metrics:
+        for _ in range(3):
+            with metrics.span('db_load'):
+                metrics.count('rows', 100)
+
+    [record] = read_records(path)
+    assert record['stage'] == 'ingest' and record['status'] == 'ok'
+    assert record['labels'] == {'method': 'copy'}
+    assert record['counters'] == {'rows': 300}
+    assert record['rates']['rows_per_sec'] > 0
+    assert 0 <= record['spans']['db_load'] <= record['seconds']
+    assert record['peak_rss_mb'] > 0
+
+    metadata = dagster_metadata(record)
+    assert {'seconds', 'rows', 'rows_per_sec', 'db_load_seconds', 'peak_rss_mb'} <= set(metadata)
+    assert all(isinstance(value, (int, float)) for value in metadata.values())
+
+
+def test_failed_stage_is_recorded_once(tmp_path):
+    """A stage that raises is still emitted, marked as failed, and closing it again is a no-op."""
+    path = tmp_path / 'metrics.jsonl'
+    with pytest.raises(RuntimeError):
+        with stage('detection', path=str(path)) as metrics:
+            metrics.count('images', 2)
+            raise RuntimeError('boom')
+    metrics.close()
+
+    [record] = read_records(path)
+    assert record['status'] == 'failed' and record['counters'] == {'images': 2}
+
+
+def test_labels_reach_stages_of_child_tasks(tmp_path):
+    """Run-level labels are attached to the stages opened by the tasks of that run."""
+    path = tmp_path / 'metrics.jsonl'
+
+    async def scrape(channel):
+        with stage('scrape_channel', path=str(path), channel=channel):
+            await asyncio.sleep(0)
+
+    async def run():
+        await asyncio.gather(scrape('a'), scrape('b'))
+
+    with log_context(run_id='r1'):
+        asyncio.run(run())
+    with stage('dbt_run', path=str(path)):
+        pass
+
+    records = read_records(path)
+    assert sorted(r['labels'].get('channel') for r in records[:2]) == ['a', 'b']
+    assert all(r['labels']['run_id'] == 'r1' for r in records[:2])
+    assert 'run_id' not in records[2]['labels']
+
+
+def test_default_metrics_file_is_read_when_the_stage_closes(tmp_path, monkeypatch):
+    """Stages without a path append to METRICS_PATH as it is when they close."""
+    from scripts import instrumentation
+
+    path = tmp_path / 'elsewhere.jsonl'
+    monkeypatch.setattr(instrumentation, 'METRICS_PATH', str(path))
+    with stage('ingest'):
+        pass
+
+    [record] = read_records(path)
+    assert record['stage'] == 'ingest'
@@ -0,0 +1,82 @@
+import glob
+import json
+import os
+
+import pytest
+
+from scripts import logger_config
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    """A directory for the test's own log files (the handlers are reset by tests/conftest.py)."""
+    path = tmp_path / 'own_logs'
+    path.mkdir()
+    return path
+
+
+def read_json_log(log_dir):
+    logger_config.shutdown()  # waits for the writer thread
+    with open(os.path.join(log_dir, 'warehouse_pipeline.jsonl'), encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_queued_records_are_written_as_json_with_their_context(log_dir):
+    """Records logged through the queue reach both files, with the bound stage/channel/run id."""
+    logger_config.configure(log_dir=str(log_dir), mode='queue', force=True)
+    logger = logger_config.get_logger('test.queue')
+
+    with logger_config.log_context(run_id='r1'):
+        with logger_config.log_context(stage='scrape_channel', channel='CheMed123'):
+            logger.info("Scraped %d messages", 5)
+        logger.warning("Outside the stage")
+
+    first, second = read_json_log(log_dir)
+    assert first['message'] == 'Scraped 5 messages' and first['level'] == 'INFO'
+    assert (first['stage'], first['channel'], first['run_id']) == ('scrape_channel', 'CheMed123', 'r1')
+    assert second['run_id'] == 'r1' and 'channel' not in second
+    with open(log_dir / 'warehouse_pipeline.log', encoding='utf-8') as f:
+        assert 'test.queue - INFO - Scraped 5 messages' in f.read()
+
+
+def test_debug_calls_are_sampled_per_call_site(log_dir):
+    """Only 1 of every N debug() calls of a call site is logged; INFO is never sampled."""
+    logger_config.configure(log_dir=str(log_dir), mode='sync', level='DEBUG', sample_every=100, force=True)
+    logger = logger_config.get_logger('test.sampled')
+
+    for i in range(250):
+        logger.debug("item %d", i)
+    for i in range(3):
+        logger.info("batch %d", i)
+
+    records = read_json_log(log_dir)
+    assert [r['message'] for r in records if r['level'] == 'DEBUG'] == ['item 0', 'item 100', 'item 200']
+    assert all(r['sample_every'] == 100 for r in records if r['level'] == 'DEBUG')
+    assert len([r for r in records if r['level'] == 'INFO']) == 3
+
+
+def test_log_files_rotate_by_size(log_dir):
+    """A log file is rotated once it reaches LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT files."""
+    logger_config.configure(log_dir=str(log_dir), max_bytes=2_000, backup_count=2, force=True)
+    logger = logger_config.get_logger('test.rotation')
+
+    for i in range(200):
+        logger.info("line %d of a rotating log", i)
+    logger_config.shutdown()
+
+    assert sorted(os.path.basename(p) for p in glob.glob(str(log_dir / 'warehouse_pipeline.log*'))) == [
+        'warehouse_pipeline.log', 'warehouse_pipeline.log.1', 'warehouse_pipeline.log.2']
+    assert os.path.getsize(log_dir / 'warehouse_pipeline.log') <= 2_000
+
+
+def test_reset_stops_the_writer_thread_and_detaches_handlers(log_dir):
+    """After reset() no listener thread or handler is left, and the next get_logger() sets them up again."""
+    logger_config.configure(log_dir=str(log_dir), mode='queue', force=True)
+    logger = logger_config.get_logger('test.reset')
+    listener = logger_config._state['listener']
+
+    logger_config.reset()
+    assert logger.handlers == [] and logger_config._state['listener'] is None
+    assert listener._thread is None  # QueueListener.stop() joined the thread
+
+    assert logger_config.get_logger('test.reset').handlers
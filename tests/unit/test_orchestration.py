@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+dagster = pytest.importorskip('dagster')
+
+from orchestration.definitions import (  # noqa: E402
+    CHANNELS, daily_medical_schedule, defs, partition_range_tags, pipeline_partitions, telegram_scraper,
+)
+
+
+def test_daily_schedule_requests_yesterday_for_every_channel():
+    """The midnight run covers the day that just ended, all channels in one run."""
+    context = dagster.build_schedule_context(
+        scheduled_execution_time=datetime(2026, 1, 8, tzinfo=timezone.utc))
+    request = daily_medical_schedule(context)
+
+    keys = pipeline_partitions.get_partition_keys_in_range(dagster.PartitionKeyRange(
+        request.tags['dagster/asset_partition_range_start'], request.tags['dagster/asset_partition_range_end']))
+    assert request.run_key == '2026-01-07'
+    assert sorted(keys) == sorted(f'{channel}|2026-01-07' for channel in CHANNELS)
+
+
+def test_a_week_backfill_is_one_run_over_one_session(tmp_path, monkeypatch):
+    """A ranged run scrapes every (channel, day) in-process, with one Telegram client."""
+    monkeypatch.chdir(tmp_path)
+    import telethon
+
+    sessions = []
+
+    class FakeTelegramClient:
+        def __init__(self, *args):
+            sessions.append(self)
+            self.scraped = []
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def iter_messages(self, channel_username, offset_date=None, **kwargs):
+            self.scraped.append((channel_username, offset_date.date()))
+            await asyncio.sleep(0)
+            return
+            yield
+
+    monkeypatch.setattr(telethon, 'TelegramClient', FakeTelegramClient)
+    result = defs.resolve_job_def('medical_pipeline_job').execute_in_process(
+        asset_selection=[telegram_scraper.key], instance=dagster.DagsterInstance.ephemeral(),
+        tags=partition_range_tags('2026-01-01', '2026-01-07'))
+
+    assert result.success and len(sessions) == 1
+    # Every partition of the run carries the run's stage metrics
+    materializations = result.asset_materializations_for_node('telegram_scraper')
+    assert len(materializations) == 7 * len(CHANNELS)
+    assert {'seconds', 'messages_per_sec', 'bytes_downloaded', 'peak_rss_mb'} <= set(materializations[0].metadata)
+    assert len(sessions[0].scraped) == 7 * len(CHANNELS)
+    assert len(list((tmp_path / 'data/raw/telegram_messages').glob('posted=2026-01-0*/*.ndjson'))) == 7 * len(CHANNELS)
@@ -0,0 +1,58 @@
+import random
+
+import cv2
+import numpy as np
+
+from scripts.perceptual_hash import MultiIndexHash, dhash, hamming, scale_boxes
+
+
+def _photo(seed, size=(320, 320)):
+    """A smooth, photo-like image: a 6x6 grid of random colours upscaled."""
+    grid = np.random.default_rng(seed).integers(0, 255, (6, 6, 3), dtype=np.uint8)
+    return cv2.resize(grid, size[::-1], interpolation=cv2.INTER_CUBIC)
+
+
+def test_reposts_are_close_and_other_photos_are_not():
+    """Re-encoded and resized copies stay within a few bits; different photos do not."""
+    original = _photo(1)
+    _, jpeg = cv2.imencode('.jpg', cv2.resize(original, (160, 160)), [cv2.IMWRITE_JPEG_QUALITY, 50])
+    repost = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+
+    assert hamming(dhash(original), dhash(repost)) <= 6
+    assert all(hamming(dhash(original), dhash(_photo(seed))) > 6 for seed in range(2, 12))
+
+
+def test_multi_index_lookup_matches_a_full_scan():
+    """nearest() finds exactly what comparing against every hash finds."""
+    rng = random.Random(3)
+    hashes = [rng.getrandbits(64) for _ in range(5000)]
+    index = MultiIndexHash(max_distance=6)
+    for key, phash in enumerate(hashes):
+        index.add(key, phash)
+
+    queries = [rng.getrandbits(64) for _ in range(20)]
+    for phash in rng.sample(hashes, 20):
+        for _ in range(rng.randint(0, 8)):
+            phash ^= 1 << rng.randrange(64)
+        queries.append(phash)
+    for query in queries:
+        distance, key = min((hamming(query, phash), key) for key, phash in enumerate(hashes))
+        expected = (key, distance, None) if distance <= 6 else None
+        assert index.nearest(query) == expected
+
+
+def test_ties_go_to_the_earliest_hash():
+    """Equally close hashes resolve to the first one added, whichever band finds it first."""
+    index = MultiIndexHash(max_distance=6)
+    index.add('early', 0b110)  # 2 bits off, in the lowest band
+    index.add('late', 1 | 1 << 16)  # 2 bits off, across two bands
+    assert index.nearest(0) == ('early', 2, None)
+
+    index = MultiIndexHash(max_distance=6)
+    index.add('early', 1 | 1 << 16)
+    index.add('late', 0b110)
+    assert index.nearest(0) == ('early', 2, None)
+
+
+def test_boxes_follow_a_resized_copy():
+    assert scale_boxes([('bottle', 0.9, 10, 20, 30, 40)], 0.5, 2) == [('bottle', 0.9, 5, 40, 15, 80)]
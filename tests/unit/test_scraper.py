@@ -0,0 +1,272 @@
+import asyncio
+import json
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from telethon import errors, events
+
+from scripts import scraper
+from scripts.detection_queue import DetectionQueue
+from scripts.scrape_state import CheckpointStore
+
+
+class FakeMessage:
+    def __init__(self, message_id, with_photo=False):
+        self.id = message_id
+        self.date = datetime(2026, 1, 17, tzinfo=timezone.utc)
+        self.text = f"message {message_id}"
+        self.views = 10
+        self.forwards = 1
+        self.photo = object() if with_photo else None
+
+
+class FakeClient:
+    """Records how many channels are iterated at the same time."""
+
+    def __init__(self, messages=5):
+        self.messages = messages
+        self.active = 0
+        self.peak = 0
+        self.downloads = 0
+
+    async def iter_messages(self, channel_username, limit=None, min_id=0, reverse=False):
+        ids = [i for i in range(1, self.messages + 1) if i > min_id]
+        if not reverse:
+            ids.reverse()
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            for i in ids[:limit]:
+                await asyncio.sleep(0.001)
+                yield FakeMessage(i, with_photo=i % 2 == 0)
+        finally:
+            self.active -= 1
+
+    async def download_media(self, media, file=None):
+        self.downloads += 1
+        with open(file, 'wb') as f:
+            f.write(b'jpeg')
+        return file
+
+
+def test_scrape_all_bounds_channel_concurrency(tmp_path, monkeypatch):
+    """No more than max_concurrent_channels channels are scraped at once."""
+    monkeypatch.chdir(tmp_path)
+    client = FakeClient()
+    channels = ['a', 'b', 'c', 'd', 'e']
+
+    asyncio.run(scraper.scrape_all(client, channels, max_concurrent_channels=2))
+
+    assert client.peak == 2
+    for channel in channels:
+        assert len(list((tmp_path / 'data/raw/images' / channel).iterdir())) == 2
+
+
+def test_call_with_flood_wait_retries(monkeypatch):
+    """A FloodWait is retried after a back-off instead of failing the channel."""
+    async def no_sleep(_):
+        return None
+    monkeypatch.setattr(scraper.asyncio, 'sleep', no_sleep)
+
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise errors.FloodWaitError(request=None, capture=3)
+        return 'ok'
+
+    assert asyncio.run(scraper.call_with_flood_wait(flaky, retries=2)) == 'ok'
+    assert len(calls) == 2
+
+    async def always_limited():
+        raise errors.FloodWaitError(request=None, capture=3)
+
+    with pytest.raises(errors.FloodWaitError):
+        asyncio.run(scraper.call_with_flood_wait(always_limited, retries=1))
+
+
+def test_incremental_scrape_uses_checkpoint(tmp_path, monkeypatch):
+    """A second run only fetches messages above the stored high-water mark."""
+    monkeypatch.chdir(tmp_path)
+    store = CheckpointStore(str(tmp_path / 'state.json'))
+    client = FakeClient(messages=4)
+
+    asyncio.run(scraper.scrape_channel(client, 'chan', checkpoints=store))
+    assert store.get('chan') == 4
+    assert client.downloads == 2
+
+    client.messages = 7
+    asyncio.run(scraper.scrape_channel(client, 'chan', checkpoints=store))
+    assert CheckpointStore(str(tmp_path / 'state.json')).get('chan') == 7
+    assert client.downloads == 3  # only message 6 carried a new photo
+
+    partition = next((tmp_path / 'data/raw/telegram_messages').iterdir())
+    with open(partition / 'chan.ndjson', encoding='utf-8') as f:
+        assert sorted(json.loads(line)['id'] for line in f) == list(range(1, 8))
+
+
+def test_failed_download_leaves_no_partial_file(tmp_path, monkeypatch):
+    """A failed photo is cleared from the metadata and holds the checkpoint back."""
+    monkeypatch.chdir(tmp_path)
+
+    class BrokenMediaClient(FakeClient):
+        async def download_media(self, media, file=None):
+            with open(file, 'wb') as f:
+                f.write(b'half')
+            raise ConnectionError("dropped")
+
+    store = CheckpointStore(str(tmp_path / 'state.json'))
+    stats = asyncio.run(scraper.scrape_channel(BrokenMediaClient(messages=3), 'chan',
+                                               checkpoints=store))
+
+    assert stats['messages'] == 3 and stats['photos'] == 0
+    assert list((tmp_path / 'data/raw/images/chan').iterdir()) == []
+    assert store.get('chan') == 1  # message 2 carried the failed photo
+
+
+class FakeEventSource(FakeClient):
+    """A client whose updates are replayed by the test instead of Telegram."""
+
+    def __init__(self, messages=0):
+        super().__init__(messages)
+        self.handlers = []
+
+    def add_event_handler(self, callback, event):
+        self.handlers.append((callback, type(event)))
+
+    def remove_event_handler(self, callback):
+        self.handlers = [(cb, kind) for cb, kind in self.handlers if cb is not callback]
+
+    async def emit(self, kind, channel, message):
+        event = SimpleNamespace(message=message)
+
+        async def get_chat():
+            return SimpleNamespace(username=channel)
+        event.get_chat = get_chat
+        await asyncio.gather(*(cb(event) for cb, handled in self.handlers if handled is kind))
+
+
+async def _until(condition, timeout=5.0):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.005)
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_live_mode_replays_history_then_streams_events(tmp_path, monkeypatch):
+    """Catch-up and live posts/edits land in micro-batches, photos are queued, the checkpoint follows."""
+    monkeypatch.chdir(tmp_path)
+    store = CheckpointStore(str(tmp_path / 'state.json'))
+    queue = DetectionQueue(str(tmp_path / 'queue.ndjson'))
+    client = FakeEventSource(messages=3)
+    batches = []
+
+    async def scenario():
+        stop = asyncio.Event()
+        live = asyncio.create_task(scraper.run_live(
+            client, ['Chan'], batches.append, checkpoints=store, detection_queue=queue,
+            stop=stop, batch_size=2, flush_seconds=0.01))
+        await _until(lambda: sum(map(len, batches)) == 3)  # history 1-3 replayed
+
+        await client.emit(events.NewMessage, 'chan', FakeMessage(4, with_photo=True))
+        await client.emit(events.NewMessage, 'other', FakeMessage(99))
+        edited = FakeMessage(2, with_photo=True)
+        edited.views = 250
+        await client.emit(events.MessageEdited, 'chan', edited)
+        await _until(lambda: sum(map(len, batches)) == 5)
+        stop.set()
+        return await live
+
+    stats = asyncio.run(scenario())
+
+    assert stats['messages'] == 5 and all(len(batch) <= 2 for batch in batches)
+    warehouse = {record['id']: record for batch in batches for record in batch}
+    assert sorted(warehouse) == [1, 2, 3, 4]
+    assert warehouse[2]['views'] == 250 and warehouse[2]['image_path'] == 'Chan_2.jpg'
+    assert client.downloads == 2  # the edit reused the photo already on disk
+    assert queue.claim()[1] == [('Chan', 'Chan_2.jpg'), ('Chan', 'Chan_4.jpg')]
+    assert store.get('Chan') == 4
+
+    partition = next((tmp_path / 'data/raw/telegram_messages').iterdir())
+    with open(partition / 'Chan.ndjson', encoding='utf-8') as f:
+        assert [json.loads(line)['id'] for line in f][-2:] == [4, 2]
+
+
+def test_live_mode_drains_a_full_buffer_on_shutdown(tmp_path, monkeypatch):
+    """Stopping mid-burst still writes every buffered message, although no batch was due."""
+    monkeypatch.chdir(tmp_path)
+    client = FakeEventSource()
+    batches = []
+
+    async def scenario():
+        stop = asyncio.Event()
+        live = asyncio.create_task(scraper.run_live(
+            client, ['chan'], batches.append, checkpoints=CheckpointStore(str(tmp_path / 'state.json')),
+            stop=stop, catch_up=False, batch_size=1000, flush_seconds=60, buffer_size=4))
+        await _until(lambda: client.handlers)
+        burst = [asyncio.create_task(client.emit(events.NewMessage, 'chan', FakeMessage(i)))
+                 for i in range(1, 21)]
+        await asyncio.sleep(0.05)
+        stop.set()
+        await asyncio.gather(*burst)
+        return await live
+
+    stats = asyncio.run(asyncio.wait_for(scenario(), 10))
+
+    assert stats['messages'] == 20
+    assert sorted(record['id'] for batch in batches for record in batch) == list(range(1, 21))
+
+
+class DatedClient(FakeClient):
+    """Three messages a day from 2026-01-15, served newest first before offset_date."""
+
+    async def iter_messages(self, channel_username, limit=None, min_id=0, reverse=False, offset_date=None):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            for i in range(self.messages, 0, -1):
+                message = FakeMessage(i, with_photo=i % 2 == 0)
+                message.date = datetime(2026, 1, 15, 12, tzinfo=timezone.utc) + timedelta(days=(i - 1) // 3)
+                if offset_date is None or message.date < offset_date:
+                    await asyncio.sleep(0.001)
+                    yield message
+        finally:
+            self.active -= 1
+
+
+def test_day_partitions_hold_that_days_messages(tmp_path, monkeypatch):
+    """Each (channel, day) gets its own partition file, rewritten rather than appended on re-runs."""
+    monkeypatch.chdir(tmp_path)
+    client = DatedClient(messages=9)
+    partitions = [('a', date(2026, 1, 16)), ('b', date(2026, 1, 16)), ('a', date(2026, 1, 17))]
+
+    asyncio.run(scraper.scrape_partitions(client, partitions))
+    asyncio.run(scraper.scrape_partitions(client, partitions[:1]))
+
+    def ids(channel, day):
+        with open(tmp_path / 'data/raw/telegram_messages' / f'posted={day}' / f'{channel}.ndjson',
+                  encoding='utf-8') as f:
+            return sorted(json.loads(line)['id'] for line in f)
+
+    assert ids('a', '2026-01-16') == [4, 5, 6] and ids('b', '2026-01-16') == [4, 5, 6]
+    assert ids('a', '2026-01-17') == [7, 8, 9]
+    assert client.peak >= 2  # channels a and b were scraped at the same time
+    assert not list((tmp_path / 'data/raw/telegram_messages').glob('*/*.part'))
+    assert not (tmp_path / 'data/raw/scrape_state.json').exists()
+
+
+def test_day_partitions_leave_the_scraped_day_files_alone(tmp_path, monkeypatch):
+    """A partition run of a day does not replace what the batch scraper collected on that day."""
+    monkeypatch.chdir(tmp_path)
+    scraped = tmp_path / 'data/raw/telegram_messages/2026-01-16/a.ndjson'
+    scraped.parent.mkdir(parents=True)
+    scraped.write_text(json.dumps({'channel': 'a', 'id': 42}) + '\n', encoding='utf-8')
+
+    asyncio.run(scraper.scrape_partitions(DatedClient(messages=9), [('a', date(2026, 1, 16))]))
+
+    assert scraped.read_text(encoding='utf-8') == json.dumps({'channel': 'a', 'id': 42}) + '\n'
+    posted = tmp_path / 'data/raw/telegram_messages/posted=2026-01-16/a.ndjson'
+    assert str(posted.relative_to(tmp_path)) == scraper.posted_partition_path('a', date(2026, 1, 16))
+    assert sorted(json.loads(line)['id'] for line in posted.read_text(encoding='utf-8').splitlines()) == [4, 5, 6]
@@ -0,0 +1,52 @@
+from datetime import date, datetime
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from api.pagination import decode_cursor, encode_cursor
+from api.search import build_search_query, like_pattern
+
+
+def test_cursor_round_trip_and_rejection():
+    """Cursors survive the round trip; tampered or mis-sized ones are a 400."""
+    cursor = encode_cursor((0.0607927, 3, 1042))
+    assert decode_cursor(cursor, 3) == [0.0607927, 3, 1042]
+    for bad in ('not-a-cursor!', encode_cursor((1, 2))):
+        with pytest.raises(HTTPException) as excinfo:
+            decode_cursor(bad, 3)
+        assert excinfo.value.status_code == 400
+
+
+def test_search_query_filters_and_keyset():
+    """Optional filters and the keyset predicate only appear when requested."""
+    sql, params = build_search_query('para_cet%', limit=20)
+    assert 'ILIKE :pattern' in str(sql) and ':after_rank' not in str(sql)
+    assert params['pattern'] == '%para\\_cet\\%%' and params['limit'] == 21
+
+    sql, params = build_search_query('paracetamol', channel='tikvahpharma',
+                                     start_date=date(2026, 1, 1), end_date=date(2026, 1, 31),
+                                     after=[0.5, 2, 99], substring=False)
+    assert 'ILIKE' not in str(sql) and 'c.channel_name = :channel' in str(sql)
+    assert params['end_before'] == datetime(2026, 2, 1)
+    assert (params['after_rank'], params['after_channel'], params['after_id']) == (0.5, 2, 99)
+    assert like_pattern('50%') == '%50\\%%'
+
+
+def test_search_rejects_a_cursor_of_the_wrong_types(monkeypatch):
+    """A well-formed cursor holding values of the wrong types is a 400, not a database error."""
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://user@localhost/unused')
+    from api import main
+
+    class NoDatabase:
+        async def execute(self, sql, params=None):
+            raise AssertionError("the query must not run")
+
+    monkeypatch.setitem(main.app.dependency_overrides, main.get_db, lambda: NoDatabase())
+    client = TestClient(main.app)
+
+    for values in (('high', 3, 1042), (0.5, None, 1042), (0.5, 3, [1])):
+        response = client.get('/analytics/search', params={'query': 'paracetamol', 'cursor': encode_cursor(values)})
+        assert response.status_code == 400 and response.json() == {'detail': 'Invalid cursor'}
+    with pytest.raises(ValueError):
+        build_search_query('paracetamol', after=['high', 3, 1042])
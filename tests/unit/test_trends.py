@@ -0,0 +1,31 @@
+from datetime import date
+
+import pytest
+
+from api.trends import build_channel_trends_query, build_detection_trends_query
+
+
+def test_channel_trends_query_reads_the_rollup():
+    """Buckets come from date_trunc over agg_channel_daily; filters are optional."""
+    sql, params = build_channel_trends_query('week')
+    assert 'marts.agg_channel_daily' in str(sql) and 'fct_messages' not in str(sql)
+    assert 'WHERE' not in str(sql) and params == {'granularity': 'week'}
+
+    sql, params = build_channel_trends_query('month', date(2026, 1, 1), date(2026, 3, 31), 'chan')
+    assert 'a.date_key >= :start_date' in str(sql) and 'c.channel_name = :channel' in str(sql)
+    assert params['end_date'] == date(2026, 3, 31)
+
+
+def test_detection_trends_query_weights_confidence():
+    """Coarser buckets average confidence over detections, not over days."""
+    sql, params = build_detection_trends_query('day', detected_class='bottle', image_category='Medication')
+    assert 'sum(a.confidence_sum)' in str(sql) and 'marts.agg_detections_daily' in str(sql)
+    assert params == {'granularity': 'day', 'detected_class': 'bottle', 'image_category': 'Medication'}
+
+
+def test_unknown_granularity_is_rejected():
+    """Only day, week and month reach date_trunc."""
+    with pytest.raises(ValueError):
+        build_channel_trends_query('year')
+    with pytest.raises(ValueError):
+        build_detection_trends_query('hour')
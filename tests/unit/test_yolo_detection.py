@@ -0,0 +1,138 @@
+import multiprocessing
+
+import cv2
+import numpy as np
+import pytest
+
+from scripts import yolo_detection
+from scripts.yolo_detection import detection_rows, parse_message_id
+
+
+class FakeTensor:
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+
+class FakeBoxes:
+    def __init__(self, image):
+        height, width = image.shape[:2]
+        # One box over the whole image, its confidence read off the pixel value
+        self.xyxy = FakeTensor([[0, 0, width, height]])
+        self.conf = FakeTensor([image[0, 0, 0] / 255])
+        self.cls = FakeTensor([0])
+
+
+class FakeResult:
+    def __init__(self, image):
+        self.boxes = FakeBoxes(image)
+
+
+class FakeModel:
+    """Stands in for a YOLO model: records its batch sizes, one box per image."""
+    names = {0: 'bottle'}
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, images, imgsz, batch, verbose):
+        assert batch == len(images)
+        self.batches.append(len(images))
+        return [FakeResult(image) for image in images]
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Registers a FakeModel as the weights 'fake.pt' (forked workers inherit it)."""
+    model = FakeModel()
+    monkeypatch.setitem(yolo_detection._models, 'fake.pt', model)
+    return model
+
+
+def _images(root, channel, shades):
+    """Writes one grey image per shade and returns their (channel, name, path) items."""
+    folder = root / channel
+    folder.mkdir(exist_ok=True)
+    items = []
+    for index, shade in enumerate(shades):
+        path = folder / f'{channel}_{index}.png'
+        cv2.imwrite(str(path), np.full((24, 32, 3), shade, dtype=np.uint8))
+        items.append((channel, path.name, str(path)))
+    return items
+
+
+def _confidences(results):
+    return [[round(box[1] * 255) for box in boxes] for _, boxes in results]
+
+
+def test_message_id_comes_from_the_scrapers_file_names():
+    """`<channel>_<id>.jpg` names, including channels with underscores, yield the typed id."""
+    assert parse_message_id('CheMed123_10265.jpg') == 10265
+    assert parse_message_id('data/raw/images/HakimApps_Guideline/HakimApps_Guideline_42.jpg') == 42
+    assert parse_message_id('77.jpg') == 77
+    assert parse_message_id('cover.jpg') is None
+
+
+def test_detection_rows_carry_the_message_key():
+    """Each box becomes one row keyed on (channel, message_id)."""
+    [row] = detection_rows(('lobelia4cosmetics', 'lobelia4cosmetics_9.jpg', '/x.jpg'),
+                           [('bottle', 0.9, 1, 2, 3, 4)])
+    assert (row['channel'], row['message_id']) == ('lobelia4cosmetics', 9)
+    assert (row['label'], row['x_min'], row['y_max']) == ('bottle', 1, 4)
+
+
+def test_detect_batch_returns_one_result_per_image_in_order(fake_model):
+    """A batch of N images is one forward pass giving N box lists, in input order."""
+    images = [np.full((24, 32, 3), shade, dtype=np.uint8) for shade in (10, 200, 90)]
+
+    detections = yolo_detection.detect_batch(fake_model, images)
+
+    assert fake_model.batches == [3]
+    assert [[(label, round(conf * 255), x2, y2) for label, conf, _, _, x2, y2 in boxes]
+            for boxes in detections] == [[('bottle', 10, 32, 24)], [('bottle', 200, 32, 24)],
+                                         [('bottle', 90, 32, 24)]]
+
+
+def test_iter_detections_keeps_input_order_across_batches(tmp_path, fake_model):
+    """Images are batched batch_size at a time and come back in the order given."""
+    items = _images(tmp_path, 'chan', [50, 10, 250, 130, 70])
+
+    results = list(yolo_detection.iter_detections(items, batch_size=2, decode_workers=2, weights='fake.pt'))
+
+    assert fake_model.batches == [2, 2, 1]
+    assert [item for item, _ in results] == items
+    assert _confidences(results) == [[50], [10], [250], [130], [70]]
+
+
+def test_unreadable_image_does_not_lose_its_batch(tmp_path, fake_model):
+    """An unreadable image is reported with no boxes; the rest of its batch is still detected."""
+    items = _images(tmp_path, 'chan', [40, 80, 120])
+    broken = tmp_path / 'chan' / 'chan_9.jpg'
+    broken.write_bytes(b'not an image')
+    items.insert(1, ('chan', broken.name, str(broken)))
+
+    results = list(yolo_detection.iter_detections(items, batch_size=4, weights='fake.pt'))
+
+    assert fake_model.batches == [3]
+    assert [item for item, _ in results] == items
+    assert _confidences(results) == [[40], [], [80], [120]]
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason="Workers only inherit the fake model when forked")
+def test_sharded_detection_matches_the_single_process_path(tmp_path, fake_model):
+    """Sharding channels across a process pool yields the same (item, boxes) set."""
+    pytest.importorskip('torch')
+    items = _images(tmp_path, 'big', [10, 20, 30, 40, 50]) + _images(tmp_path, 'small', [60, 70])
+
+    single = list(yolo_detection.iter_detect_all(items, batch_size=2, process_workers=1, weights='fake.pt'))
+    sharded = list(yolo_detection.iter_detect_all(items, batch_size=2, process_workers=2,
+                                                  weights='fake.pt', shard_size=2))
+
+    assert len(sharded) == len(items)
+    assert sorted(sharded) == sorted(single)